@@ -13,32 +13,57 @@ from __future__ import annotations
 
 import ast
 import functools
+import itertools
 import keyword
 import os
 import subprocess
 import sys
+import threading
+import time
 import tokenize
 import warnings
 from argparse import ArgumentParser, ArgumentTypeError, Namespace
-from typing import TYPE_CHECKING
-
-import libcst as cst
-
-from .base import Options, error_has_subidentifier
-from .runner import Flake8AsyncRunner, Flake8AsyncRunner_cst
-from .visitors import ERROR_CLASSES, ERROR_CLASSES_CST, default_disabled_error_codes
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, TypeVar
+
+from .base import Error, Options, error_has_subidentifier
+from .checker import Checker as Checker  # public library API
+from .runner import (
+    FileTimeoutError,
+    Flake8AsyncRunner,
+    Flake8AsyncRunner_cst,
+    Watchdog,
+    prewarm,
+)
+from .visitors import AST_ERROR_CODES, CST_ERROR_CODES, default_disabled_error_codes
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable, Sequence
+    from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+    from concurrent.futures import Future
     from os import PathLike
 
+    import libcst as cst
     from flake8.options.manager import OptionManager
 
-    from .base import Error
+    from .blocking_rules import BlockingRule
+
+    T = TypeVar("T")
 
 
 # CalVer: YY.month.patch, e.g. first release of July 2022 == "22.7.1"
-__version__ = "26.8.1"
+__version__ = "26.10.1"
+
+# how many files are read ahead of the file being checked, and by how many threads
+READ_AHEAD = 8
+READ_THREADS = 4
+
+# reported instead of the results of a file that exceeds --max-seconds-per-file
+TIMEOUT_CODE = "ASYNC000"
+TIMEOUT_MESSAGE = (
+    "Stopped checking file after {0} seconds, the slowest visitor was {1} ({2:.2f}s)."
+)
 
 
 # taken from https://github.com/Zac-HD/shed
@@ -59,23 +84,50 @@ def _should_format(fname: str) -> bool:
     return fname.endswith((".py",))
 
 
+def _forks_workers(options: Namespace) -> bool:
+    """Whether flake8 forks ``--jobs`` workers after parsing `options`.
+
+    Only then is freezing the prewarmed state worth keeping everything allocated
+    so far alive for good.
+    """
+    # `jobs` is one of flake8's own options, missing if called by something else
+    jobs = getattr(options, "jobs", None)
+    if Plugin.standalone or jobs is None:
+        return False
+    if jobs.is_auto:
+        return (os.cpu_count() or 1) > 1
+    return jobs.n_jobs > 1
+
+
+# libcst reads the parser type from the environment, which is shared between threads
+_parser_type_lock = threading.Lock()
+
+
 # Enable support in libcst for new grammar
 # See e.g. https://github.com/Instagram/LibCST/issues/862
 # wrapping the call and restoring old values in case there's other libcst parsers
 # in the same environment, which we don't wanna mess up.
 def cst_parse_module_native(source: str) -> cst.Module:
-    var = os.environ.get("LIBCST_PARSER_TYPE")
-    try:
-        os.environ["LIBCST_PARSER_TYPE"] = "native"
-        mod = cst.parse_module(source)
-    finally:
-        del os.environ["LIBCST_PARSER_TYPE"]
-        if var is not None:  # pragma: no cover
-            os.environ["LIBCST_PARSER_TYPE"] = var
+    # libcst is slow to import, so it's only imported once needed
+    import libcst as cst  # noqa: PLC0415
+
+    with _parser_type_lock:
+        var = os.environ.get("LIBCST_PARSER_TYPE")
+        try:
+            os.environ["LIBCST_PARSER_TYPE"] = "native"
+            mod = cst.parse_module(source)
+        finally:
+            del os.environ["LIBCST_PARSER_TYPE"]
+            if var is not None:  # pragma: no cover
+                os.environ["LIBCST_PARSER_TYPE"] = var
     return mod
 
 
 def main() -> int:
+    if sys.argv[1:2] == ["merge"]:
+        from .shard import merge  # noqa: PLC0415
+
+        return merge(sys.argv[2:])
     parser = ArgumentParser(prog="flake8-async")
     Plugin.add_options(parser)
     args = parser.parse_args()
@@ -104,18 +156,183 @@ def main() -> int:
         all_filenames = [
             os.path.join(root, f) for f in all_filenames if _should_format(f)
         ]
+    write_metrics: Callable[[], None] | None = None
+    if args.metrics is not None:
+        from .metrics import Metrics  # noqa: PLC0415
+
+        assert Plugin._options is not None
+        metrics = Plugin._options.metrics = Metrics()
+        write_metrics = functools.partial(
+            metrics.write, args.metrics, args.metrics_format
+        )
+    if args.project_index is not None:
+        from .index import build_index  # noqa: PLC0415
+
+        assert Plugin._options is not None
+        # all files are indexed, as functions may be used from files in other shards
+        Plugin._options.project_index = build_index(
+            all_filenames, args.project_index, Plugin._options.metrics
+        )
+    if args.parse_cache is not None:
+        from .parse_cache import ParseCache  # noqa: PLC0415
+
+        assert Plugin._options is not None
+        Plugin._options.parse_cache = ParseCache(args.parse_cache)
+    if args.split_lines is not None:
+        assert Plugin._options is not None
+        Plugin._options.split_lines = args.split_lines
+    costs: dict[str, float] | None = None
+    if args.shard_costs:
+        from .shard import load_costs  # noqa: PLC0415
+
+        costs = load_costs(args.shard_costs)
+    if args.shard is not None:
+        from .shard import select_shard  # noqa: PLC0415
+
+        all_filenames = select_shard(all_filenames, *args.shard, costs=costs)
+    if args.watch:
+        from .watch import watch  # noqa: PLC0415
+
+        return watch(all_filenames, _check_file, on_batch=write_metrics)
+    check_files: Callable[[Iterable[str]], Iterator[tuple[str, list[Error]]]]
+    check_files = _check_files
+    assert Plugin._options is not None
+    if (
+        args.processes is not None
+        and args.format == "text"
+        and args.memory_profile is None
+        and write_metrics is None
+        and not Plugin._options.autofix_codes
+    ):
+        check_files = functools.partial(
+            _check_files_parallel, processes=args.processes, costs=costs
+        )
+    try:
+        if args.memory_profile is None:
+            return _report(all_filenames, args.format, check_files)
+        return _report_memory_profile(all_filenames, args.format, args.memory_profile)
+    finally:
+        # also if checking failed, e.g. on a file that can't be parsed
+        if write_metrics is not None:
+            write_metrics()
+
+
+def _report_memory_profile(filenames: Iterable[str], format_: str, path: str) -> int:
+    import tracemalloc  # noqa: PLC0415
+
+    from .memory import MemoryProfile  # noqa: PLC0415
+
+    assert Plugin._options is not None
+    profile = Plugin._options.memory_profile = MemoryProfile()
+    tracemalloc.start()
+    try:
+        return _report(filenames, format_, _check_files)
+    finally:
+        tracemalloc.stop()
+        profile.write(path)
+
+
+def _report(
+    filenames: Iterable[str],
+    format_: str,
+    check_files: Callable[[Iterable[str]], Iterator[tuple[str, list[Error]]]],
+) -> int:
+    if format_ == "json":
+        return _write_json_report(filenames)
     any_error = False
-    for file in all_filenames:
-        plugin = Plugin.from_filename(file)
-        for error in sorted(plugin.run()):
+    for file, errors in check_files(filenames):
+        for error in errors:
             print(f"{file}:{error}")
             any_error = True
-        if plugin.options.autofix_codes:
-            with open(file, "w") as file:
-                file.write(plugin.module.code)
     return 1 if any_error else 0
 
 
+def _write_json_report(filenames: Iterable[str]) -> int:
+    from .shard import error_to_json, write_report  # noqa: PLC0415
+
+    results: dict[str, tuple[list[dict[str, object]], float]] = {}
+    start = time.perf_counter()
+    for file, errors in _check_files(filenames):
+        end = time.perf_counter()
+        results[file] = ([error_to_json(error) for error in errors], end - start)
+        start = end
+    write_report(results)
+    return 1 if any(errors for errors, _ in results.values()) else 0
+
+
+def _read_source(file: str) -> str:
+    # decodes the file according to its PEP 263 encoding declaration, if any
+    with tokenize.open(file) as f:
+        return f.read()
+
+
+def _write_source(file: str, source: str) -> None:
+    # in the encoding declared in the source, the same as it was read with
+    lines = iter(source.encode().splitlines(keepends=True)[:2])
+    encoding, _ = tokenize.detect_encoding(lambda: next(lines, b""))
+    with open(file, "w", encoding=encoding) as f:
+        f.write(source)
+
+
+def _autofixed_source(plugin: Plugin) -> str | None:
+    # only write if changed, so --watch isn't triggered by our own writes
+    if plugin.options.autofix_codes and plugin.module.code != plugin._source:
+        return plugin.module.code
+    return None
+
+
+def _check_file(file: str) -> list[Error]:
+    """Check a single file, writing back any autofixes, and return sorted errors."""
+    plugin = Plugin.from_filename(file)
+    errors = sorted(plugin.run())
+    if (source := _autofixed_source(plugin)) is not None:
+        _write_source(file, source)
+    return errors
+
+
+def _check_files(filenames: Iterable[str]) -> Iterator[tuple[str, list[Error]]]:
+    """Check files in order, yielding each with its sorted errors.
+
+    The next few files are read in threads while a file is being checked, and
+    autofixes are written in a thread, so the checks don't wait on slow disks.
+    """
+    files = iter(filenames)
+    with (
+        ThreadPoolExecutor(READ_THREADS) as reader,
+        ThreadPoolExecutor(1) as writer,
+    ):
+        reads = deque(
+            (file, reader.submit(_read_source, file))
+            for file in itertools.islice(files, READ_AHEAD)
+        )
+        writes: list[Future[None]] = []
+        while reads:
+            file, source = reads.popleft()
+            if (next_file := next(files, None)) is not None:
+                reads.append((next_file, reader.submit(_read_source, next_file)))
+            plugin = Plugin.from_source(source.result(), filename=file)
+            errors = sorted(plugin.run())
+            if (fixed := _autofixed_source(plugin)) is not None:
+                writes.append(writer.submit(_write_source, file, fixed))
+            yield file, errors
+        # raise any errors from writing
+        for write in writes:
+            write.result()
+
+
+def _check_files_parallel(
+    filenames: Iterable[str], processes: int, costs: Mapping[str, float] | None
+) -> Iterator[tuple[str, list[Error]]]:
+    """Check files in worker processes, yielding each in order with its errors.
+
+    The files are given to the workers from the most to the least expensive, so a
+    large file isn't left to be checked alone at the end.
+    """
+    assert Plugin._options is not None
+    checker = Checker(Plugin._options, processes=processes)
+    yield from checker.check_many(filenames, longest_first=True, costs=costs)
+
+
 class Plugin:
     name = __name__
     version = __version__
@@ -132,14 +349,12 @@ class Plugin:
     ):
         super().__init__()
         self.filename: str | None = filename
-        self._tree = tree
-        source = "".join(lines)
-
-        self.module: cst.Module = cst_parse_module_native(source)
+        self._tree: ast.AST | None = tree
+        self._source = "".join(lines)
+        self._module: cst.Module | None = None
 
     @classmethod
     def from_filename(cls, filename: str | PathLike[str]) -> Plugin:
-        # only used with --runslow
         with tokenize.open(filename) as f:
             source = f.read()
         return cls.from_source(source, filename=filename)
@@ -151,13 +366,48 @@ class Plugin:
     ) -> Plugin:
         plugin = Plugin.__new__(cls)
         super(Plugin, plugin).__init__()
-        plugin._tree = ast.parse(
-            source, filename=str(filename) if filename is not None else "<unknown>"
-        )
         plugin.filename = str(filename) if filename else None
-        plugin.module = cst_parse_module_native(source)
+        plugin._tree = None
+        plugin._source = source
+        plugin._module = None
         return plugin
 
+    # The source is only parsed into the tree(s) needed by the enabled visitors, so
+    # if only ast (or only cst) visitors are enabled each file is only parsed once.
+    @property
+    def tree(self) -> ast.AST:
+        if self._tree is None:
+            self._tree = self._parse(
+                "ast",
+                functools.partial(
+                    ast.parse,
+                    self._source,
+                    filename=(
+                        self.filename if self.filename is not None else "<unknown>"
+                    ),
+                ),
+            )
+        return self._tree
+
+    @property
+    def module(self) -> cst.Module:
+        if self._module is None:
+            self._module = self._parse(
+                "libcst", functools.partial(cst_parse_module_native, self._source)
+            )
+        return self._module
+
+    @module.setter
+    def module(self, value: cst.Module) -> None:
+        self._module = value
+
+    def _parse(self, kind: str, parse: Callable[[], T]) -> T:
+        """Parse the source with `parse`, or load the result from --parse-cache."""
+        options = self._options
+        if options is None or options.parse_cache is None:
+            return parse()
+        return options.parse_cache.get(kind, self._source, parse, options.metrics)
+
     def run(self) -> Iterable[Error]:
         # when run as a flake8 plugin, flake8 handles suppressing errors from `noqa`.
         # it's therefore important we don't suppress any errors for compatibility with
@@ -165,26 +415,124 @@ class Plugin:
         if not self.standalone:
             self.options.disable_noqa = True
 
-        cst_runner = Flake8AsyncRunner_cst(self.options, self.module)
-        # any noqa'd errors are suppressed upon being generated
-        yield from cst_runner.run()
+        if (metrics := self.options.metrics) is None:
+            yield from self._run_watched()
+            return
+        metrics.count("files_checked")
+        start = time.perf_counter()
+        try:
+            errors = list(self._run_watched())
+        except Exception as e:
+            metrics.count("files_failed", error=type(e).__name__)
+            raise
+        metrics.observe("file_seconds", time.perf_counter() - start)
+        for error in errors:
+            metrics.count("errors", code=error.code)
+        yield from errors
+
+    def _run_watched(self) -> Iterable[Error]:
+        seconds = self.options.max_seconds_per_file
+        if self._split():
+            from .split import check_split  # noqa: PLC0415
+
+            # the workers enforce the time budget for each chunk
+            tree = self.tree
+            assert isinstance(tree, ast.Module)
+            yield from check_split(self._source, tree, self.filename, self.options)
+        elif (profile := self.options.memory_profile) is not None:
+            from .memory import MemoryWatchdog  # noqa: PLC0415
+
+            watchdog = MemoryWatchdog(seconds)
+            yield from self._run_with_budget(watchdog)
+            profile.record(self.filename or "<unknown>", watchdog)
+        elif seconds is None:
+            yield from self._run(None)
+        else:
+            yield from self._run_with_budget(Watchdog(seconds))
+
+    def _split(self) -> bool:
+        split_lines = self.options.split_lines
+        if (
+            split_lines is None
+            or self.options.autofix_codes
+            or self.options.memory_profile is not None
+            or self._source.count("\n") <= split_lines
+        ):
+            return False
+        from .split import shares_state  # noqa: PLC0415
+
+        return not shares_state(self._source, self.options)
+
+    def _run_with_budget(self, watchdog: Watchdog) -> Iterable[Error]:
+        try:
+            # errors are only yielded once a runner is done, so the results of a
+            # runner that's stopped are discarded
+            yield from self._run(watchdog)
+        except FileTimeoutError as e:
+            yield Error(
+                TIMEOUT_CODE,
+                1,
+                0,
+                TIMEOUT_MESSAGE,
+                e.seconds,
+                e.slowest,
+                e.slowest_seconds,
+            )
+
+    @contextmanager
+    def _phase(self, name: str, watchdog: Watchdog | None = None) -> Iterator[None]:
+        """Time a phase of checking for the metrics, and for `watchdog` if given."""
+        with watchdog.timing(name) if watchdog else nullcontext():
+            start = time.perf_counter()
+            yield
+            if self.options.metrics is not None:
+                self.options.metrics.observe(
+                    "phase_seconds", time.perf_counter() - start, phase=name
+                )
+
+    def _run(self, watchdog: Watchdog | None) -> Iterable[Error]:
+        noqas: dict[int, set[str]] = {}
+        if Flake8AsyncRunner_cst.any_selected(self.options):
+            with self._phase("libcst parser", watchdog):
+                module = self.module
+            cst_runner = Flake8AsyncRunner_cst(
+                self.options, module, watchdog, self.filename
+            )
+            # visitors time themselves for the watchdog
+            with self._phase("libcst visitors"):
+                # any noqa'd errors are suppressed upon being generated
+                problems_cst = list(cst_runner.run())
+            yield from problems_cst
+            # access the stored noqas in cst_runner
+            noqas = cst_runner.noqas
+            # update saved module so modified source code can be accessed when
+            # autofixing
+            self.module = cst_runner.module
+        elif not self.options.disable_noqa:
+            from .visitors.visitor_utility import find_noqas  # noqa: PLC0415
+
+            noqas = self._parse("noqa", functools.partial(find_noqas, self._source))
 
-        problems_ast = Flake8AsyncRunner.run(self._tree, self.options)
+        if not Flake8AsyncRunner.any_selected(self.options):
+            return
+
+        with self._phase("ast parser", watchdog):
+            tree = self.tree
+        with self._phase("ast visitors"):
+            problems_ast = list(
+                Flake8AsyncRunner.run(tree, self.options, watchdog, self.filename)
+            )
         if self.options.disable_noqa:
             yield from problems_ast
             return
 
         for problem in problems_ast:
-            # access the stored noqas in cst_runner
-            noqa = cst_runner.noqas.get(problem.line)
+            noqa = noqas.get(problem.line)
             # if there's a noqa comment, and it's bare or this code is listed in it
             if noqa is not None and (noqa == set() or problem.code in noqa):
                 continue
             yield problem
 
-        # update saved module so modified source code can be accessed when autofixing
-        self.module = cst_runner.module
-
     @staticmethod
     def add_options(option_manager: OptionManager | ArgumentParser):
         if isinstance(option_manager, ArgumentParser):
@@ -206,6 +554,126 @@ class Plugin:
                     'lines with "# noqa" at the end.'
                 ),
             )
+            add_argument(
+                "--watch",
+                required=False,
+                default=False,
+                action="store_true",
+                help=(
+                    "Keep running, and re-check files whenever they are modified."
+                    " Results for unchanged files are kept in memory."
+                ),
+            )
+            add_argument(
+                "--format",
+                required=False,
+                default="text",
+                choices=("text", "json"),
+                help=(
+                    "Print errors as text, or write a JSON report with the errors"
+                    " and time taken for each file, for `flake8-async merge`."
+                ),
+            )
+            add_argument(
+                "--shard",
+                required=False,
+                default=None,
+                type=parse_shard,
+                metavar="K/N",
+                help=(
+                    "Split the files into N shards, and only check shard K (from 1"
+                    " to N). Files are assigned by a hash of their name, so the same"
+                    " command can be run on N machines with a different K."
+                ),
+            )
+            add_argument(
+                "--shard-costs",
+                required=False,
+                default=None,
+                metavar="REPORT",
+                help=(
+                    "A JSON report from an earlier run, used to balance shards by the"
+                    " time taken to check each file instead of assigning them by hash."
+                    " All shards must be given the same report. With --processes, the"
+                    " slowest files are checked first."
+                ),
+            )
+            add_argument(
+                "--processes",
+                required=False,
+                default=None,
+                type=int,
+                metavar="N",
+                help=(
+                    "Check files in N worker processes, from the largest, or the"
+                    " slowest in --shard-costs, to the smallest. Errors are printed in"
+                    " the same order as without. Not used when autofixing, or with"
+                    " --format=json, --memory-profile or --metrics."
+                ),
+            )
+            add_argument(
+                "--project-index",
+                required=False,
+                default=None,
+                metavar="CACHE",
+                help=(
+                    "Summarize the async functions in all files before checking them,"
+                    " so checks can use functions defined in other files. Summaries are"
+                    " cached in CACHE, and only changed files are re-indexed."
+                ),
+            )
+            add_argument(
+                "--parse-cache",
+                required=False,
+                default=None,
+                metavar="DIR",
+                help=(
+                    "Cache what's parsed from files in DIR, keyed by their contents,"
+                    " so unchanged files aren't parsed again, even with other options."
+                    " Entries are pickled, so DIR must not be writable by others."
+                ),
+            )
+            add_argument(
+                "--split-lines",
+                required=False,
+                default=None,
+                type=int,
+                metavar="LINES",
+                help=(
+                    "Check files with more than LINES lines in chunks of top-level"
+                    " definitions of about LINES lines, in parallel worker processes."
+                    " Not used when autofixing."
+                ),
+            )
+            add_argument(
+                "--memory-profile",
+                required=False,
+                default=None,
+                metavar="REPORT",
+                help=(
+                    "Trace memory allocations, and write a JSON report to REPORT with"
+                    " the memory used by each file, each phase of checking it, and the"
+                    " lines allocating the most. Checking is much slower."
+                ),
+            )
+            add_argument(
+                "--metrics",
+                required=False,
+                default=None,
+                metavar="FILE",
+                help=(
+                    "Write metrics about the checks to FILE once done, or after each"
+                    " batch with --watch: files checked and failed, errors per code,"
+                    " and the time taken by each phase of checking."
+                ),
+            )
+            add_argument(
+                "--metrics-format",
+                required=False,
+                default="prometheus",
+                choices=("prometheus", "json"),
+                help="Write metrics in the Prometheus text format, or as JSON.",
+            )
         else:  # pragma: no-cov-no-flake8
             Plugin.standalone = False
             # Disable ASYNC9xx calls by default
@@ -263,6 +731,16 @@ class Plugin:
             default=False,
             help="Whether to also print an error message for autofixed errors",
         )
+        add_argument(
+            "--max-seconds-per-file",
+            type=float,
+            required=False,
+            default=None,
+            help=(
+                "Stop checking a file after this many seconds, and report"
+                f" {TIMEOUT_CODE} naming the slowest visitor instead of its errors."
+            ),
+        )
         add_argument(
             "--no-checkpoint-warning-decorators",
             default="asynccontextmanager",
@@ -336,6 +814,18 @@ class Plugin:
                 "suggesting it be replaced with {value}"
             ),
         )
+        add_argument(
+            "--async200-rules",
+            type=parse_async200_rules,
+            default=(),
+            required=False,
+            help=(
+                "Comma-separated list of TOML or JSON files of rules for blocking"
+                " calls that raise ASYNC200, matching functions, methods of"
+                " variables of a type, and first arguments, with suggestions for"
+                " each library."
+            ),
+        )
         add_argument(
             "--anyio",
             # action=store_true + parse_from_config does seem to work here, despite
@@ -366,6 +856,11 @@ class Plugin:
 
     @staticmethod
     def parse_options(options: Namespace):
+        Plugin._options = Plugin.options_from_args(options)
+        prewarm(Plugin._options, freeze=_forks_workers(options))
+
+    @staticmethod
+    def options_from_args(options: Namespace) -> Options:
         def get_matching_codes(
             patterns: Iterable[str], codes: Iterable[str]
         ) -> Iterable[str]:
@@ -374,12 +869,7 @@ class Plugin:
                     if code.lower().startswith(pattern.lower()):
                         yield code
 
-        all_codes: set[str] = {
-            err_code
-            for err_class in (*ERROR_CLASSES, *ERROR_CLASSES_CST)
-            for err_code in err_class.error_codes  # type: ignore[attr-defined]
-            if not error_has_subidentifier(err_code)  # exclude e.g. ASYNC103_anyio_trio
-        }
+        all_codes: set[str] = {*AST_ERROR_CODES, *CST_ERROR_CODES}
         assert all_codes
 
         if options.autofix and not Plugin.standalone:  # pragma: no-cov-no-flake8
@@ -413,7 +903,7 @@ class Plugin:
             )
             options.async200_blocking_calls = options.trio200_blocking_calls
 
-        Plugin._options = Options(
+        return Options(
             enabled_codes=enabled_codes,
             autofix_codes=autofix_codes,
             error_on_autofix=options.error_on_autofix,
@@ -425,6 +915,8 @@ class Plugin:
             anyio=options.anyio,
             asyncio=options.asyncio,
             disable_noqa=options.disable_noqa,
+            max_seconds_per_file=options.max_seconds_per_file,
+            async200_rules=options.async200_rules,
         )
 
 
@@ -432,6 +924,17 @@ def comma_separated_list(raw_value: str) -> list[str]:
     return [s.strip() for s in raw_value.split(",") if s.strip()]
 
 
+def parse_shard(raw_value: str) -> tuple[int, int]:
+    index, sep, count = raw_value.partition("/")
+    if not (sep and index.isdigit() and count.isdigit()):
+        raise ArgumentTypeError(f"Invalid shard {raw_value!r}, expected K/N.")
+    if not 1 <= int(index) <= int(count):
+        raise ArgumentTypeError(
+            f"Invalid shard {raw_value!r}, K must be between 1 and N."
+        )
+    return int(index), int(count)
+
+
 def parse_async114_identifiers(raw_value: str) -> list[str]:
     values = comma_separated_list(raw_value)
     for value in values:
@@ -458,6 +961,16 @@ def parse_async200_dict(raw_value: str) -> dict[str, str]:
     return res
 
 
+def parse_async200_rules(raw_value: str) -> tuple[BlockingRule, ...]:
+    from .blocking_rules import load_rules  # noqa: PLC0415
+
+    return tuple(
+        rule
+        for filename in comma_separated_list(raw_value)
+        for rule in load_rules(filename)
+    )
+
+
 # not run if flake8 is installed
 # TODO: this is not tested at all atm, I'm not even sure if it works
 def parse_per_file_disable(  # pragma: no cover
@@ -2,11 +2,18 @@
 
 from __future__ import annotations
 
+from array import array
 from dataclasses import dataclass
 from typing import TYPE_CHECKING, NamedTuple
 
 if TYPE_CHECKING:
-    from collections.abc import Collection
+    from collections.abc import Collection, Iterable, Iterator, Sequence
+
+    from .blocking_rules import BlockingRule
+    from .index import ProjectIndex
+    from .memory import MemoryProfile
+    from .metrics import MetricsSink
+    from .parse_cache import ParseCache
 
 
 # strip the sub-identifier on error used to specify which message to print, when
@@ -36,6 +43,20 @@ class Options:
     anyio: bool
     asyncio: bool
     disable_noqa: bool
+    # stop checking a file after this many seconds
+    max_seconds_per_file: float | None = None
+    # summaries of async functions in other files, see --project-index
+    project_index: ProjectIndex | None = None
+    # collects the memory used by each file, see --memory-profile
+    memory_profile: MemoryProfile | None = None
+    # receives metrics about checks, see `metrics`
+    metrics: MetricsSink | None = None
+    # check files with more lines in chunks in worker processes, see `split`
+    split_lines: int | None = None
+    # caches parsed trees and noqa comments across runs, see `parse_cache`
+    parse_cache: ParseCache | None = None
+    # ASYNC200 rules from files, see --async200-rules and `blocking_rules`
+    async200_rules: Sequence[BlockingRule] = ()
 
 
 class Statement(NamedTuple):
@@ -61,15 +82,30 @@ class Statement(NamedTuple):
 
 
 class Error:
+    __slots__ = ("_col", "_key", "args", "code", "line", "message")
+
     def __init__(
         self, error_code: str, lineno: int, col: int, message: str, *args: object
     ):
         super().__init__()
         self.line = lineno
-        self.col = col
+        self._col = col
         self.code = error_code
+        # the message is only formatted with args when printed
         self.message = message
         self.args = args
+        self._key: tuple[int, str, tuple[object, ...], str, int] | None = None
+
+    # column is modified in tests when ignoring columns, so the cached key needs
+    # to be invalidated.
+    @property
+    def col(self) -> int:
+        return self._col
+
+    @col.setter
+    def col(self, value: int) -> None:
+        self._col = value
+        self._key = None
 
     def format_message(self):
         return f"{self.code} " + self.message.format(*self.args)
@@ -85,7 +121,9 @@ class Error:
 
     def cmp(self):
         # column may be ignored/modified when autofixing, so sort on that last
-        return self.line, self.code, self.args, self.message, self.col
+        if self._key is None:
+            self._key = self.line, self.code, self.args, self.message, self._col
+        return self._key
 
     # for sorting in tests
     def __lt__(self, other: Error) -> bool:
@@ -105,3 +143,114 @@ class Error:
 
     def __hash__(self) -> int:
         return hash(self.cmp())
+
+    def __reduce__(self):
+        return Error, (self.code, self.line, self._col, self.message, *self.args)
+
+
+class ErrorBatch:
+    """A sequence of errors stored column-wise, for passing results between processes.
+
+    Lines and columns are stored in arrays, and codes and messages as indices into
+    tables of unique values, so pickling a batch is much cheaper than pickling the
+    same number of `Error` objects. Errors are recreated when accessed.
+    """
+
+    __slots__ = (
+        "_code_ids",
+        "_code_index",
+        "_codes",
+        "_cols",
+        "_lines",
+        "_message_ids",
+        "_message_index",
+        "_messages",
+        "args",
+    )
+
+    def __init__(self, errors: Iterable[Error] = ()):
+        super().__init__()
+        self._lines = array("i")
+        self._cols = array("i")
+        self._code_ids = array("H")
+        self._message_ids = array("H")
+        # tables of unique codes and messages, and the index of each in them
+        self._codes: list[str] = []
+        self._messages: list[str] = []
+        self._code_index: dict[str, int] = {}
+        self._message_index: dict[str, int] = {}
+        self.args: list[tuple[object, ...]] = []
+        self.extend(errors)
+
+    @staticmethod
+    def _intern(value: str, table: list[str], ids: dict[str, int]) -> int:
+        if (i := ids.get(value)) is None:
+            i = ids[value] = len(table)
+            table.append(value)
+        return i
+
+    def append(self, error: Error) -> None:
+        self._lines.append(error.line)
+        self._cols.append(error.col)
+        self._code_ids.append(self._intern(error.code, self._codes, self._code_index))
+        self._message_ids.append(
+            self._intern(error.message, self._messages, self._message_index)
+        )
+        self.args.append(error.args)
+
+    def extend(self, errors: Iterable[Error]) -> None:
+        for error in errors:
+            self.append(error)
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __getitem__(self, index: int) -> Error:
+        return Error(
+            self._codes[self._code_ids[index]],
+            self._lines[index],
+            self._cols[index],
+            self._messages[self._message_ids[index]],
+            *self.args[index],
+        )
+
+    def __iter__(self) -> Iterator[Error]:
+        codes, messages = self._codes, self._messages
+        for line, col, code_id, message_id, args in zip(
+            self._lines, self._cols, self._code_ids, self._message_ids, self.args
+        ):
+            yield Error(codes[code_id], line, col, messages[message_id], *args)
+
+    def __reduce__(self):
+        return ErrorBatch._from_columns, (
+            self._lines,
+            self._cols,
+            tuple(self._codes),
+            self._code_ids,
+            tuple(self._messages),
+            self._message_ids,
+            self.args,
+        )
+
+    @classmethod
+    def _from_columns(
+        cls,
+        lines: array[int],
+        cols: array[int],
+        codes: tuple[str, ...],
+        code_ids: array[int],
+        messages: tuple[str, ...],
+        message_ids: array[int],
+        args: list[tuple[object, ...]],
+    ) -> ErrorBatch:
+        batch = cls()
+        batch._lines = lines
+        batch._cols = cols
+        batch._codes = list(codes)
+        batch._code_index = {code: i for i, code in enumerate(codes)}
+        batch._code_ids = code_ids
+        batch._messages = list(messages)
+        batch._message_index = {message: i for i, message in enumerate(messages)}
+        batch._message_ids = message_ids
+        batch.args = args
+        return batch
@@ -0,0 +1,249 @@
+"""Implements ``--async200-rules``, declarative rules for blocking calls.
+
+A rule file is TOML, or JSON if its name ends with ``.json``, with a list of rules
+under ``rule``. Each rule gives either ``call``, a pattern for the names of called
+functions as in ``--async200-blocking-calls``, or ``type``, the type of a variable
+whose methods block, as tracked for ASYNC212, optionally only the ``methods``
+listed. ``first_arg`` limits a rule to calls whose first argument is one of the
+listed string constants, as for ASYNC211. ``replacement`` is the suggestion, or a
+table of suggestions for each of ``trio``, ``anyio`` and ``asyncio``, with an
+optional ``default``, as the ASYNC22x messages differ for asyncio.
+
+The rules of all files, after the ``--async200-blocking-calls`` pairs, are compiled
+once, when options are parsed, into an index looked up by name: names without
+wildcards, patterns by the last dotted part of the name if it has none, and methods
+by type and name. Only patterns with wildcards in the last part are tried on every
+call, so hundreds of rules cost about the same as one. When several rules match a
+call, the first one given is used.
+"""
+
+from __future__ import annotations
+
+import ast
+import functools
+import json
+import os
+import re
+import sys
+from argparse import ArgumentTypeError
+from dataclasses import dataclass
+from fnmatch import translate
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Mapping, Sequence
+
+    from .base import Options
+
+LIBRARIES = ("trio", "anyio", "asyncio")
+_KEYS = {"call", "type", "methods", "first_arg", "replacement"}
+_WILDCARDS = re.compile(r"[*?\[\]]")
+
+
+@dataclass(frozen=True)
+class BlockingRule:
+    # pattern for the name of called functions, or None for methods of `type`
+    call: str | None
+    replacement: tuple[tuple[str, str], ...]
+    type: str | None = None
+    # blocking methods of `type`, or None for all of them
+    methods: frozenset[str] | None = None
+    # constants the first argument must be one of, or None for any arguments
+    first_arg: frozenset[str] | None = None
+
+    def matches_args(self, node: ast.Call) -> bool:
+        return self.first_arg is None or (
+            bool(node.args)
+            and isinstance(node.args[0], ast.Constant)
+            and node.args[0].value in self.first_arg
+        )
+
+    def suggestion(self, library: Sequence[str]) -> str:
+        """Return the replacement for the libraries used, joined with "/"."""
+        replacements = dict(self.replacement)
+        if suggestions := [replacements[lib] for lib in library if lib in replacements]:
+            return "/".join(suggestions)
+        return replacements.get("default") or "/".join(replacements.values())
+
+
+if TYPE_CHECKING:
+    # the position of a rule, so the first given wins, how to match it against a
+    # normcased name if it's a pattern, and the rule
+    _Entry = tuple[int, Callable[[str], object] | None, BlockingRule]
+
+
+class BlockingCalls:
+    """Rules indexed for matching calls, see the module docstring."""
+
+    def __init__(self, rules: Iterable[BlockingRule]):
+        super().__init__()
+        self._names: dict[str, list[_Entry]] = {}
+        self._last_parts: dict[str, list[_Entry]] = {}
+        self._wildcards: list[_Entry] = []
+        self._methods: dict[tuple[str, str | None], list[_Entry]] = {}
+        # types of variables to track, see VisitorTypeTracker
+        self.types: set[str] = set()
+        for order, rule in enumerate(rules):
+            if rule.type is not None:
+                self.types.add(rule.type)
+                for method in rule.methods or (None,):
+                    entries = self._methods.setdefault((rule.type, method), [])
+                    entries.append((order, None, rule))
+                continue
+            assert rule.call is not None
+            pattern = os.path.normcase(rule.call.lstrip("@"))
+            if not _WILDCARDS.search(pattern):
+                self._names.setdefault(pattern, []).append((order, None, rule))
+                continue
+            entry = (order, re.compile(translate(pattern)).match, rule)
+            # names matching e.g. `*.get` all end in `.get`
+            last_part = pattern.rpartition(".")[2]
+            if "." in pattern and not _WILDCARDS.search(last_part):
+                self._last_parts.setdefault(last_part, []).append(entry)
+            else:
+                self._wildcards.append(entry)
+
+    def __bool__(self) -> bool:
+        return bool(self._names or self._last_parts or self._wildcards or self.types)
+
+    @staticmethod
+    def _first(
+        candidates: Iterable[tuple[str, Iterable[_Entry]]], node: ast.Call
+    ) -> BlockingRule | None:
+        best: tuple[int, BlockingRule] | None = None
+        for name, entries in candidates:
+            # entries are in the order given, so only the first match can win
+            for order, match, rule in entries:
+                if best is not None and order >= best[0]:
+                    break
+                if (match is None or match(name)) and rule.matches_args(node):
+                    best = (order, rule)
+                    break
+        return None if best is None else best[1]
+
+    def match_call(self, names: Iterable[str], node: ast.Call) -> BlockingRule | None:
+        """Return the first rule for calling any of `names`, which are normcased."""
+        return self._first(
+            (
+                (name, entries)
+                for name in names
+                for entries in (
+                    self._names.get(name, ()),
+                    self._last_parts.get(name.rpartition(".")[2], ()),
+                    self._wildcards,
+                )
+            ),
+            node,
+        )
+
+    def match_method(
+        self, type_: str, method: str, node: ast.Call
+    ) -> BlockingRule | None:
+        """Return the first rule for calling `method` on a variable of `type_`."""
+        return self._first(
+            (
+                ("", self._methods.get((type_, method), ())),
+                ("", self._methods.get((type_, None), ())),
+            ),
+            node,
+        )
+
+
+@functools.cache
+def _compile(
+    pairs: tuple[tuple[str, str], ...], rules: tuple[BlockingRule, ...]
+) -> BlockingCalls:
+    return BlockingCalls(
+        [
+            *(BlockingRule(call, (("default", value),)) for call, value in pairs),
+            *rules,
+        ]
+    )
+
+
+def blocking_calls(options: Options) -> BlockingCalls:
+    """Return the compiled ``--async200-blocking-calls`` and ``--async200-rules``."""
+    return _compile(
+        tuple(options.async200_blocking_calls.items()), tuple(options.async200_rules)
+    )
+
+
+def _strings(value: object, what: str) -> frozenset[str]:
+    if not (
+        isinstance(value, list)
+        and value
+        and all(isinstance(v, str) and v for v in value)
+    ):
+        raise ValueError(f"{what} must be a non-empty list of strings")
+    return frozenset(value)
+
+
+def parse_rule(raw: Mapping[str, Any]) -> BlockingRule:
+    """Return the rule for a table of a rule file, raising ValueError if invalid."""
+    if unknown := set(raw) - _KEYS:
+        raise ValueError(f"unknown keys {', '.join(sorted(unknown))}")
+    call, type_ = raw.get("call"), raw.get("type")
+    if (call is None) == (type_ is None):
+        raise ValueError("exactly one of call and type must be given")
+    for key, value in ("call", call), ("type", type_):
+        if value is not None and not (isinstance(value, str) and value):
+            raise ValueError(f"{key} must be a non-empty string")
+    if call is not None and "methods" in raw:
+        raise ValueError("methods can only be given with type")
+
+    replacement = raw.get("replacement")
+    if isinstance(replacement, str):
+        replacement = {"default": replacement}
+    if not (
+        isinstance(replacement, dict)
+        and replacement
+        and set(replacement) <= {*LIBRARIES, "default"}
+        and all(isinstance(v, str) and v for v in replacement.values())
+    ):
+        raise ValueError(
+            "replacement must be a string, or a table of strings for any of"
+            f" {', '.join(LIBRARIES)} and default"
+        )
+    return BlockingRule(
+        call=call,
+        replacement=tuple(replacement.items()),
+        type=type_,
+        methods=_strings(raw["methods"], "methods") if "methods" in raw else None,
+        first_arg=(
+            _strings(raw["first_arg"], "first_arg") if "first_arg" in raw else None
+        ),
+    )
+
+
+def _load(path: Path) -> object:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        return json.loads(text)
+    if sys.version_info >= (3, 11):  # pragma: no-cov-py-lt-311
+        import tomllib  # noqa: PLC0415
+
+        return tomllib.loads(text)
+    raise ArgumentTypeError(  # pragma: no cover
+        f"{path}: TOML rule files need Python 3.11+, use JSON"
+    )
+
+
+def load_rules(filename: str) -> list[BlockingRule]:
+    """Return the rules in a rule file, raising ArgumentTypeError if invalid."""
+    path = Path(filename)
+    try:
+        data = _load(path)
+    except (OSError, ValueError) as e:
+        # tomllib.TOMLDecodeError and json.JSONDecodeError are ValueErrors
+        raise ArgumentTypeError(f"{path}: {e}") from None
+    rules = data.get("rule") if isinstance(data, dict) else None
+    if not (isinstance(rules, list) and all(isinstance(raw, dict) for raw in rules)):
+        raise ArgumentTypeError(f"{path}: expected a list of tables under 'rule'")
+    result: list[BlockingRule] = []
+    for i, raw in enumerate(rules, start=1):
+        try:
+            result.append(parse_rule(raw))
+        except ValueError as e:  # noqa: PERF203 # try-except in loop
+            raise ArgumentTypeError(f"{path}: rule {i}: {e}") from None
+    return result
@@ -0,0 +1,504 @@
+"""A library API for checking many files or snippets with the same options.
+
+Tools embedding flake8-async can create a :class:`Checker` instead of juggling
+:class:`~flake8_async.Plugin`, whose options are a class attribute set by
+``Plugin.parse_options``.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .base import Error, ErrorBatch
+from .runner import prewarm
+
+if TYPE_CHECKING:
+    from collections.abc import (
+        AsyncIterator,
+        Callable,
+        Iterable,
+        Iterator,
+        Mapping,
+        Sequence,
+    )
+    from concurrent.futures import Executor
+    from multiprocessing.queues import SimpleQueue
+    from os import PathLike
+
+    import anyio
+    from anyio.abc import TaskGroup
+    from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+
+    from . import Plugin
+    from .base import Options
+
+# how many files each worker process can be given ahead of the results being used
+_PREFETCH_PER_PROCESS = 4
+
+
+class Checker:
+    """Checks sources and files with fixed options.
+
+    Checkers don't write autofixes to files, and don't change any global state
+    after being created, so a checker can be used from several threads at once.
+    The visitors for the enabled checks are imported, and option patterns compiled,
+    when the checker is created instead of on the first check. Each check gets its
+    own runners, as they keep the state of the file being checked.
+
+    With `processes`, :meth:`check_many` and :meth:`acheck_many` check files in that
+    many worker processes.
+    """
+
+    def __init__(self, options: Options, *, processes: int | None = None):
+        super().__init__()
+        self.options = options
+        self.processes = processes
+        prewarm(options)
+
+    @classmethod
+    def from_argv(
+        cls, argv: Sequence[str] = (), *, processes: int | None = None
+    ) -> Checker:
+        """Create a checker from command-line options, e.g. ``["--enable=ASYNC9"]``."""
+        from argparse import ArgumentParser  # noqa: PLC0415
+
+        from . import Plugin  # noqa: PLC0415
+
+        parser = ArgumentParser(prog="flake8-async")
+        Plugin.add_options(parser)
+        return cls(
+            Plugin.options_from_args(parser.parse_args(argv)), processes=processes
+        )
+
+    def _plugin(self, plugin: Plugin) -> Plugin:
+        # set on the instance, so the options and settings of the class are unused
+        plugin._options = self.options
+        plugin.standalone = True
+        return plugin
+
+    def check_source(self, source: str, filename: str | None = None) -> list[Error]:
+        """Return the errors in `source`, sorted."""
+        from . import Plugin  # noqa: PLC0415
+
+        plugin = self._plugin(Plugin.from_source(source, filename=filename))
+        return sorted(plugin.run())
+
+    def check_file(self, path: str | PathLike[str]) -> list[Error]:
+        """Return the errors in the file at `path`, sorted."""
+        from . import Plugin  # noqa: PLC0415
+
+        return sorted(self._plugin(Plugin.from_filename(path)).run())
+
+    def check_many(
+        self,
+        paths: Iterable[str | PathLike[str]],
+        *,
+        longest_first: bool = False,
+        costs: Mapping[str, float] | None = None,
+    ) -> Iterator[tuple[str, list[Error]]]:
+        """Check files lazily, yielding each path with its errors in the given order.
+
+        Only a few files at a time are read ahead of the results being used, so
+        `paths` can be a generator of any length.
+
+        With `processes` and `longest_first`, all paths are collected first, and
+        given to the workers from the most to the least expensive, so a large file
+        isn't left to run alone at the end. Files are estimated to cost their size,
+        or with `costs`, e.g. from ``flake8_async.shard.load_costs``, the time they
+        took in an earlier run. Results are still yielded in the given order.
+        """
+        if self.processes is None:
+            for path in paths:
+                yield os.fspath(path), self.check_file(path)
+            return
+
+        pool = self._pool()
+        try:
+            if longest_first:
+                all_paths = [os.fspath(path) for path in paths]
+                tasks = {
+                    path: pool.submit(_check_file, path)
+                    for path in longest_first_order(all_paths, costs)
+                }
+                for path in all_paths:
+                    yield path, list(pool.result(tasks[path]))
+                return
+
+            pending: deque[tuple[str, _Task]] = deque()
+            for path in paths:
+                pending.append((os.fspath(path), pool.submit(_check_file, path)))
+                if len(pending) >= self.processes * _PREFETCH_PER_PROCESS:
+                    path, task = pending.popleft()
+                    yield path, list(pool.result(task))
+            while pending:
+                path, task = pending.popleft()
+                yield path, list(pool.result(task))
+        finally:
+            pool.shutdown()
+
+    def _pool(self) -> _WorkerPool:
+        assert self.processes is not None
+        return _WorkerPool(
+            ProcessPoolExecutor,
+            self.processes,
+            self.options.max_seconds_per_file,
+            _init_worker,
+            (self.options,),
+        )
+
+    @asynccontextmanager
+    async def acheck_many(
+        self,
+        paths: Iterable[str | PathLike[str]],
+        *,
+        limiter: anyio.CapacityLimiter | None = None,
+    ) -> AsyncIterator[MemoryObjectReceiveStream[tuple[str, list[Error]]]]:
+        """Check files without blocking the event loop, in worker threads or processes.
+
+        Yields a stream of each path with its errors, in the order they're checked::
+
+            async with checker.acheck_many(paths) as results:
+                async for path, errors in results:
+                    ...
+
+        Needs anyio, and works with any event loop it supports, e.g. asyncio and
+        trio. At most `limiter.total_tokens` files are checked at once, by default
+        one, or with `processes` that many. Checks hold the GIL, so more threads
+        don't check faster, but let reading files overlap. `paths` are only taken
+        when there's a free token, so it can be a generator of any length.
+
+        Leaving the block, e.g. when cancelled, abandons the files being checked:
+        threads are left to finish in the background, and files not yet started
+        in worker processes are dropped. An error checking a file cancels the
+        other checks, and is raised by the task group.
+        """
+        import anyio  # noqa: PLC0415
+
+        if limiter is None:
+            limiter = anyio.CapacityLimiter(self.processes or 1)
+        pool = None if self.processes is None else self._pool()
+        send: MemoryObjectSendStream[tuple[str, list[Error]]]
+        receive: MemoryObjectReceiveStream[tuple[str, list[Error]]]
+        send, receive = anyio.create_memory_object_stream()
+        try:
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(self._afeed, paths, limiter, pool, send, tg)
+                try:
+                    yield receive
+                finally:
+                    # cancelled first, so no check sends to the closed stream
+                    tg.cancel_scope.cancel()
+                    receive.close()
+        finally:
+            if pool is not None:
+                # don't block the event loop waiting for abandoned checks
+                pool.shutdown(wait=False)
+
+    async def _afeed(
+        self,
+        paths: Iterable[str | PathLike[str]],
+        limiter: anyio.CapacityLimiter,
+        pool: _WorkerPool | None,
+        send: MemoryObjectSendStream[tuple[str, list[Error]]],
+        tg: TaskGroup,
+    ) -> None:
+        async with send:
+            for path in paths:
+                token = object()
+                await limiter.acquire_on_behalf_of(token)
+                tg.start_soon(
+                    self._acheck_file, path, limiter, token, pool, send.clone()
+                )
+
+    async def _acheck_file(
+        self,
+        path: str | PathLike[str],
+        limiter: anyio.CapacityLimiter,
+        token: object,
+        pool: _WorkerPool | None,
+        send: MemoryObjectSendStream[tuple[str, list[Error]]],
+    ) -> None:
+        import anyio  # noqa: PLC0415
+
+        async with send:
+            try:
+                if pool is None:
+                    errors = await anyio.to_thread.run_sync(
+                        self.check_file, path, abandon_on_cancel=True
+                    )
+                else:
+                    task = pool.submit(_check_file, path)
+                    try:
+                        errors = list(
+                            await anyio.to_thread.run_sync(
+                                pool.result, task, abandon_on_cancel=True
+                            )
+                        )
+                    finally:
+                        pool.cancel(task)
+            finally:
+                limiter.release_on_behalf_of(token)
+            await send.send((os.fspath(path), errors))
+
+
+def _size(path: str) -> int:
+    try:
+        return Path(path).stat().st_size
+    except OSError:
+        # raised again when it's checked
+        return 0
+
+
+def longest_first_order(
+    paths: Iterable[str], costs: Mapping[str, float] | None = None
+) -> list[str]:
+    """Return the distinct `paths` from the most to the least expensive to check.
+
+    Files not in `costs`, which is keyed by normalized path, are assumed to take the
+    time per byte of those that are, or without any just their size. Ties are kept
+    in the given order.
+    """
+    sizes = {path: _size(path) for path in paths}
+    known = {
+        path: costs[os.path.normpath(path)]
+        for path in sizes
+        if costs and os.path.normpath(path) in costs
+    }
+    known_size = sum(sizes[path] for path in known)
+    per_byte = sum(known.values()) / known_size if known_size else 1.0
+    return sorted(sizes, key=lambda path: -known.get(path, sizes[path] * per_byte))
+
+
+# the checker used by each worker process of `Checker`, and of `split`
+_worker_checker: Checker | None = None
+
+
+def _init_worker(options: Options) -> None:
+    global _worker_checker  # noqa: PLW0603
+    _worker_checker = Checker(options)
+
+
+# errors are returned to the main process in batches, which pickle much smaller
+def _check_file(path: str | PathLike[str]) -> ErrorBatch:
+    assert _worker_checker is not None
+    return ErrorBatch(_worker_checker.check_file(path))
+
+
+def _check_source(source: str, filename: str | None) -> ErrorBatch:
+    assert _worker_checker is not None
+    return ErrorBatch(_worker_checker.check_source(source, filename))
+
+
+def _init_pool_worker(
+    pids: SimpleQueue[int],
+    initializer: Callable[..., object] | None,
+    initargs: tuple[object, ...],
+) -> None:
+    pids.put(os.getpid())
+    if initializer is not None:
+        initializer(*initargs)
+
+
+# a check is given up on once it has run this many times its time budget, plus
+# the grace period in seconds
+_HARD_TIMEOUT_FACTOR = 2
+_HARD_TIMEOUT_GRACE = 1.0
+
+
+class _Task:
+    """A check submitted to a `_WorkerPool`, and its future once it's started."""
+
+    __slots__ = ("args", "function", "future", "started", "submitted")
+
+    def __init__(
+        self, function: Callable[..., ErrorBatch], args: tuple[object, ...]
+    ) -> None:
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.future: Future[ErrorBatch] | None = None
+        self.started = 0.0
+        self.submitted = threading.Event()
+
+
+class _WorkerPool:
+    """Worker processes that are killed and replaced when a check hangs.
+
+    Workers enforce ``--max-seconds-per-file`` themselves, but only between steps,
+    so a check stuck in a single step, e.g. a pathological regex, would keep its
+    worker forever. A check that has been running for `_HARD_TIMEOUT_FACTOR` times
+    the budget is reported as ASYNC000 instead: all workers are killed, as a pool
+    can't replace a single one, and the other running checks are restarted on new
+    workers.
+
+    Only as many checks as there are workers are given to the executor at once, so
+    a check starts when it's submitted to it, and others wait here.
+
+    `executor_type` is called like `ProcessPoolExecutor`, with each worker running
+    `initializer(*initargs)`. Workers report their process id when they start, so
+    they can be killed; those of executors running checks in this process, like a
+    `ThreadPoolExecutor`, aren't.
+    """
+
+    def __init__(
+        self,
+        executor_type: Callable[..., Executor],
+        workers: int,
+        seconds: float | None,
+        initializer: Callable[..., object] | None = None,
+        initargs: tuple[object, ...] = (),
+    ):
+        super().__init__()
+        self._executor_type = executor_type
+        self._initializer = initializer
+        self._initargs = initargs
+        self._workers = workers
+        self._open()
+        self._seconds = seconds
+        self._queued: deque[_Task] = deque()
+        self._running: set[_Task] = set()
+        # reentrant, as callbacks of futures that are already done are called
+        # right away
+        self._lock = threading.RLock()
+        self._closed = False
+
+    def _open(self) -> None:
+        self._pids: SimpleQueue[int] = multiprocessing.SimpleQueue()
+        self._executor = self._executor_type(
+            self._workers,
+            initializer=_init_pool_worker,
+            initargs=(self._pids, self._initializer, self._initargs),
+        )
+
+    def _kill_workers(self) -> None:
+        # SIGKILL doesn't exist on Windows, where any signal terminates the process
+        kill = getattr(signal, "SIGKILL", signal.SIGTERM)
+        while not self._pids.empty():
+            pid = self._pids.get()
+            if pid != os.getpid():
+                # workers may have exited since
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(pid, kill)
+
+    def submit(self, function: Callable[..., ErrorBatch], *args: object) -> _Task:
+        task = _Task(function, args)
+        with self._lock:
+            self._queued.append(task)
+            self._start_queued()
+        return task
+
+    def _start_queued(self) -> None:
+        while self._queued and len(self._running) < self._workers:
+            self._start(self._queued.popleft())
+
+    def _start(self, task: _Task) -> None:
+        task.future = future = self._executor.submit(task.function, *task.args)
+        task.started = time.monotonic()
+        self._running.add(task)
+        task.submitted.set()
+        future.add_done_callback(functools.partial(self._done, task))
+
+    def _done(self, task: _Task, future: Future[ErrorBatch]) -> None:
+        with self._lock:
+            # not for futures of checks that were restarted
+            if task.future is future:
+                self._running.discard(task)
+                if not self._closed:
+                    self._start_queued()
+
+    def _cancel_queued(self, task: _Task) -> None:
+        task.future = Future()
+        task.future.cancel()
+        task.submitted.set()
+
+    def cancel(self, task: _Task) -> None:
+        with self._lock:
+            if task in self._queued:
+                self._queued.remove(task)
+                self._cancel_queued(task)
+            else:
+                assert task.future is not None
+                task.future.cancel()
+
+    def result(self, task: _Task) -> ErrorBatch:
+        """Wait for `task`, giving up on it if it runs for too long."""
+        limit = (
+            None
+            if self._seconds is None
+            else self._seconds * _HARD_TIMEOUT_FACTOR + _HARD_TIMEOUT_GRACE
+        )
+        task.submitted.wait()
+        while True:
+            with self._lock:
+                future, started = task.future, task.started
+            assert future is not None
+            timeout = None if limit is None else started + limit - time.monotonic()
+            try:
+                return future.result(
+                    timeout=None if timeout is None else max(timeout, 0)
+                )
+            # not the builtin TimeoutError before Python 3.11
+            except futures.TimeoutError:
+                # finished, or restarted by another check, just before being killed
+                if not self._kill(task, future):  # pragma: no cover
+                    continue
+                assert limit is not None
+                return _timeout_batch(limit)
+            except BrokenExecutor:
+                with self._lock:
+                    # not restarted after the workers were replaced for another check
+                    if task.future is future:
+                        raise
+
+    def _kill(self, task: _Task, future: Future[ErrorBatch]) -> bool:
+        with self._lock:
+            if task.future is not future or future.done():  # pragma: no cover
+                return False
+            self._running.discard(task)
+            self._kill_workers()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            if not self._closed:
+                self._open()
+                for other in list(self._running):
+                    self._start(other)
+                self._start_queued()
+            return True
+
+    def shutdown(self, *, wait: bool = True) -> None:
+        with self._lock:
+            self._closed = True
+            while self._queued:
+                self._cancel_queued(self._queued.popleft())
+            executor = self._executor
+        # not holding the lock, which callbacks of the running checks take
+        executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def _timeout_batch(seconds: float) -> ErrorBatch:
+    from . import TIMEOUT_CODE, TIMEOUT_MESSAGE  # noqa: PLC0415
+
+    return ErrorBatch(
+        [
+            Error(
+                TIMEOUT_CODE,
+                1,
+                0,
+                TIMEOUT_MESSAGE,
+                seconds,
+                "unknown, its worker process was killed",
+                seconds,
+            )
+        ]
+    )
@@ -0,0 +1,268 @@
+"""Implements ``--project-index``, a summary of the async functions in a project.
+
+Before checking any files, each file is parsed with :mod:`ast` and its async functions
+summarized: whether they have a ``task_status`` parameter, and which module-level
+functions they await. Visitors can then use what's known about functions defined in
+other files, e.g. that awaiting a function that never checkpoints isn't a checkpoint
+(ASYNC910/911), or that a function is startable (ASYNC113/114).
+
+Summaries only depend on the file they're from, so they're cached on disk keyed by a
+hash of the file, and only changed files are re-indexed. Which functions never
+checkpoint depends on the functions they await, so that is worked out from the
+summaries each run.
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePath
+from typing import TYPE_CHECKING, Any
+
+from .visitors._scopes import function_bindings, module_level_name
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+    from .metrics import MetricsSink
+
+# bump if the format of summaries changes
+INDEX_VERSION = 2
+
+# summarize changed files in worker processes if there are more than this many
+PARALLEL_THRESHOLD = 50
+
+
+def module_name(filename: str) -> str:
+    """Dotted module name for `filename`, relative to the current directory."""
+    path = PurePath(os.path.normpath(filename))
+    parts = [
+        p for p in (*path.parent.parts, path.stem) if p and p not in (path.anchor, "..")
+    ]
+    if len(parts) > 1 and parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def _module_imports(tree: ast.Module) -> dict[str, str]:
+    imports: dict[str, str] = {}
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname is not None:
+                    imports[alias.asname] = alias.name
+                else:
+                    # as recorded by VisitorImportTracker
+                    top = alias.name.partition(".")[0]
+                    imports.setdefault(top, top)
+                    imports.setdefault(alias.name, alias.name)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            for alias in node.names:
+                imports[alias.asname or alias.name] = f"{node.module}.{alias.name}"
+    return imports
+
+
+def _walk_body(node: ast.AsyncFunctionDef) -> Iterator[ast.AST]:
+    """Walk the body of `node`, but not of functions and classes defined in it."""
+    todo: list[ast.AST] = list(node.body)
+    while todo:
+        n = todo.pop()
+        yield n
+        if not isinstance(
+            n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+        ):
+            todo.extend(ast.iter_child_nodes(n))
+
+
+def _is_startable(node: ast.AsyncFunctionDef) -> bool:
+    # same as ASYNC114
+    return any(
+        arg.arg == "task_status" for arg in (*node.args.args, *node.args.kwonlyargs)
+    )
+
+
+def summarize(source: str, filename: str) -> dict[str, Any]:
+    """Summarize the async functions defined in a file.
+
+    Only module-level functions can be awaited by other files, so only they are
+    summarized, as ``[may_checkpoint, awaits]``: `may_checkpoint` is true if the
+    function has a checkpoint other than awaiting a function call, and `awaits` is
+    the qualified names of the functions it awaits. The names of those that are
+    startable are also recorded.
+    """
+    module = module_name(filename)
+    functions: dict[str, list[Any]] = {}
+    startable: list[str] = []
+    try:
+        tree = ast.parse(source, filename=filename)
+    except (SyntaxError, ValueError):
+        return {"module": module, "functions": functions, "startable": startable}
+    imports = _module_imports(tree)
+
+    for node in tree.body:
+        if not isinstance(node, ast.AsyncFunctionDef):
+            continue
+        if _is_startable(node):
+            startable.append(node.name)
+        bindings = function_bindings(node)
+        may_checkpoint = False
+        awaits: list[str] = []
+        for n in _walk_body(node):
+            if isinstance(n, (ast.AsyncFor, ast.AsyncWith)) or (
+                isinstance(n, ast.comprehension) and n.is_async
+            ):
+                may_checkpoint = True
+            elif isinstance(n, ast.Await):
+                name = (
+                    module_level_name(n.value.func, imports, bindings)
+                    if isinstance(n.value, ast.Call)
+                    else None
+                )
+                if name is None:
+                    may_checkpoint = True
+                else:
+                    # functions in this module are awaited by their bare name
+                    awaits.append(name if "." in name else f"{module}.{name}")
+        functions[node.name] = [may_checkpoint, sorted(set(awaits))]
+    return {"module": module, "functions": functions, "startable": sorted(startable)}
+
+
+def _file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _summarize_file(filename: str) -> tuple[str, dict[str, Any]]:
+    with open(filename, "rb") as f:
+        data = f.read()
+    summary = summarize(data.decode("utf-8", errors="replace"), filename)
+    summary["hash"] = _file_hash(data)
+    return filename, summary
+
+
+class ProjectIndex:
+    """What's known about the async functions in a project, across files."""
+
+    def __init__(self, files: dict[str, dict[str, Any]]):
+        super().__init__()
+        self.files = files
+        # qualified names of the startable module-level functions
+        self.startable: frozenset[str] = frozenset(
+            f"{summary['module']}.{name}"
+            for summary in files.values()
+            for name in summary["startable"]
+        )
+
+        self._functions: dict[str, list[Any]] = {
+            f"{summary['module']}.{name}": info
+            for summary in files.values()
+            for name, info in summary["functions"].items()
+        }
+        # functions can be imported from a parent package, so they're also looked up
+        # by any suffix of their qualified name. None marks ambiguous suffixes.
+        self._by_suffix: dict[str, str | None] = {}
+        for qualname in self._functions:
+            parts = qualname.split(".")
+            for i in range(1, len(parts) - 1):
+                suffix = ".".join(parts[i:])
+                self._by_suffix[suffix] = (
+                    None if suffix in self._by_suffix else qualname
+                )
+
+        # A function never checkpoints if it only awaits functions that never
+        # checkpoint. Functions that await each other are assumed to checkpoint.
+        self._never_checkpoints: set[str] = set()
+        todo = {
+            name
+            for name, (may_checkpoint, _) in self._functions.items()
+            if not may_checkpoint
+        }
+        changed = True
+        while changed:
+            changed = False
+            for name in list(todo):
+                if all(
+                    self.resolve(callee) in self._never_checkpoints
+                    for callee in self._functions[name][1]
+                ):
+                    self._never_checkpoints.add(name)
+                    todo.remove(name)
+                    changed = True
+
+    def resolve(self, name: str) -> str | None:
+        """Qualified name of the indexed function `name` refers to, if any."""
+        if name in self._functions:
+            return name
+        return self._by_suffix.get(name)
+
+    def _lookup(self, name: str, filename: str | None) -> str | None:
+        # bare names are of functions in the same module
+        if "." not in name:
+            if filename is None:
+                return None
+            name = f"{module_name(filename)}.{name}"
+        return self.resolve(name)
+
+    def never_checkpoints(self, name: str, filename: str | None) -> bool:
+        """Whether awaiting function `name` in `filename` is never a checkpoint."""
+        return self._lookup(name, filename) in self._never_checkpoints
+
+    def is_startable(self, name: str, filename: str | None) -> bool:
+        """Whether function `name` in `filename` has a ``task_status`` parameter."""
+        return self._lookup(name, filename) in self.startable
+
+
+def _load_cache(path: str) -> dict[str, dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != INDEX_VERSION:
+        return {}
+    return cache["files"]
+
+
+def build_index(
+    filenames: Sequence[str],
+    cache_path: str | None = None,
+    metrics: MetricsSink | None = None,
+) -> ProjectIndex:
+    """Index `filenames`, reusing the summaries of unchanged files in `cache_path`.
+
+    The cache is updated with the summaries of changed files, and files that are no
+    longer indexed are dropped from it. Reused and re-indexed files are counted in
+    `metrics`, if given.
+    """
+    cached = _load_cache(cache_path) if cache_path is not None else {}
+    files: dict[str, dict[str, Any]] = {}
+    changed: list[str] = []
+    for filename in filenames:
+        summary = cached.get(filename)
+        try:
+            with open(filename, "rb") as f:
+                file_hash = _file_hash(f.read())
+        except OSError:
+            continue
+        if summary is not None and summary["hash"] == file_hash:
+            files[filename] = summary
+        else:
+            changed.append(filename)
+
+    results: Iterable[tuple[str, dict[str, Any]]]
+    if len(changed) > PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor() as executor:
+            results = list(executor.map(_summarize_file, changed, chunksize=16))
+    else:
+        results = map(_summarize_file, changed)
+    files.update(results)
+    if metrics is not None:
+        metrics.count("cache_hits", len(files) - len(changed), cache="project index")
+        metrics.count("cache_misses", len(changed), cache="project index")
+
+    if cache_path is not None and (changed or files.keys() != cached.keys()):
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "files": files}, f)
+    return ProjectIndex(files)
@@ -0,0 +1,140 @@
+"""Implements ``--memory-profile``, reporting the memory used while checking files.
+
+Allocations are traced with :mod:`tracemalloc` while checking. For each file, and
+each phase of checking it - parsing the ``ast`` and libcst trees, and running each
+visitor - the report has:
+
+- ``peak``: the most memory allocated at once during the phase, above what was
+  allocated when it started. For ``ast`` visitors, which run together node by node,
+  it's the most allocated while visiting a single node.
+- ``retained``: the memory allocated by the phase that's still used after it.
+
+The report also has the peak RSS of the process, and the source lines with the
+most memory allocated while checking a file and still used at the end of it, e.g.
+by the trees. Only memory allocated by Python is traced, so e.g. memory used
+internally by the native libcst parser is only in the peak RSS.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import tracemalloc
+from typing import TYPE_CHECKING, Any
+
+from .runner import Watchdog
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# bump if the format of reports changes incompatibly
+REPORT_VERSION = 1
+# how many allocation sites are reported
+TOP_SITES = 10
+
+# don't count the memory used by tracemalloc for its snapshots
+_FILTERS = (tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),)
+
+
+def _max_rss() -> int | None:
+    try:
+        import resource  # noqa: PLC0415
+    except ImportError:  # pragma: no cover
+        # not available on Windows
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # in bytes on macOS, and in KiB elsewhere
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class MemoryWatchdog(Watchdog):
+    """A `Watchdog` that also records the memory allocated by each phase of a file.
+
+    Phases are timed by `Watchdog.start` and `Watchdog.stop`, so the memory of a
+    phase is attributed to the same name as its time.
+    """
+
+    def __init__(self, seconds: float | None):
+        super().__init__(float("inf") if seconds is None else seconds)
+        # name -> [peak, retained], see the module docstring
+        self.phases: dict[str, list[int]] = {}
+        self.snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        self.base, _ = tracemalloc.get_traced_memory()
+        self.peak = 0
+        self._start_memory = self.base
+
+    def start(self, name: str) -> None:
+        super().start(name)
+        self._start_memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+    def stop(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        assert self._current is not None
+        phase = self.phases.setdefault(self._current, [0, 0])
+        phase[0] = max(phase[0], peak - self._start_memory)
+        phase[1] += current - self._start_memory
+        self.peak = max(self.peak, peak - self.base)
+        super().stop()
+
+
+class MemoryProfile:
+    """Collects the memory used by each file checked, see the module docstring."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.files: dict[str, dict[str, Any]] = {}
+        # "filename:lineno" -> [size, count] of allocations retained after a file
+        self.sites: dict[str, list[int]] = {}
+
+    def record(self, filename: str, watchdog: MemoryWatchdog) -> None:
+        """Record a file once it's been checked, while its trees are still in use."""
+        current, _ = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        for stat in snapshot.compare_to(watchdog.snapshot, "lineno"):
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            site = self.sites.setdefault(f"{frame.filename}:{frame.lineno}", [0, 0])
+            site[0] += stat.size_diff
+            site[1] += stat.count_diff
+        self.files[filename] = {
+            "peak": watchdog.peak,
+            "retained": current - watchdog.base,
+            "phases": {
+                name: {"peak": peak, "retained": retained}
+                for name, (peak, retained) in watchdog.phases.items()
+            },
+        }
+
+    def _phases(self) -> Iterator[tuple[str, dict[str, int]]]:
+        names = {name for file in self.files.values() for name in file["phases"]}
+        for name in sorted(names):
+            phases = [
+                file["phases"][name]
+                for file in self.files.values()
+                if name in file["phases"]
+            ]
+            yield name, {
+                "peak": max(phase["peak"] for phase in phases),
+                "retained": max(phase["retained"] for phase in phases),
+            }
+
+    def report(self) -> dict[str, Any]:
+        """Return the report, with the most memory used by each phase in any file."""
+        top = sorted(self.sites.items(), key=lambda item: item[1][0], reverse=True)
+        return {
+            "version": REPORT_VERSION,
+            "max_rss": _max_rss(),
+            "phases": dict(self._phases()),
+            "files": self.files,
+            "top_sites": [
+                {"site": site, "size": size, "count": count}
+                for site, (size, count) in top[:TOP_SITES]
+            ],
+        }
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=1)
+            f.write("\n")
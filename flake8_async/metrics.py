@@ -0,0 +1,164 @@
+"""Metrics about checks, for monitoring long-running processes checking many files.
+
+Checks report to the :class:`MetricsSink` in ``Options.metrics``, if any. The base
+class ignores everything, so other tools can subclass it and forward only what
+they're interested in, e.g. to statsd. :class:`Metrics` keeps counters and
+histograms in memory, and exports them in the Prometheus text format, e.g. for the
+node exporter's textfile collector, or as JSON.
+
+Metrics reported:
+
+- ``files_checked``: files checked, successfully or not.
+- ``files_failed``: files that couldn't be checked, labelled with the ``error``,
+  e.g. ``SyntaxError`` or ``ParserSyntaxError`` for files that fail to parse.
+- ``errors``: errors found, labelled with their ``code``.
+- ``file_seconds``: time taken to check each file.
+- ``phase_seconds``: time taken by each ``phase`` of checking a file: parsing with
+  the ``ast parser`` and the ``libcst parser``, and running the ``ast visitors`` and
+  the ``libcst visitors``.
+- ``cache_hits`` and ``cache_misses``, labelled with the ``cache``: files whose
+  ``project index`` summary was reused, and files whose ``ast`` or ``libcst``
+  tree, or ``noqa`` comments, were loaded from the parse cache.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    _Key = tuple[str, tuple[tuple[str, str], ...]]
+
+# bump if the format of JSON snapshots changes incompatibly
+SNAPSHOT_VERSION = 1
+# prefix of the names of exported Prometheus metrics
+PROMETHEUS_PREFIX = "flake8_async_"
+# upper bounds of histogram buckets, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class MetricsSink:
+    """Receives metrics, see the module docstring. Ignores them all."""
+
+    def count(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add `value` to the counter `name`."""
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Add an observation, e.g. of the time something took, to `name`."""
+
+
+class Metrics(MetricsSink):
+    """Keeps metrics in memory. Can be used from several threads at once."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self.counters: dict[_Key, float] = {}
+        # the number of observations in each bucket, the last for those over all
+        # bounds, and their sum
+        self.histograms: dict[_Key, tuple[list[int], list[float]]] = {}
+
+    def count(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if (histogram := self.histograms.get(key)) is None:
+                histogram = self.histograms[key] = ([0] * (len(BUCKETS) + 1), [0.0])
+            histogram[0][bisect_left(BUCKETS, value)] += 1
+            histogram[1][0] += value
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the metrics as JSON-serializable data."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, (counts.copy(), total[0]))
+                for key, (counts, total) in self.histograms.items()
+            )
+        snapshot: dict[str, Any] = {
+            "version": SNAPSHOT_VERSION,
+            "counters": {},
+            "histograms": {},
+        }
+        for (name, labels), value in counters:
+            snapshot["counters"].setdefault(name, []).append(
+                {"labels": dict(labels), "value": value}
+            )
+        for (name, labels), (counts, total) in histograms:
+            snapshot["histograms"].setdefault(name, []).append(
+                {
+                    "labels": dict(labels),
+                    "count": sum(counts),
+                    "sum": total,
+                    "buckets": [*BUCKETS, None],
+                    "counts": counts,
+                }
+            )
+        return snapshot
+
+    def prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        return "".join(_prometheus_lines(self.snapshot()))
+
+    def write(self, path: str, format_: str = "prometheus") -> None:
+        """Write the metrics to `path` as "prometheus" text or "json".
+
+        The file is replaced atomically, so it's never read half-written.
+        """
+        if format_ == "json":
+            content = json.dumps(self.snapshot(), indent=1) + "\n"
+        else:
+            content = self.prometheus()
+        fd, tmp = tempfile.mkstemp(dir=Path(path).resolve().parent, suffix=".tmp")
+        tmp_path = Path(tmp)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            tmp_path.replace(path)
+        except BaseException:
+            tmp_path.unlink()
+            raise
+
+
+def _format_labels(labels: dict[str, str], **extra: str) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _prometheus_lines(snapshot: dict[str, Any]) -> Iterator[str]:
+    for name, series in snapshot["counters"].items():
+        name = f"{PROMETHEUS_PREFIX}{name}_total"
+        yield f"# TYPE {name} counter\n"
+        for s in series:
+            yield f"{name}{_format_labels(s['labels'])} {s['value']}\n"
+    for name, series in snapshot["histograms"].items():
+        name = PROMETHEUS_PREFIX + name
+        yield f"# TYPE {name} histogram\n"
+        for s in series:
+            cumulative = 0
+            for bound, count in zip(s["buckets"], s["counts"]):
+                cumulative += count
+                le = "+Inf" if bound is None else str(bound)
+                yield (
+                    f"{name}_bucket{_format_labels(s['labels'], le=le)} {cumulative}\n"
+                )
+            labels = _format_labels(s["labels"])
+            yield f"{name}_sum{labels} {s['sum']}\n"
+            yield f"{name}_count{labels} {s['count']}\n"
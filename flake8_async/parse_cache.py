@@ -0,0 +1,95 @@
+"""Implements ``--parse-cache``, caching what's parsed from files across runs.
+
+What's parsed from a file doesn't depend on the options, so it's cached on disk
+keyed only by a hash of the source and the versions of flake8-async, Python and
+libcst: the :mod:`ast` tree, the libcst tree, and the noqa comments found when no
+libcst visitors run. Changing e.g. ``--enable`` then doesn't re-parse unchanged
+files. Summaries for ``--project-index`` are cached separately, in its own cache.
+
+Loading a libcst tree is a few times faster than parsing it, an ``ast`` tree less
+so. Entries are pickled, so the cache directory must only be writable by users
+you trust. Entries are never removed, but the directory can be deleted at any time.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from importlib.metadata import version
+from pathlib import Path
+from typing import TYPE_CHECKING, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from .metrics import MetricsSink
+
+# bump if what's cached changes incompatibly
+CACHE_VERSION = 1
+
+T = TypeVar("T")
+
+
+class ParseCache:
+    """A directory of parse results, see the module docstring."""
+
+    def __init__(self, directory: str | os.PathLike[str]):
+        super().__init__()
+        from . import __version__  # noqa: PLC0415
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # parse results change with the parsers, and what's done with them
+        self._salt = (
+            f"{CACHE_VERSION}\0{__version__}\0{sys.version}\0{version('libcst')}\0"
+        ).encode()
+
+    def _path(self, kind: str, source: str) -> Path:
+        digest = hashlib.sha256(self._salt)
+        digest.update(source.encode("utf-8", errors="surrogatepass"))
+        return self.directory / f"{digest.hexdigest()}.{kind}"
+
+    def get(
+        self,
+        kind: str,
+        source: str,
+        parse: Callable[[], T],
+        metrics: MetricsSink | None = None,
+    ) -> T:
+        """Return what `parse` returns for `source`, loading it if it's cached.
+
+        Hits and misses are counted in `metrics` with `kind` as the ``cache``.
+        """
+        path = self._path(kind, source)
+        try:
+            with path.open("rb") as f:
+                value: T = pickle.load(f)  # noqa: S301
+        except (OSError, EOFError, pickle.UnpicklingError):
+            # not cached, or cut short by e.g. a full disk
+            pass
+        else:
+            if metrics is not None:
+                metrics.count("cache_hits", cache=kind)
+            return value
+        if metrics is not None:
+            metrics.count("cache_misses", cache=kind)
+
+        value = parse()
+        # written to a temporary file first, so other processes never load a
+        # half-written entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        tmp_path = Path(tmp)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_path.replace(path)
+        except RecursionError:
+            # too deeply nested to pickle, so it's parsed every time
+            tmp_path.unlink()
+        except BaseException:
+            tmp_path.unlink()
+            raise
+        return value
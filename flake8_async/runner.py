@@ -7,26 +7,95 @@ the AST and letting all registered ERROR_CLASSES do their visit'ing on them.
 from __future__ import annotations
 
 import ast
+import gc
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING
-
-import libcst as cst
+from typing import TYPE_CHECKING, Any
 
 from .base import Error, Options
 from .visitors import (
+    AST_ERROR_CODES,
+    CST_ERROR_CODES,
     ERROR_CLASSES,
     ERROR_CLASSES_CST,
+    load_visitors,
+    snapshot,
     utility_visitors,
     utility_visitors_cst,
 )
-from .visitors.visitor_utility import NoqaHandler
+from .visitors._scopes import Scope
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable, Mapping
+    from collections.abc import Callable, Iterable, Iterator, Mapping
 
     from libcst import Module
 
-    from .visitors.flake8asyncvisitor import Flake8AsyncVisitor, Flake8AsyncVisitor_cst
+    from .visitors._cfg import CFG
+    from .visitors.flake8asyncvisitor import Flake8AsyncVisitor
+    from .visitors.flake8asyncvisitor_cst import Flake8AsyncVisitor_cst
+
+    # node type -> the visitors with a method for it, as indices into the visitors of
+    # a runner, and their methods
+    _DispatchTable = dict[
+        type[ast.AST], tuple[tuple[int, Callable[[Any, Any], object]], ...]
+    ]
+
+
+class FileTimeoutError(Exception):
+    """Raised by `Watchdog.check` when a file takes longer than its budget."""
+
+    def __init__(self, seconds: float, slowest: str, slowest_seconds: float):
+        super().__init__(seconds, slowest, slowest_seconds)
+        self.seconds = seconds
+        self.slowest = slowest
+        self.slowest_seconds = slowest_seconds
+
+
+class Watchdog:
+    """Enforces `--max-seconds-per-file`, tracking the time taken by each visitor.
+
+    Checking is cooperative - the runners, and visitors that visit subtrees
+    themselves, call `check` for every node - so a single slow step, e.g. parsing,
+    can't be interrupted but is stopped after.
+    """
+
+    def __init__(self, seconds: float):
+        super().__init__()
+        self.seconds = seconds
+        self.deadline = time.perf_counter() + seconds
+        self.times: dict[str, float] = {}
+        self._current: str | None = None
+        self._started = 0.0
+
+    def start(self, name: str) -> None:
+        self._current = name
+        self._started = time.perf_counter()
+
+    def stop(self) -> None:
+        assert self._current is not None
+        self.times[self._current] = (
+            self.times.get(self._current, 0.0) + time.perf_counter() - self._started
+        )
+        self._current = None
+
+    @contextmanager
+    def timing(self, name: str) -> Iterator[None]:
+        """Time a step that can't check the budget itself, checking it after."""
+        self.start(name)
+        yield
+        self.stop()
+        self.check()
+
+    def check(self) -> None:
+        now = time.perf_counter()
+        if now <= self.deadline:
+            return
+        times = self.times.copy()
+        if self._current is not None:
+            times[self._current] = times.get(self._current, 0.0) + now - self._started
+        slowest = max(times, key=times.__getitem__, default="parser")
+        raise FileTimeoutError(self.seconds, slowest, times.get(slowest, 0.0))
 
 
 @dataclass
@@ -36,20 +105,41 @@ class SharedState:
     noqas: dict[int, set[str]] = field(default_factory=dict[int, set[str]])
     library: tuple[str, ...] = ()
     typed_calls: dict[str, str] = field(default_factory=dict[str, str])
-    variables: dict[str, str] = field(default_factory=dict[str, str])
+    # types of variables in the current scope, see VisitorTypeTracker
+    variables: Scope = field(default_factory=Scope)
     # Local name -> canonical dotted qualname, populated by VisitorImportTracker[_cst].
     # Helpers consult this so rules can match the canonical qualname regardless of
     # how a symbol was imported (`import x`, `import x as y`, `from x import y`,
     # `from x import y as z`).
     imports: dict[str, str] = field(default_factory=dict[str, str])
+    watchdog: Watchdog | None = None
+    # the file being checked, if known
+    filename: str | None = None
+    # control flow graphs of functions, built when first needed, see `_cfg`
+    cfgs: dict[ast.AST, CFG] = field(default_factory=dict)
+    # dotted names of attribute chains, see `Flake8AsyncVisitor.dotted_name`
+    dotted_names: dict[ast.Attribute, str | None] = field(default_factory=dict)
+    # callbacks to call once a node and its children have been visited, see
+    # `Flake8AsyncVisitor.after_visit`
+    after_visit: dict[ast.AST, list[Callable[[], object]]] = field(default_factory=dict)
 
 
 class __CommonRunner:
     """Common functionality used in both runners."""
 
-    def __init__(self, options: Options):
+    # error code -> visitor module, for the visitors run by this runner
+    error_code_modules: Mapping[str, str]
+
+    def __init__(
+        self,
+        options: Options,
+        watchdog: Watchdog | None = None,
+        filename: str | None = None,
+    ):
         super().__init__()
-        self.state = SharedState(options)
+        self.state = SharedState(options, watchdog=watchdog, filename=filename)
+        # import the modules with the selected visitors, registering them
+        load_visitors(self.selected_codes(options))
 
     def selected(self, error_codes: Mapping[str, str]) -> bool:
         enabled_or_autofix = (
@@ -57,83 +147,185 @@ class __CommonRunner:
         )
         return bool(set(error_codes) & enabled_or_autofix)
 
+    @classmethod
+    def selected_codes(cls, options: Options) -> set[str]:
+        enabled_or_autofix = options.enabled_codes | options.autofix_codes
+        return enabled_or_autofix.intersection(cls.error_code_modules)
+
+    @classmethod
+    def any_selected(cls, options: Options) -> bool:
+        """Whether any visitor run by this runner is enabled, i.e. if it needs to run.
+
+        Utility visitors only collect information for the error visitors, so running
+        the runner is pointless if none are enabled.
+        """
+        return bool(cls.selected_codes(options))
+
+
+# dispatch tables for each tuple of visitor classes, shared by all runners with the
+# same visitors, and built for all node types by `prewarm`
+_dispatch_tables: dict[tuple[type[Flake8AsyncVisitor], ...], _DispatchTable] = {}
+
+
+def _handlers(
+    classes: tuple[type[Flake8AsyncVisitor], ...], node_type: type[ast.AST]
+) -> tuple[tuple[int, Callable[[Any, Any], object]], ...]:
+    method = "visit_" + node_type.__name__
+    return tuple(
+        (i, function)
+        for i, visitor in enumerate(classes)
+        if (function := getattr(visitor, method, None)) is not None
+    )
+
+
+def _node_types(base: type[ast.AST] = ast.AST) -> Iterator[type[ast.AST]]:
+    for node_type in base.__subclasses__():
+        yield node_type
+        yield from _node_types(node_type)
+
 
 class Flake8AsyncRunner(ast.NodeVisitor, __CommonRunner):
-    def __init__(self, options: Options):
-        super().__init__(options)
-        # utility visitors that need to run before the error-checking visitors
-        self.utility_visitors = {v(self.state) for v in utility_visitors}
+    error_code_modules = AST_ERROR_CODES
+
+    def __init__(
+        self,
+        options: Options,
+        watchdog: Watchdog | None = None,
+        filename: str | None = None,
+    ):
+        super().__init__(options, watchdog, filename)
+        self._classes = self.visitor_classes(options)
+        self.visitors = tuple(v(self.state) for v in self._classes)
+        self._dispatch = _dispatch_tables.setdefault(self._classes, {})
+        # visitors that are visiting the current subtree themselves
+        self._skipping: set[Flake8AsyncVisitor] = set()
 
-        self.visitors = {
-            v(self.state) for v in ERROR_CLASSES if self.selected(v.error_codes)
-        }
+    @classmethod
+    def visitor_classes(cls, options: Options) -> tuple[type[Flake8AsyncVisitor], ...]:
+        """Return the utility visitors, then the visitors of the enabled codes.
+
+        Utility visitors run first, as they collect state for the error-checking
+        visitors. Both are sorted by name, so the order is the same in every run.
+        """
+        enabled_or_autofix = options.enabled_codes | options.autofix_codes
+        return (
+            *sorted(snapshot(utility_visitors), key=lambda v: v.__name__),
+            *sorted(
+                (
+                    v
+                    for v in snapshot(ERROR_CLASSES)
+                    if not enabled_or_autofix.isdisjoint(v.error_codes)
+                ),
+                key=lambda v: v.__name__,
+            ),
+        )
 
     @classmethod
-    def run(cls, tree: ast.AST, options: Options) -> Iterable[Error]:
-        runner = cls(options)
+    def run(
+        cls,
+        tree: ast.AST,
+        options: Options,
+        watchdog: Watchdog | None = None,
+        filename: str | None = None,
+    ) -> Iterable[Error]:
+        runner = cls(options, watchdog, filename)
         runner.visit(tree)
         yield from runner.state.problems
 
     def visit(self, node: ast.AST):
-        """Visit a node."""
-        # tracks the subclasses that, from this node on, iterated through it's subfields
-        # we need to remember it so we can restore it at the end of the function.
-        novisit: set[Flake8AsyncVisitor] = set()
-
-        method = "visit_" + node.__class__.__name__
-
-        for subclass in *self.utility_visitors, *self.visitors:
-            # check if subclass has defined a visitor for this type
-            class_method = getattr(subclass, method, None)
-            if class_method is None:
+        """Visit a node, calling the methods for its type of the visitors that have one.
+
+        The visitors with a method for each type of node are looked up once, so
+        nodes that no visitor has a method for, e.g. `ast.Load`, are only descended
+        into. Only visitors whose method was called can have saved state to restore.
+        """
+        watchdog = self.state.watchdog
+        if watchdog is not None:
+            watchdog.check()
+
+        handlers = self._dispatch.get(node.__class__)
+        if handlers is None:
+            handlers = self._dispatch[node.__class__] = _handlers(
+                self._classes, node.__class__
+            )
+        if not handlers:
+            for child in ast.iter_child_nodes(node):
+                self.visit(child)
+            if self.state.after_visit:
+                self._after_visit(node)
+            return
+
+        called: list[Flake8AsyncVisitor] = []
+        # the visitors that, from this node on, iterated through its subfields
+        # themselves, so they don't visit them twice
+        novisit: list[Flake8AsyncVisitor] = []
+        for index, function in handlers:
+            subclass = self.visitors[index]
+            if subclass in self._skipping:
                 continue
 
-            # call it
-            class_method(node)
+            # call it, timing it if there's a time budget
+            if watchdog is None:
+                function(subclass, node)
+            else:
+                watchdog.start(type(subclass).__name__)
+                function(subclass, node)
+                watchdog.stop()
+            called.append(subclass)
 
             # it will set `.novisit` if it has itself handled iterating through subfields
-            # so we add it to our novisit set
             if subclass.novisit:
-                novisit.add(subclass)
+                novisit.append(subclass)
 
-        # Remove all subclasses that iterated through subfields from our list of
-        # visitors, so we don't visit them twice.
-        self.visitors.difference_update(novisit)
-
-        # iterate through subfields using NodeVisitor
-        self.generic_visit(node)
-
-        # reset the novisit flag for the classes in novisit
+        self._skipping.update(novisit)
+        for child in ast.iter_child_nodes(node):
+            self.visit(child)
         for subclass in novisit:
             subclass.novisit = False
-
-        # and add them back to our visitors
-        self.visitors.update(novisit)
+        self._skipping.difference_update(novisit)
 
         # restore any outer state that was saved in the visitor method
-        for subclass in *self.utility_visitors, *self.visitors:
-            subclass.set_state(subclass.outer.pop(node, {}))
+        for subclass in called:
+            if subclass.frames and subclass.frames[-1].node is node:
+                subclass.restore_state(node)
+        if self.state.after_visit:
+            self._after_visit(node)
+
+    def _after_visit(self, node: ast.AST):
+        for callback in self.state.after_visit.pop(node, ()):
+            callback()
 
 
 class Flake8AsyncRunner_cst(__CommonRunner):
-    def __init__(self, options: Options, module: Module):
-        super().__init__(options)
+    error_code_modules = CST_ERROR_CODES
+
+    def __init__(
+        self,
+        options: Options,
+        module: Module,
+        watchdog: Watchdog | None = None,
+        filename: str | None = None,
+    ):
+        super().__init__(options, watchdog, filename)
         self.options = options
         self.noqas: dict[int, set[str]] = {}
 
-        utility_visitors = utility_visitors_cst.copy()
-        if self.options.disable_noqa:
-            utility_visitors.remove(NoqaHandler)
+        # imported here, as it needs libcst which is only loaded if cst visitors run
+        from .visitors.visitor_utility_cst import NoqaHandler  # noqa: PLC0415
 
         # Could possibly enable/disable utility visitors here, if visitors declared
         # dependencies
         self.utility_visitors: tuple[Flake8AsyncVisitor_cst, ...] = tuple(
-            v(self.state) for v in utility_visitors
+            v(self.state)
+            for v in snapshot(utility_visitors_cst)
+            if not (self.options.disable_noqa and v is NoqaHandler)
         )
 
         # sort the error classes to get predictable behaviour when multiple autofixers
         # are enabled
-        sorted_error_classes_cst = sorted(ERROR_CLASSES_CST, key=lambda x: x.__name__)
+        sorted_error_classes_cst = sorted(
+            snapshot(ERROR_CLASSES_CST), key=lambda x: x.__name__
+        )
         self.visitors: tuple[Flake8AsyncVisitor_cst, ...] = tuple(
             v(self.state)
             for v in sorted_error_classes_cst
@@ -142,7 +334,12 @@ class Flake8AsyncRunner_cst(__CommonRunner):
         self.module = module
 
     def run(self) -> Iterable[Error]:
+        import libcst as cst  # noqa: PLC0415
+
+        watchdog = self.state.watchdog
         for v in (*self.utility_visitors, *self.visitors):
+            if watchdog is not None:
+                watchdog.start(type(v).__name__)
             # The default deepcopy guards against the same CST node object
             # appearing at two positions in the tree (metadata is keyed by node
             # identity). Parser output and the result of a prior .visit() never
@@ -151,6 +348,8 @@ class Flake8AsyncRunner_cst(__CommonRunner):
             self.module = cst.MetadataWrapper(self.module, unsafe_skip_copy=True).visit(
                 v
             )
+            if watchdog is not None:
+                watchdog.stop()
 
         yield from self.state.problems
 
@@ -158,3 +357,46 @@ class Flake8AsyncRunner_cst(__CommonRunner):
         # ast problems
         if not self.options.disable_noqa:
             self.noqas = v.noqas  # type: ignore[reportUnboundVariable]
+
+
+_frozen = False
+
+
+def prewarm(options: Options, *, freeze: bool = False) -> None:
+    """Do the setup shared by all files, once options are parsed.
+
+    flake8 parses options before forking its ``--jobs`` workers, so anything done
+    here is inherited by all workers instead of being redone by each of them:
+    importing the selected visitors (and with them libcst if needed), building the
+    dispatch table of the ast visitors, and compiling the option patterns. With
+    `freeze`, everything allocated so far is then frozen, so the garbage collector
+    in the workers doesn't touch it and the memory stays shared copy-on-write.
+    That's only useful right before forking, as it keeps all frozen garbage alive.
+    """
+    global _frozen  # noqa: PLW0603
+    load_visitors(
+        Flake8AsyncRunner.selected_codes(options)
+        | Flake8AsyncRunner_cst.selected_codes(options)
+    )
+    classes = Flake8AsyncRunner.visitor_classes(options)
+    table = _dispatch_tables.setdefault(classes, {})
+    for node_type in _node_types():
+        if node_type not in table:
+            table[node_type] = _handlers(classes, node_type)
+    from .blocking_rules import blocking_calls  # noqa: PLC0415
+    from .visitors.helpers import compile_patterns  # noqa: PLC0415
+
+    for patterns in (
+        options.no_checkpoint_warning_decorators,
+        options.transform_async_generator_decorators,
+        options.exception_suppress_context_managers,
+        options.startable_in_context_manager,
+    ):
+        compile_patterns(tuple(patterns))
+    blocking_calls(options)
+
+    # objects are only moved to the permanent generation, so freezing more than
+    # once would keep any garbage from between the calls alive for good
+    if freeze and not _frozen:
+        gc.freeze()
+        _frozen = True
@@ -0,0 +1,170 @@
+"""Implements ``--shard`` and ``merge``, for splitting a run across several machines.
+
+Each machine runs ``flake8-async --shard K/N --format=json`` on the same list of
+files, and checks the files assigned to shard K. The JSON reports are then combined
+with ``flake8-async merge``, which prints them as a single run would and exits with
+the same exit code.
+
+Files are assigned to shards by a stable hash of their name, or if given a report
+from an earlier run with ``--shard-costs``, by balancing the time spent on each
+shard. All shards must be given the same files and the same costs report.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import sys
+import zlib
+from argparse import ArgumentParser
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping, Sequence
+
+    from .base import Error
+
+# bump if the format of reports changes incompatibly
+REPORT_VERSION = 2
+
+
+def _stable_hash(filename: str) -> int:
+    # `hash()` is randomized between processes, so can't be used across machines
+    return zlib.crc32(os.path.normpath(filename).encode())
+
+
+def select_shard(
+    filenames: Sequence[str],
+    index: int,
+    count: int,
+    costs: Mapping[str, float] | None = None,
+) -> list[str]:
+    """Return the files in shard `index` of `count`, in their original order.
+
+    Without `costs` files are assigned by hash. With `costs` files are assigned
+    from most to least expensive to the currently cheapest shard, with files not
+    in `costs` assumed to have the median cost.
+    """
+    if not costs:
+        return [f for f in filenames if _stable_hash(f) % count == index - 1]
+
+    known = [
+        costs[os.path.normpath(f)] for f in filenames if os.path.normpath(f) in costs
+    ]
+    default_cost = statistics.median(known) if known else 1.0
+
+    def cost(filename: str) -> float:
+        return costs.get(os.path.normpath(filename), default_cost)
+
+    loads = [0.0] * count
+    selected: set[str] = set()
+    for filename in sorted(
+        set(filenames), key=lambda f: (-cost(f), _stable_hash(f), f)
+    ):
+        shard = min(range(count), key=loads.__getitem__)
+        loads[shard] += cost(filename)
+        if shard == index - 1:
+            selected.add(filename)
+    return [f for f in filenames if f in selected]
+
+
+def error_to_json(error: Error) -> dict[str, Any]:
+    return {
+        "line": error.line,
+        # one-indexed, same as when printed
+        "col": error.col + 1,
+        "code": error.code,
+        "message": error.message.format(*error.args),
+        # for sorting merged errors as `Error` sorts them
+        "args": list(error.args),
+    }
+
+
+def _error_key(error: Mapping[str, Any]) -> tuple[object, ...]:
+    # the same order as `Error.cmp`, with the formatted message for the template
+    return (error["line"], error["code"], error["args"], error["message"], error["col"])
+
+
+def write_report(
+    results: Mapping[str, tuple[list[dict[str, Any]], float]], file: Any = None
+) -> None:
+    """Write errors and time taken for each file as JSON, to stdout by default."""
+    report = {
+        "version": REPORT_VERSION,
+        "files": {
+            filename: {"errors": errors, "seconds": round(seconds, 6)}
+            for filename, (errors, seconds) in results.items()
+        },
+    }
+    json.dump(report, file or sys.stdout, indent=1)
+    print(file=file or sys.stdout)
+
+
+def load_report(path: str) -> dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    if report.get("version") != REPORT_VERSION:
+        raise ValueError(
+            f"{path} is not a flake8-async report of version {REPORT_VERSION}"
+        )
+    return report["files"]
+
+
+def load_costs(path: str) -> dict[str, float]:
+    """Read the time spent on each file from a report, for balancing shards."""
+    return {
+        os.path.normpath(filename): result["seconds"]
+        for filename, result in load_report(path).items()
+    }
+
+
+def merge_reports(paths: Iterable[str]) -> dict[str, Any]:
+    files: dict[str, Any] = {}
+    for path in paths:
+        for filename, result in load_report(path).items():
+            if filename in files:
+                print(
+                    f"warning: {filename} is in several reports, are all shards"
+                    " given the same files?",
+                    file=sys.stderr,
+                )
+            files[filename] = result
+    return dict(sorted(files.items()))
+
+
+def merge(argv: Sequence[str]) -> int:
+    """Entry point for ``flake8-async merge``."""
+    parser = ArgumentParser(
+        prog="flake8-async merge",
+        description="Combine JSON reports from `--shard` runs into one report.",
+    )
+    parser.add_argument("reports", nargs="+", metavar="report")
+    parser.add_argument(
+        "--format",
+        choices=("text", "json"),
+        default="text",
+        help="Print errors as text, or write a combined JSON report.",
+    )
+    args = parser.parse_args(argv)
+    try:
+        files = merge_reports(args.reports)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    any_error = any(result["errors"] for result in files.values())
+    if args.format == "json":
+        write_report(
+            {
+                filename: (result["errors"], result["seconds"])
+                for filename, result in files.items()
+            }
+        )
+    else:
+        for filename, result in files.items():
+            for error in sorted(result["errors"], key=_error_key):
+                print(
+                    f"{filename}:{error['line']}:{error['col']}:"
+                    f" {error['code']} {error['message']}"
+                )
+    return 1 if any_error else 0
@@ -0,0 +1,161 @@
+"""Implements ``--split-lines``, checking the definitions in large files in parallel.
+
+A file with more lines than the limit is split into chunks of consecutive top-level
+statements, each of at least that many lines unless it's the last, and the chunks
+are checked in worker processes. Each worker is given the source with the lines of
+other chunks blanked out, so errors keep their positions, except for the
+module-level statements - imports, assignments, etc. - of the whole file. Those are
+checked with every chunk, so the import, library and variable tracking, and checks
+with module-level state like ASYNC240's ``from os.path import ...``, see what they'd
+see checking the whole file. Only errors on the lines of the chunk itself are kept.
+
+Function and class definitions are never split, so a file that's a single huge
+class is checked in one chunk. Files where a check may carry state from one
+definition to the next aren't split, see `shares_state`, nor are files when
+autofixing, as the fixes of all chunks would have to be merged, or when profiling
+memory.
+"""
+
+from __future__ import annotations
+
+import ast
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import TYPE_CHECKING
+
+from . import TIMEOUT_CODE
+from .checker import _check_source, _init_worker, _WorkerPool
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Sequence
+
+    from .base import Error, Options
+
+_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+_lock = threading.Lock()
+_executor: _WorkerPool | None = None
+# the options the workers of `_executor` were created with
+_executor_options: Options | None = None
+
+
+def _first_line(node: ast.stmt) -> int:
+    # decorators are on the lines before a definition
+    decorators = getattr(node, "decorator_list", ())
+    return min([node.lineno, *(d.lineno for d in decorators)])
+
+
+def split_chunks(
+    tree: ast.Module, max_lines: int, line_count: int
+) -> list[tuple[int, int]]:
+    """Return the first and last line of each chunk, see the module docstring.
+
+    Chunks cover all lines, with lines between statements in the chunk before.
+    """
+    chunks: list[tuple[int, int]] = []
+    start = 1
+    for previous, node in zip(tree.body, tree.body[1:]):
+        first = _first_line(node)
+        assert previous.end_lineno is not None
+        # statements can share a line, e.g. `import os; import sys`
+        if first > previous.end_lineno and first - start >= max_lines:
+            chunks.append((start, first - 1))
+            start = first
+    chunks.append((start, line_count))
+    return chunks
+
+
+def shares_state(source: str, options: Options) -> bool:
+    """Return whether checking `source` may carry state from one definition to the next.
+
+    ASYNC113 reports a ``.start_soon()`` call in an ``@asynccontextmanager`` function
+    at the next ``yield`` it visits, which may be in a later definition.
+    """
+    return (
+        "ASYNC113" in options.enabled_codes
+        and "asynccontextmanager" in source
+        and ("start_soon" in source or "create_task" in source)
+    )
+
+
+def module_lines(tree: ast.Module, line_count: int) -> list[bool]:
+    """Return whether each line, from 1, is in a module-level statement to keep.
+
+    Index 0 is unused. All statements that aren't definitions are kept.
+    """
+    keep = [False] * (line_count + 1)
+    for node in tree.body:
+        if not isinstance(node, _DEFINITIONS):
+            assert node.end_lineno is not None
+            first = _first_line(node)
+            keep[first : node.end_lineno + 1] = [True] * (node.end_lineno + 1 - first)
+    return keep
+
+
+def chunk_source(
+    lines: Sequence[str], module: Sequence[bool], start: int, end: int
+) -> str:
+    """Return the source for checking lines `start` to `end`, see the module docstring.
+
+    `module` is the result of `module_lines` for the file.
+    """
+    return "".join(
+        line if start <= lineno <= end or module[lineno] else "\n"
+        for lineno, line in enumerate(lines, start=1)
+    )
+
+
+def _get_executor(options: Options) -> _WorkerPool:
+    global _executor, _executor_options  # noqa: PLW0603
+    with _lock:
+        if _executor is None or _executor_options is not options:
+            if _executor is not None:
+                _executor.shutdown()
+            # the workers check chunks as whole files, and only report errors
+            worker_options = replace(
+                options, split_lines=None, memory_profile=None, metrics=None
+            )
+            workers = os.cpu_count() or 1
+            _executor = _WorkerPool(
+                ProcessPoolExecutor,
+                workers,
+                options.max_seconds_per_file,
+                _init_worker,
+                (worker_options,),
+            )
+            _executor_options = options
+        return _executor
+
+
+def check_split(
+    source: str, tree: ast.Module, filename: str | None, options: Options
+) -> Iterator[Error]:
+    """Check `source` in chunks of `options.split_lines` lines in worker processes."""
+    assert options.split_lines is not None
+    # split on the same newlines as the parser
+    lines = io.StringIO(source, newline="").readlines()
+    module = module_lines(tree, len(lines))
+    executor = _get_executor(options)
+    tasks = [
+        (
+            start,
+            end,
+            executor.submit(
+                _check_source, chunk_source(lines, module, start, end), filename
+            ),
+        )
+        for start, end in split_chunks(tree, options.split_lines, len(lines))
+    ]
+    timed_out = False
+    for start, end, task in tasks:
+        for error in executor.result(task):
+            if error.code == TIMEOUT_CODE:
+                # reported once, naming the slowest visitor of the first chunk
+                if not timed_out:
+                    timed_out = True
+                    yield error
+            elif start <= error.line <= end:
+                yield error
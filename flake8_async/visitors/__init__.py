@@ -1,43 +1,79 @@
-# pyright: reportUnusedImport=false
 """Submodule for all error classes/visitors.
 
-Exports ERROR_CLASSES and default_disabled_error_codes to be used by others, and populates
-them by importing all files with visitor classes (which needs to manually maintained).
+Exports ERROR_CLASSES and default_disabled_error_codes to be used by others.
+ERROR_CLASSES are populated by importing the files with visitor classes, which is done
+lazily with `load_visitors` so only the visitors for enabled codes are imported.
 """
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import threading
+from typing import TYPE_CHECKING, TypeVar
+
+from ._registry import (
+    AST_ERROR_CODES,
+    CST_ERROR_CODES,
+    DEFAULT_DISABLED_ERROR_CODES,
+    UTILITY_MODULES,
+    UTILITY_MODULES_CST,
+)
 
 if TYPE_CHECKING:
-    from .flake8asyncvisitor import Flake8AsyncVisitor, Flake8AsyncVisitor_cst
+    from collections.abc import Iterable
+
+    from .flake8asyncvisitor import Flake8AsyncVisitor
+    from .flake8asyncvisitor_cst import Flake8AsyncVisitor_cst
+
+T = TypeVar("T")
 
 __all__ = [
+    "AST_ERROR_CODES",
+    "CST_ERROR_CODES",
     "ERROR_CLASSES",
     "ERROR_CLASSES_CST",
     "default_disabled_error_codes",
+    "load_visitors",
+    "snapshot",
     "utility_visitors",
     "utility_visitors_cst",
 ]
 ERROR_CLASSES: set[type[Flake8AsyncVisitor]] = set()
 ERROR_CLASSES_CST: set[type[Flake8AsyncVisitor_cst]] = set()
-default_disabled_error_codes: list[str] = []
+default_disabled_error_codes: list[str] = list(DEFAULT_DISABLED_ERROR_CODES)
 utility_visitors: set[type[Flake8AsyncVisitor]] = set()
 utility_visitors_cst: set[type[Flake8AsyncVisitor_cst]] = set()
 
-# Import all files with visitors so their decorators run, filling the above containers
-# This has to be done at the end to avoid circular imports
-from . import (
-    visitor2xx,
-    visitor4xx,
-    visitor91x,
-    visitor101,
-    visitor102_120,
-    visitor103_104,
-    visitor105,
-    visitor111,
-    visitor118,
-    visitor123,
-    visitor_utility,
-    visitors,
-)
+_loaded_modules: set[str] = set()
+# held while visitor modules are imported, as that adds to the above containers
+_lock = threading.Lock()
+
+
+def load_visitors(codes: Iterable[str] | None = None) -> None:
+    """Import the visitor modules for `codes`, or all visitor modules if None.
+
+    Importing a module runs the decorators on its visitors, adding them to the
+    above containers. Utility visitors are always loaded, cst ones only with cst
+    visitors so libcst isn't imported for ast visitors. Use `snapshot` to
+    iterate the containers while another thread may be loading visitors.
+    """
+    codes = {*AST_ERROR_CODES, *CST_ERROR_CODES} if codes is None else set(codes)
+    modules = {
+        module
+        for code in codes
+        if (module := AST_ERROR_CODES.get(code) or CST_ERROR_CODES.get(code))
+    }
+    modules.update(UTILITY_MODULES)
+    if not codes.isdisjoint(CST_ERROR_CODES):
+        modules.update(UTILITY_MODULES_CST)
+    with _lock:
+        for module in sorted(modules - _loaded_modules):
+            # not using importlib.import_module, as those imports are not included
+            # in the output of `python -X importtime`
+            __import__(f"{__name__}.{module}")
+            _loaded_modules.add(module)
+
+
+def snapshot(visitors: set[T]) -> tuple[T, ...]:
+    """Return the visitors in one of the above containers, as they are now."""
+    with _lock:
+        return tuple(visitors)
@@ -10,11 +10,11 @@ from __future__ import annotations
 import ast
 from typing import TYPE_CHECKING
 
-import libcst as cst
-
 if TYPE_CHECKING:
     from collections.abc import Mapping
 
+    import libcst as cst
+
 
 # Resolve a Name/Attribute/Call node to a dotted qualname via `imports`
 # (local-name -> canonical dotted qualname). The root Name falls back to its own
@@ -40,7 +40,26 @@ def _resolve_attr_chain_ast(node: ast.AST, imports: Mapping[str, str]) -> str |
     return None
 
 
+# The dotted name of a Name, or of an Attribute chain on one, e.g. "trio.Cancelled".
+# Equal to `ast.unparse(node)` for those shapes, but without pretty-printing the
+# subtree, so rules comparing names can give up quickly on anything else.
+def dotted_name(node: ast.AST) -> str | None:
+    if isinstance(node, ast.Name):
+        return node.id
+    attrs: list[str] = []
+    while isinstance(node, ast.Attribute):
+        attrs.append(node.attr)
+        node = node.value
+    if not attrs or not isinstance(node, ast.Name):
+        return None
+    attrs.append(node.id)
+    return ".".join(reversed(attrs))
+
+
+# libcst is only imported when these are called, so it isn't loaded by ast visitors
 def resolve_canonical_cst(node: cst.CSTNode, imports: Mapping[str, str]) -> str | None:
+    import libcst as cst  # noqa: PLC0415
+
     if isinstance(node, cst.Call):
         return resolve_canonical_cst(node.func, imports)
     return _resolve_attr_chain_cst(node, imports)
@@ -49,6 +68,8 @@ def resolve_canonical_cst(node: cst.CSTNode, imports: Mapping[str, str]) -> str
 def _resolve_attr_chain_cst(
     node: cst.CSTNode, imports: Mapping[str, str]
 ) -> str | None:
+    import libcst as cst  # noqa: PLC0415
+
     if isinstance(node, cst.Name):
         return imports.get(node.value, node.value)
     if isinstance(node, cst.Attribute):
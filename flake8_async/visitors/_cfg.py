@@ -0,0 +1,339 @@
+"""Control flow graphs of the statements in a function, for flow-sensitive checks.
+
+A graph is built the first time a check asks for it, and cached in the shared state
+so every check of the same function uses the same graph, see
+``Flake8AsyncVisitor.cfg``. Checks are then queries on the graph, e.g. which
+statements can be reached from the start of an ``except`` block without raising.
+
+Nodes are the statements of the function, with compound statements standing for
+evaluating their condition (or iterable, context managers, etc.) - their bodies are
+nodes of their own. Nested functions and classes are single nodes, with graphs of
+their own. Some synthetic nodes mark where control goes other than the next
+statement: ``EXIT`` for returning, ``RAISE`` for an exception leaving the function,
+and a `HandlerExit` after each ``except`` block. Returns, breaks and continues
+also have edges to the statement after them, only followed when asked for, for checks
+that treat them as if they weren't there.
+
+Every statement in a ``try`` body is assumed to be able to raise any exception, so
+it has edges to each of the handlers, and exceptions are assumed to be able to
+propagate past handlers. A ``finally`` block is only built once, so control can go
+from it to wherever any of the paths entering it was going.
+"""
+
+from __future__ import annotations
+
+import ast
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from .helpers import iter_guaranteed_once
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Sequence
+
+
+class _Sentinel:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str):
+        super().__init__()
+        self.name = name
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return self.name
+
+
+EXIT = _Sentinel("EXIT")
+RAISE = _Sentinel("RAISE")
+
+
+@dataclass(eq=False)
+class HandlerExit:
+    """Reached when the end of `handler`'s body is reached."""
+
+    handler: ast.ExceptHandler
+
+
+@dataclass(eq=False)
+class _Synthetic:
+    # re-evaluating the iterable of a loop, or entering a finally block
+    node: ast.AST
+
+
+@dataclass(eq=False)
+class _FallThrough:
+    # a return/break/continue, or the end of a finally block only reached by them,
+    # standing for the statement after it
+    node: Node
+
+
+if TYPE_CHECKING:
+    Node = ast.AST | _Sentinel | HandlerExit | _Synthetic
+    # where control can come from
+    _Pred = Node | _FallThrough
+
+# fields of statements with nested statements, which are nodes of their own
+_BODY_FIELDS = frozenset({"body", "orelse", "finalbody", "handlers", "cases"})
+_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+@dataclass(eq=False)
+class CFG:
+    """Control flow graph of the body of a function, class or module."""
+
+    successors: dict[Node, list[Node]] = field(default_factory=dict)
+    # the statement evaluating an expression, for expressions that control flow
+    # depends on: yields and awaits
+    statement_of: dict[ast.expr, ast.stmt] = field(default_factory=dict)
+    # the loop a `break` or `continue` belongs to
+    loop_of: dict[ast.stmt, ast.stmt] = field(default_factory=dict)
+    # the nodes in the body of each `except` block, including nested statements
+    handler_nodes: dict[ast.ExceptHandler, set[Node]] = field(default_factory=dict)
+    handler_exit: dict[ast.ExceptHandler, HandlerExit] = field(default_factory=dict)
+    # the statements after each return/break/continue, as if it wasn't there
+    fall_through: dict[Node, list[Node]] = field(default_factory=dict)
+
+    def reachable(
+        self,
+        start: Node,
+        within: set[Node] | None = None,
+        *,
+        fall_through: bool = False,
+    ) -> set[Node]:
+        """Nodes that can be reached from `start`, optionally without leaving `within`.
+
+        Nodes just outside `within` are included, but not followed. With
+        `fall_through`, returns, breaks and continues also go on to the next
+        statement.
+        """
+        seen = {start}
+        todo = [start]
+        while todo:
+            node = todo.pop()
+            successors = self.successors.get(node, [])
+            if fall_through and node in self.fall_through:
+                successors = successors + self.fall_through[node]
+            for succ in successors:
+                if succ not in seen:
+                    seen.add(succ)
+                    if within is None or succ in within:
+                        todo.append(succ)
+        return seen
+
+
+def _own_expressions(stmt: ast.stmt) -> Iterator[ast.expr]:
+    """Expressions evaluated by `stmt` itself, not by nested statements or scopes."""
+    if isinstance(stmt, _SCOPES):
+        return
+    todo: list[ast.AST] = [
+        child
+        for name, value in ast.iter_fields(stmt)
+        if name not in _BODY_FIELDS
+        for child in (value if isinstance(value, list) else [value])
+        if isinstance(child, ast.AST)
+    ]
+    while todo:
+        node = todo.pop()
+        if isinstance(node, ast.expr):
+            yield node
+        if not isinstance(node, _SCOPES):
+            todo.extend(ast.iter_child_nodes(node))
+
+
+@dataclass(eq=False)
+class _Loop:
+    node: ast.stmt
+    continue_target: Node
+    breaks: list[_Pred] = field(default_factory=list)
+
+
+@dataclass(eq=False)
+class _Finally:
+    entry: _Synthetic
+    # kinds of jumps, "return"/"break"/"continue", that pass through the block
+    jumps: set[str] = field(default_factory=set)
+
+
+class _Builder:
+    def __init__(self):
+        super().__init__()
+        self.cfg = CFG()
+        # nodes an exception raised by the current statement can go to
+        self.raise_targets: list[Node] = [RAISE]
+        # enclosing loops and finally blocks, innermost last
+        self.frames: list[_Loop | _Finally] = []
+        # enclosing handlers, whose bodies the current statement is in
+        self.handlers: list[ast.ExceptHandler] = []
+
+    def edge(self, sources: Iterable[_Pred], target: Node) -> None:
+        for source in sources:
+            if isinstance(source, _FallThrough):
+                self.cfg.fall_through.setdefault(source.node, []).append(target)
+            else:
+                self.cfg.successors.setdefault(source, []).append(target)
+
+    def add(self, preds: Iterable[_Pred], node: Node) -> None:
+        self.edge(preds, node)
+        self.cfg.successors.setdefault(node, [])
+        for handler in self.handlers:
+            self.cfg.handler_nodes[handler].add(node)
+
+    def jump(self, sources: Sequence[_Pred], kind: str) -> None:
+        """Go from `sources` to where a return/break/continue goes."""
+        for frame in reversed(self.frames):
+            if isinstance(frame, _Finally):
+                self.edge(sources, frame.entry)
+                frame.jumps.add(kind)
+                return
+            if kind == "break":
+                frame.breaks.extend(sources)
+                return
+            if kind == "continue":
+                self.edge(sources, frame.continue_target)
+                return
+        self.edge(sources, EXIT)
+
+    def raise_(self, sources: Sequence[_Pred]) -> None:
+        for target in self.raise_targets:
+            self.edge(sources, target)
+
+    def body(self, stmts: Sequence[ast.stmt], preds: list[_Pred]) -> list[_Pred]:
+        """Add `stmts`, and return the nodes that go on to the next statement."""
+        for stmt in stmts:
+            preds = self.stmt(stmt, preds)
+        return preds
+
+    def stmt(self, stmt: ast.stmt, preds: list[_Pred]) -> list[_Pred]:
+        self.add(preds, stmt)
+        for expr in _own_expressions(stmt):
+            if isinstance(expr, (ast.Yield, ast.YieldFrom, ast.Await)):
+                self.cfg.statement_of[expr] = stmt
+        # anything can raise, e.g. KeyboardInterrupt or Cancelled
+        self.raise_([stmt])
+
+        handler = getattr(self, f"stmt_{type(stmt).__name__}", None)
+        if handler is None:
+            return [stmt]
+        return handler(stmt)
+
+    def stmt_Raise(self, stmt: ast.Raise) -> list[_Pred]:
+        return []
+
+    def stmt_Return(self, stmt: ast.Return) -> list[_Pred]:
+        self.jump([stmt], "return")
+        return [_FallThrough(stmt)]
+
+    def stmt_Break(self, stmt: ast.Break | ast.Continue) -> list[_Pred]:
+        loop = next((f for f in reversed(self.frames) if isinstance(f, _Loop)), None)
+        if loop is not None:
+            self.cfg.loop_of[stmt] = loop.node
+        self.jump([stmt], type(stmt).__name__.lower())
+        return [_FallThrough(stmt)]
+
+    stmt_Continue = stmt_Break
+
+    def stmt_If(self, stmt: ast.If) -> list[_Pred]:
+        return self.body(stmt.body, [stmt]) + self.body(stmt.orelse, [stmt])
+
+    def stmt_With(self, stmt: ast.With | ast.AsyncWith) -> list[_Pred]:
+        return self.body(stmt.body, [stmt])
+
+    stmt_AsyncWith = stmt_With
+
+    def stmt_While(self, stmt: ast.While) -> list[_Pred]:
+        try:
+            infinite = bool(ast.literal_eval(stmt.test))
+        except Exception:
+            infinite = False
+        loop = _Loop(stmt, continue_target=stmt)
+        self.frames.append(loop)
+        self.edge(self.body(stmt.body, [stmt]), stmt)
+        self.frames.pop()
+        exits = [] if infinite else self.body(stmt.orelse, [stmt])
+        return exits + loop.breaks
+
+    def stmt_For(self, stmt: ast.For | ast.AsyncFor) -> list[_Pred]:
+        # the first iteration is entered from the statement, later ones from `next`
+        next_ = _Synthetic(stmt)
+        self.add([], next_)
+        loop = _Loop(stmt, continue_target=next_)
+        self.frames.append(loop)
+        self.edge(self.body(stmt.body, [stmt, next_]), next_)
+        self.frames.pop()
+        preds: list[_Pred] = [next_]
+        if not iter_guaranteed_once(stmt.iter):
+            preds.append(stmt)
+        return self.body(stmt.orelse, preds) + loop.breaks
+
+    stmt_AsyncFor = stmt_For
+
+    def stmt_Match(self, stmt: ast.Match) -> list[_Pred]:  # type: ignore[name-defined]
+        ends: list[_Pred] = []
+        has_fallback = False
+        for case in stmt.cases:
+            # `case _:` or `case name:`
+            has_fallback |= (
+                case.guard is None
+                and isinstance(case.pattern, ast.MatchAs)  # type: ignore[attr-defined]
+                and case.pattern.pattern is None
+            )
+            ends += self.body(case.body, [stmt])
+        return ends if has_fallback else [*ends, stmt]
+
+    def stmt_Try(self, stmt: ast.Try | ast.TryStar) -> list[_Pred]:  # type: ignore[name-defined]
+        outer_targets = self.raise_targets
+        fin: _Finally | None = None
+        if stmt.finalbody:
+            fin = _Finally(_Synthetic(stmt))
+            self.add([], fin.entry)
+            self.frames.append(fin)
+            # exceptions not handled go through the finally block
+            self.raise_targets = [fin.entry]
+        unhandled_targets = self.raise_targets
+
+        # exceptions in the body can be handled, or go on
+        self.raise_targets = [*unhandled_targets, *stmt.handlers]
+        ends = self.body(stmt.body, [stmt])
+        self.raise_targets = unhandled_targets
+        ends = self.body(stmt.orelse, ends)
+
+        for handler in stmt.handlers:
+            self.cfg.handler_nodes[handler] = set()
+            self.add([], handler)
+            self.handlers.append(handler)
+            handler_ends = self.body(handler.body, [handler])
+            self.handlers.pop()
+            exit_ = self.cfg.handler_exit[handler] = HandlerExit(handler)
+            self.add(handler_ends, exit_)
+            ends.append(exit_)
+
+        self.raise_targets = outer_targets
+        if fin is None:
+            return ends
+
+        self.frames.pop()
+        self.edge(ends, fin.entry)
+        fin_ends = self.body(stmt.finalbody, [fin.entry])
+        # re-raise exceptions, and go on with the jumps that went through the block
+        self.raise_(fin_ends)
+        for kind in sorted(fin.jumps):
+            self.jump(fin_ends, kind)
+        if not ends:
+            return []
+        if any(not isinstance(end, _FallThrough) for end in ends):
+            return fin_ends
+        return [
+            end if isinstance(end, _FallThrough) else _FallThrough(end)
+            for end in fin_ends
+        ]
+
+    stmt_TryStar = stmt_Try
+
+
+def build_cfg(
+    scope: ast.Module | ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef,
+) -> CFG:
+    """Build the control flow graph of the body of `scope`."""
+    builder = _Builder()
+    builder.jump(builder.body(scope.body, [scope]), "return")
+    return builder.cfg
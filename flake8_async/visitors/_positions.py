@@ -0,0 +1,63 @@
+"""Position metadata that is only computed if a visitor asks for it.
+
+libcst resolves all metadata up front when a ``MetadataWrapper`` visits a module,
+which for ``PositionProvider`` means generating the code for the whole module
+with position tracking. Positions are only read when emitting an error, checking
+for a ``noqa`` comment, or recording the location of a statement in ``Visitor91X``,
+so most passes over clean files never need them.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, cast
+
+from libcst.metadata import PositionProvider
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    import libcst as cst
+    from libcst.metadata import CodeRange, MetadataWrapper
+
+
+class _LazyPositions(Mapping["cst.CSTNode", "CodeRange"]):
+    """Positions for all nodes in a module, computed on first access."""
+
+    def __init__(self, wrapper: MetadataWrapper):
+        super().__init__()
+        self._wrapper: MetadataWrapper | None = wrapper
+        self._positions: Mapping[cst.CSTNode, CodeRange] | None = None
+
+    @property
+    def positions(self) -> Mapping[cst.CSTNode, CodeRange]:
+        if self._positions is None:
+            assert self._wrapper is not None
+            self._positions = cast(
+                "Mapping[cst.CSTNode, CodeRange]",
+                PositionProvider()._gen(self._wrapper),
+            )
+            self._wrapper = None
+        return self._positions
+
+    def __getitem__(self, node: cst.CSTNode) -> CodeRange:
+        return self.positions[node]
+
+    def __iter__(self) -> Iterator[cst.CSTNode]:
+        return iter(self.positions)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+class LazyPositionProvider(PositionProvider):
+    """Drop-in replacement for `PositionProvider` that defers the computation.
+
+    All positions are computed together the first time any is accessed in a pass,
+    since libcst can only compute them by generating code for the whole module.
+    """
+
+    def _gen(  # type: ignore[override]
+        self, wrapper: MetadataWrapper
+    ) -> Mapping[cst.CSTNode, CodeRange]:
+        return _LazyPositions(wrapper)
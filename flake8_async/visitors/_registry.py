@@ -0,0 +1,80 @@
+"""Static table of the module that defines the visitor for each error code.
+
+This lets the runners import only the visitor modules needed for the enabled codes,
+instead of importing every visitor module (and libcst) when the plugin is loaded.
+``tests/test_all_visitors_imported.py`` checks that it matches the registered
+visitors, and prints the updated table if it does not.
+"""
+
+from __future__ import annotations
+
+# error code -> module in flake8_async.visitors with the ast visitor for it
+AST_ERROR_CODES: dict[str, str] = {
+    "ASYNC102": "visitor102_120",
+    "ASYNC103": "visitor103_104",
+    "ASYNC104": "visitor103_104",
+    "ASYNC105": "visitor105",
+    "ASYNC106": "visitors",
+    "ASYNC109": "visitors",
+    "ASYNC110": "visitors",
+    "ASYNC111": "visitor111",
+    "ASYNC112": "visitors",
+    "ASYNC113": "visitors",
+    "ASYNC114": "visitors",
+    "ASYNC115": "visitors",
+    "ASYNC116": "visitors",
+    "ASYNC118": "visitor118",
+    "ASYNC119": "visitors",
+    "ASYNC120": "visitor102_120",
+    "ASYNC121": "visitors",
+    "ASYNC122": "visitors",
+    "ASYNC123": "visitor123",
+    "ASYNC125": "visitors",
+    "ASYNC126": "visitors",
+    "ASYNC127": "visitors",
+    "ASYNC128": "visitors",
+    "ASYNC200": "visitor2xx",
+    "ASYNC210": "visitor2xx",
+    "ASYNC211": "visitor2xx",
+    "ASYNC212": "visitor2xx",
+    "ASYNC220": "visitor2xx",
+    "ASYNC221": "visitor2xx",
+    "ASYNC222": "visitor2xx",
+    "ASYNC230": "visitor2xx",
+    "ASYNC231": "visitor2xx",
+    "ASYNC232": "visitor2xx",
+    "ASYNC240": "visitor2xx",
+    "ASYNC250": "visitor2xx",
+    "ASYNC251": "visitor2xx",
+    "ASYNC400": "visitor4xx",
+    "ASYNC401": "visitor4xx",
+    "ASYNC900": "visitors",
+}
+
+# error code -> module in flake8_async.visitors with the cst visitor for it
+CST_ERROR_CODES: dict[str, str] = {
+    "ASYNC100": "visitor91x",
+    "ASYNC101": "visitor101",
+    "ASYNC124": "visitor91x",
+    "ASYNC300": "visitor300",
+    "ASYNC910": "visitor91x",
+    "ASYNC911": "visitor91x",
+    "ASYNC912": "visitor91x",
+    "ASYNC913": "visitor91x",
+}
+
+# modules with utility visitors, which are always needed by the runners
+UTILITY_MODULES: tuple[str, ...] = ("visitor_utility",)
+# modules with cst utility visitors, only imported with cst visitors as they need
+# libcst
+UTILITY_MODULES_CST: tuple[str, ...] = ("visitor_utility_cst",)
+
+# needed when adding options to flake8, before any visitor modules are imported
+DEFAULT_DISABLED_ERROR_CODES: tuple[str, ...] = (
+    "ASYNC106",
+    "ASYNC900",
+    "ASYNC910",
+    "ASYNC911",
+    "ASYNC912",
+    "ASYNC913",
+)
@@ -0,0 +1,159 @@
+"""Scope chain for tracking the types of variables, and the names bound in a scope.
+
+Kept in its own module, like ``_canonical``, so it can be used by ``SharedState``
+in the runner and by the project index without importing the visitors.
+"""
+
+from __future__ import annotations
+
+import ast
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
+
+from ._canonical import dotted_name, resolve_canonical_ast
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Iterator
+
+# the patterns of `match` statements that bind a name, from Python 3.10
+_CAPTURE_PATTERNS: tuple[type[ast.AST], ...] = tuple(
+    getattr(ast, name)
+    for name in ("MatchAs", "MatchStar", "MatchMapping")
+    if hasattr(ast, name)
+)
+
+
+class Scope(Mapping[str, str]):
+    """Types of the variables visible in a scope, by name.
+
+    A scope only stores the names bound in it, and looks up other names in its
+    parent, so entering a scope is O(1) no matter how many variables are in outer
+    scopes - and leaving it is just going back to the parent, which is unchanged.
+
+    Names bound in a scope shadow those in outer scopes, including names bound to a
+    value of unknown type with `unbind`. As in Python, names bound in a class body
+    aren't visible in the functions inside it.
+    """
+
+    __slots__ = ("_locals", "is_class", "parent")
+
+    def __init__(self, parent: Scope | None = None, *, is_class: bool = False):
+        super().__init__()
+        # None marks names that are bound in this scope, but of unknown type
+        self._locals: dict[str, str | None] = {}
+        self.parent = parent
+        self.is_class = is_class
+
+    def function_scope(self) -> Scope:
+        parent = self
+        while parent.is_class and parent.parent is not None:
+            parent = parent.parent
+        return Scope(parent)
+
+    def class_scope(self) -> Scope:
+        return Scope(self, is_class=True)
+
+    def __getitem__(self, name: str) -> str:
+        scope: Scope | None = self
+        while scope is not None:
+            if name in scope._locals:
+                value = scope._locals[name]
+                if value is None:
+                    break
+                return value
+            scope = scope.parent
+        raise KeyError(name)
+
+    def __setitem__(self, name: str, value: str) -> None:
+        self._locals[name] = value
+
+    def unbind(self, name: str) -> None:
+        """Mark `name` as bound in this scope to a value of unknown type."""
+        if self.parent is None:
+            self._locals.pop(name, None)
+        else:
+            self._locals[name] = None
+
+    def __iter__(self) -> Iterator[str]:
+        seen: set[str] = set()
+        scope: Scope | None = self
+        while scope is not None:
+            for name, value in scope._locals.items():
+                if name not in seen:
+                    seen.add(name)
+                    if value is not None:
+                        yield name
+            scope = scope.parent
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"Scope({dict(self)!r})"
+
+
+def function_bindings(
+    node: ast.FunctionDef | ast.AsyncFunctionDef | ast.Lambda,
+) -> set[str]:
+    """Return the names bound in the scope of function `node`.
+
+    That's its parameters and the names bound in its body, including functions and
+    classes defined in it but not the names bound inside them. Names declared
+    ``global`` aren't included, comprehension variables are, so a name that's only
+    bound in a comprehension is taken to shadow an outer one.
+    """
+    args = node.args
+    names = {
+        arg.arg
+        for arg in (
+            *args.posonlyargs,
+            *args.args,
+            *args.kwonlyargs,
+            args.vararg,
+            args.kwarg,
+        )
+        if arg is not None
+    }
+    declared_global: set[str] = set()
+    todo: list[ast.AST] = (
+        [node.body] if isinstance(node.body, ast.expr) else [*node.body]
+    )
+    while todo:
+        n = todo.pop()
+        if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(n.name)
+            continue
+        if isinstance(n, ast.Lambda):
+            continue
+        if isinstance(n, ast.Name) and isinstance(n.ctx, (ast.Store, ast.Del)):
+            names.add(n.id)
+        elif isinstance(n, ast.alias) and n.name != "*":
+            # `import a.b` binds `a`
+            names.add(n.asname or n.name.partition(".")[0])
+        elif isinstance(n, (ast.ExceptHandler, *_CAPTURE_PATTERNS)):
+            # `except E as name`, `case name`, `case [*name]` and `case {**name}`
+            name = getattr(n, "name", None) or getattr(n, "rest", None)
+            if name is not None:
+                names.add(name)
+        elif isinstance(n, ast.Global):
+            declared_global.update(n.names)
+        todo.extend(ast.iter_child_nodes(n))
+    return names - declared_global
+
+
+def module_level_name(
+    node: ast.expr, imports: Mapping[str, str], bindings: Collection[str]
+) -> str | None:
+    """Qualified name of the module-level function `node` refers to, if it's one.
+
+    `bindings` are the names bound in the enclosing functions, which shadow those
+    of the module. A bare name refers to a function of the module, a dotted one
+    must start with an imported name. Bare names are returned as is.
+    """
+    written = dotted_name(node)
+    if written is None:
+        return None
+    head, dot, _ = written.partition(".")
+    if head in bindings or (dot and head not in imports):
+        return None
+    return resolve_canonical_ast(node, imports)
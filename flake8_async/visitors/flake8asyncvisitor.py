@@ -1,58 +1,151 @@
-"""Contains the base class that all error classes inherit from."""
+"""Contains the base class that all ast error classes inherit from.
+
+The base class of cst error classes is in ``flake8asyncvisitor_cst``, so libcst is
+only imported when cst visitors are run.
+"""
 
 from __future__ import annotations
 
 import ast
+import functools
 from abc import ABC
 from typing import TYPE_CHECKING, Any
 
-import libcst as cst
-from libcst.metadata import PositionProvider
-
 from ..base import Error, Statement, strip_error_subidentifier
-from ._canonical import resolve_canonical_ast, resolve_canonical_cst
+from ._canonical import dotted_name, resolve_canonical_ast
 
 if TYPE_CHECKING:
-    from collections.abc import Iterable, Mapping
+    from collections.abc import Callable, Iterable, Mapping
+
+    import libcst as cst
 
     from ..runner import SharedState
+    from ._cfg import CFG
+    from ._scopes import Scope
 
     HasLineCol = ast.expr | ast.stmt | ast.arg | ast.excepthandler | Statement
 
 
-class Flake8AsyncVisitor(ast.NodeVisitor, ABC):
+# the same attributes are saved by each `save_state` call, so their positions are
+# only looked up once
+@functools.cache
+def _positions(attrs: tuple[str, ...]) -> dict[str, int]:
+    return {attr: i for i, attr in enumerate(attrs)}
+
+
+class Frame:
+    """Visitor attributes saved when entering `node`, restored when leaving it.
+
+    `values` are in the order of `attrs`.
+    """
+
+    __slots__ = ("attrs", "node", "values")
+
+    def __init__(
+        self, node: ast.AST | cst.CSTNode, attrs: tuple[str, ...], values: list[Any]
+    ):
+        super().__init__()
+        self.node = node
+        self.attrs = attrs
+        self.values = values
+
+    def __getitem__(self, attr: str) -> Any:
+        return self.values[_positions(self.attrs)[attr]]
+
+    def __setitem__(self, attr: str, value: Any) -> None:
+        self.values[_positions(self.attrs)[attr]] = value
+
+    def update(self, attrs: tuple[str, ...], values: list[Any]) -> None:
+        positions = _positions(self.attrs)
+        for attr, value in zip(attrs, values):
+            if attr in positions:
+                self.values[positions[attr]] = value
+            else:
+                self.attrs += (attr,)
+                self.values.append(value)
+
+
+class StateStack:
+    """Stack of saved visitor state, one frame per node that saved state.
+
+    Frames are pushed by `save_state` while entering a node, and popped when leaving
+    it, so the stack only grows with nesting depth. For ast visitors this is done by
+    the runner, cst visitors must call `restore_state` or `pop_frame` themselves.
+    """
+
+    frames: list[Frame]
+
+    def state_attrs(self, attrs: tuple[str, ...]) -> tuple[str, ...]:
+        """Return the attributes `save_state` saves when given `attrs`."""
+        return attrs
+
+    def save_state(self, node: ast.AST | cst.CSTNode, *attrs: str, copy: bool = False):
+        attrs = self.state_attrs(attrs)
+        values = [getattr(self, attr) for attr in attrs]
+        if copy:
+            values = [
+                value.copy() if hasattr(value, "copy") else value for value in values
+            ]
+        if self.frames and self.frames[-1].node is node:
+            self.frames[-1].update(attrs, values)
+        else:
+            self.frames.append(Frame(node, attrs, values))
+
+    def frame(self, node: ast.AST | cst.CSTNode) -> Frame:
+        """Return the state saved for `node`, which must be the innermost frame."""
+        frame = self.frames[-1]
+        assert frame.node is node
+        return frame
+
+    def pop_frame(self, node: ast.AST | cst.CSTNode) -> Frame:
+        """Pop the state saved for `node` without restoring it."""
+        frame = self.frames.pop()
+        assert frame.node is node
+        return frame
+
+    def restore_state(self, node: ast.AST | cst.CSTNode):
+        """Restore the state saved for `node`, which must be the innermost frame."""
+        frame = self.frames.pop()
+        assert frame.node is node
+        for attr, value in zip(frame.attrs, frame.values):
+            setattr(self, attr, value)
+
+
+class Flake8AsyncVisitor(ast.NodeVisitor, StateStack, ABC):
     # abstract attribute by not providing a value
     error_codes: Mapping[str, str]
 
     def __init__(self, shared_state: SharedState):
         super().__init__()
-        self.outer: dict[ast.AST, dict[str, Any]] = {}
+        self.frames = []
         self.novisit = False
         self.__state = shared_state
 
         self.options = self.__state.options
         self.typed_calls = self.__state.typed_calls
+        self.filename = self.__state.filename
 
-        # mark variables that shouldn't be saved/loaded in self.get_state
+        # mark variables that shouldn't be saved/loaded by self.save_state
         self.nocopy = {
             "_Flake8AsyncVisitor__state",
             "error_codes",
+            "filename",
+            "frames",
             "nocopy",
             "novisit",
             "options",
-            "outer",
             "typed_calls",
         }
 
-    # `variables` can be saved/loaded, but need a setter to not clear the reference
+    # `variables` is the current scope, shared between visitors. It's saved when
+    # entering a scope, and restored to the outer scope when leaving it.
     @property
-    def variables(self) -> dict[str, str]:
+    def variables(self) -> Scope:
         return self.__state.variables
 
     @variables.setter
-    def variables(self, value: dict[str, str]) -> None:
-        self.__state.variables.clear()
-        self.__state.variables.update(value)
+    def variables(self, value: Scope) -> None:
+        self.__state.variables = value
 
     @property
     def imports(self) -> dict[str, str]:
@@ -61,8 +154,36 @@ class Flake8AsyncVisitor(ast.NodeVisitor, ABC):
     def canonical_name(self, node: ast.AST) -> str | None:
         return resolve_canonical_ast(node, self.__state.imports)
 
+    def dotted_name(self, node: ast.AST) -> str | None:
+        """Return `node` as a dotted name like "trio.Cancelled", or None if it isn't one.
+
+        Names of attribute chains are cached, as several visitors look at the same
+        nodes, e.g. the function of every call.
+        """
+        if not isinstance(node, ast.Attribute):
+            return dotted_name(node)
+        cache = self.__state.dotted_names
+        if node not in cache:
+            cache[node] = dotted_name(node)
+        return cache[node]
+
+    def cfg(
+        self, scope: ast.Module | ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef
+    ) -> CFG:
+        """Return the control flow graph of `scope`, shared between visitors."""
+        if (cfg := self.__state.cfgs.get(scope)) is None:
+            from ._cfg import build_cfg  # noqa: PLC0415
+
+            cfg = self.__state.cfgs[scope] = build_cfg(scope)
+        return cfg
+
     def visit(self, node: ast.AST):
         """Visit a node."""
+        # visitors that visit their own subtrees bypass the runner, so also need to
+        # check the time budget
+        if self.__state.watchdog is not None:
+            self.__state.watchdog.check()
+
         # construct visitor for this node type
         visitor = getattr(self, "visit_" + node.__class__.__name__, None)
 
@@ -79,18 +200,20 @@ class Flake8AsyncVisitor(ast.NodeVisitor, ABC):
             super().generic_visit(node)
 
         # if an outer state was saved in this node restore it after visiting children
-        self.set_state(self.outer.pop(node, {}))
+        if self.frames and self.frames[-1].node is node:
+            self.restore_state(node)
 
         # set novisit so external runner doesn't visit this node with this class
         self.novisit = True
 
-    def visit_nodes(self, *nodes: ast.AST | Iterable[ast.AST]):
+    def after_visit(self, node: ast.AST, callback: Callable[[], object]):
+        """Call `callback` once the runner has visited `node` and its children."""
+        self.__state.after_visit.setdefault(node, []).append(callback)
+
+    def visit_nodes(self, *nodes: Iterable[ast.AST]):
         for arg in nodes:
-            if isinstance(arg, ast.AST):
-                self.visit(arg)
-            else:
-                for node in arg:
-                    self.visit(node)
+            for node in arg:
+                self.visit(node)
 
     def error(
         self,
@@ -121,30 +244,11 @@ class Flake8AsyncVisitor(ast.NodeVisitor, ABC):
             )
         )
 
-    def get_state(self, *attrs: str, copy: bool = False) -> dict[str, Any]:
+    def state_attrs(self, attrs: tuple[str, ...]) -> tuple[str, ...]:
         if not attrs:
-            # get all attributes, unless they're marked as nocopy
+            # save all attributes, unless they're marked as nocopy
             attrs = tuple(set(self.__dict__.keys()) - self.nocopy)
-        res: dict[str, Any] = {}
-        for attr in attrs:
-            value = getattr(self, attr)
-            if copy and hasattr(value, "copy"):
-                value = value.copy()
-            res[attr] = value
-        return res
-
-    def set_state(self, attrs: dict[str, Any], copy: bool = False):
-        for attr, value in attrs.items():
-            setattr(self, attr, value)
-
-    def save_state(self, node: ast.AST, *attrs: str, copy: bool = False):
-        state = self.get_state(*attrs, copy=copy)
-        if node in self.outer:
-            # not currently used, and not gonna bother adding dedicated test
-            # visitors atm
-            self.outer[node].update(state)  # pragma: no cover
-        else:
-            self.outer[node] = state
+        return attrs
 
     def walk(self, *body: ast.AST) -> Iterable[ast.AST]:
         for b in body:
@@ -163,115 +267,3 @@ class Flake8AsyncVisitor(ast.NodeVisitor, ABC):
     def add_library(self, name: str) -> None:
         if name not in self.__state.library:
             self.__state.library = (*self.__state.library, name)
-
-
-class Flake8AsyncVisitor_cst(cst.CSTTransformer, ABC):
-    # abstract attribute by not providing a value
-    error_codes: Mapping[str, str]
-    METADATA_DEPENDENCIES = (PositionProvider,)
-
-    def __init__(self, shared_state: SharedState):
-        super().__init__()
-        self.outer: dict[cst.CSTNode, dict[str, Any]] = {}
-        self.__state = shared_state
-
-        self.options = self.__state.options
-        self.noqas = self.__state.noqas
-
-    @property
-    def imports(self) -> dict[str, str]:
-        return self.__state.imports
-
-    def canonical_name(self, node: cst.CSTNode) -> str | None:
-        return resolve_canonical_cst(node, self.__state.imports)
-
-    def get_state(self, *attrs: str, copy: bool = False) -> dict[str, Any]:
-        # require attrs, since we inherit a *ton* of stuff which we don't want to copy
-        assert attrs
-        res: dict[str, Any] = {}
-        for attr in attrs:
-            value = getattr(self, attr)
-            if copy and hasattr(value, "copy"):
-                value = value.copy()
-            res[attr] = value
-        return res
-
-    def set_state(self, attrs: dict[str, Any], copy: bool = False):
-        for attr, value in attrs.items():
-            if copy and hasattr(value, "copy"):  # pragma: no cover
-                # not used by visitors yet
-                value = value.copy()
-            setattr(self, attr, value)
-
-    def save_state(self, node: cst.CSTNode, *attrs: str, copy: bool = False):
-        state = self.get_state(*attrs, copy=copy)
-        if node in self.outer:
-            self.outer[node].update(state)
-        else:
-            self.outer[node] = state
-
-    def restore_state(self, node: cst.CSTNode):
-        self.set_state(self.outer.pop(node, {}))
-
-    def is_noqa(self, node: cst.CSTNode, code: str):
-        if self.options.disable_noqa:
-            return False
-        # pyright + get_metadata is acting up
-        pos = self.get_metadata(PositionProvider, node).start  # type: ignore
-        noqas = self.noqas.get(pos.line)  # type: ignore
-        return noqas is not None and (noqas == set() or code in noqas)
-
-    def error(
-        self,
-        node: cst.CSTNode,
-        *args: str | Statement | int,
-        error_code: str | None = None,
-    ) -> bool:
-        if error_code is None:
-            assert (
-                len(self.error_codes) == 1
-            ), "No error code defined, but class has multiple codes"
-            error_code = next(iter(self.error_codes))
-        # don't emit an error if this code is disabled in a multi-code visitor
-        # TODO: write test for only one of 910/911 enabled/autofixed
-        elif (
-            (ec_no_sub := strip_error_subidentifier(error_code))
-            not in self.options.enabled_codes
-            and ec_no_sub not in self.options.autofix_codes
-        ):
-            return False  # pragma: no cover
-
-        if self.is_noqa(node, error_code):
-            return False
-
-        # pyright + get_metadata is acting up
-        pos = self.get_metadata(PositionProvider, node).start  # type: ignore
-        self.__state.problems.append(
-            Error(
-                strip_error_subidentifier(error_code),
-                pos.line,  # type: ignore
-                pos.column,  # type: ignore
-                self.error_codes[error_code],
-                *args,
-            )
-        )
-        return True
-
-    def should_autofix(self, node: cst.CSTNode, code: str | None = None) -> bool:
-        if code is None:  # pragma: no cover
-            assert len(self.error_codes) == 1
-            code = next(iter(self.error_codes))
-        # this does not currently need to check for `noqa`s, as error() does that
-        # and no codes tries to autofix if there's no error. This might change if/when
-        # "printing an error" and "autofixing" becomes independent. See issue #192
-        return code in self.options.autofix_codes
-
-    @property
-    def library(self) -> tuple[str, ...]:
-        return self.__state.library or ("trio",)
-
-    # library_str not used in cst yet
-
-    def add_library(self, name: str) -> None:
-        if name not in self.__state.library:
-            self.__state.library = (*self.__state.library, name)
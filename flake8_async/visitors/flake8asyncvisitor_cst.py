@@ -0,0 +1,113 @@
+"""Contains the base class that all cst error classes inherit from."""
+
+from __future__ import annotations
+
+from abc import ABC
+from typing import TYPE_CHECKING
+
+import libcst as cst
+
+from ..base import Error, Statement, strip_error_subidentifier
+from ._canonical import resolve_canonical_cst
+from ._positions import LazyPositionProvider
+from .flake8asyncvisitor import StateStack
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from ..runner import SharedState
+
+
+class Flake8AsyncVisitor_cst(cst.CSTTransformer, StateStack, ABC):
+    # abstract attribute by not providing a value
+    error_codes: Mapping[str, str]
+    METADATA_DEPENDENCIES = (LazyPositionProvider,)
+
+    def __init__(self, shared_state: SharedState):
+        super().__init__()
+        self.frames = []
+        self.__state = shared_state
+
+        self.options = self.__state.options
+        self.noqas = self.__state.noqas
+        self.filename = self.__state.filename
+
+    def on_visit(self, node: cst.CSTNode) -> bool:
+        if self.__state.watchdog is not None:
+            self.__state.watchdog.check()
+        return super().on_visit(node)
+
+    @property
+    def imports(self) -> dict[str, str]:
+        return self.__state.imports
+
+    def canonical_name(self, node: cst.CSTNode) -> str | None:
+        return resolve_canonical_cst(node, self.__state.imports)
+
+    def state_attrs(self, attrs: tuple[str, ...]) -> tuple[str, ...]:
+        # require attrs, since we inherit a *ton* of stuff which we don't want to copy
+        assert attrs
+        return attrs
+
+    def is_noqa(self, node: cst.CSTNode, code: str):
+        if self.options.disable_noqa:
+            return False
+        # pyright + get_metadata is acting up
+        pos = self.get_metadata(LazyPositionProvider, node).start  # type: ignore
+        noqas = self.noqas.get(pos.line)  # type: ignore
+        return noqas is not None and (noqas == set() or code in noqas)
+
+    def error(
+        self,
+        node: cst.CSTNode,
+        *args: str | Statement | int,
+        error_code: str | None = None,
+    ) -> bool:
+        if error_code is None:
+            assert (
+                len(self.error_codes) == 1
+            ), "No error code defined, but class has multiple codes"
+            error_code = next(iter(self.error_codes))
+        # don't emit an error if this code is disabled in a multi-code visitor
+        # TODO: write test for only one of 910/911 enabled/autofixed
+        elif (
+            (ec_no_sub := strip_error_subidentifier(error_code))
+            not in self.options.enabled_codes
+            and ec_no_sub not in self.options.autofix_codes
+        ):
+            return False  # pragma: no cover
+
+        if self.is_noqa(node, error_code):
+            return False
+
+        # pyright + get_metadata is acting up
+        pos = self.get_metadata(LazyPositionProvider, node).start  # type: ignore
+        self.__state.problems.append(
+            Error(
+                strip_error_subidentifier(error_code),
+                pos.line,  # type: ignore
+                pos.column,  # type: ignore
+                self.error_codes[error_code],
+                *args,
+            )
+        )
+        return True
+
+    def should_autofix(self, node: cst.CSTNode, code: str | None = None) -> bool:
+        if code is None:  # pragma: no cover
+            assert len(self.error_codes) == 1
+            code = next(iter(self.error_codes))
+        # this does not currently need to check for `noqa`s, as error() does that
+        # and no codes tries to autofix if there's no error. This might change if/when
+        # "printing an error" and "autofixing" becomes independent. See issue #192
+        return code in self.options.autofix_codes
+
+    @property
+    def library(self) -> tuple[str, ...]:
+        return self.__state.library or ("trio",)
+
+    # library_str not used in cst yet
+
+    def add_library(self, name: str) -> None:
+        if name not in self.__state.library:
+            self.__state.library = (*self.__state.library, name)
@@ -0,0 +1,382 @@
+"""Helper functions used in several cst visitor classes.
+
+Kept apart from ``helpers``, which the ast visitors use, so libcst is only imported
+when cst visitors are run.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+import libcst as cst
+from libcst.helpers import get_full_name_for_node_or_raise
+
+from ._canonical import resolve_canonical_cst
+from .helpers import MatchingCall, _dotted_qualnames, _qualname_table, compile_patterns
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator, Mapping
+
+
+def fnmatch_qualified_name_cst(
+    name_list: Iterable[cst.Decorator | cst.Call | cst.Attribute | cst.Name],
+    *patterns: str,
+    imports: Mapping[str, str] | None = None,
+) -> str | None:
+    for name in name_list:
+        candidates = {get_full_name_for_node_or_raise(name)}
+        if imports is not None:
+            inner: cst.CSTNode = name
+            if isinstance(inner, cst.Decorator):
+                inner = inner.decorator
+            if isinstance(inner, cst.Call):
+                inner = inner.func
+            if (canonical := resolve_canonical_cst(inner, imports)) is not None:
+                candidates.add(canonical)
+        candidates = {os.path.normcase(c) for c in candidates}
+        for pattern, match in compile_patterns(patterns):
+            if any(match(c) for c in candidates):
+                return pattern
+    return None
+
+
+# used in 91X
+def iter_guaranteed_once_cst(iterable: cst.BaseExpression) -> bool:
+    # static container with an "elts" attribute
+    if isinstance(iterable, (cst.Tuple, cst.List, cst.Dict, cst.Set)):
+        for elt in iterable.elements:
+            # recurse starred expression
+            if isinstance(elt, (cst.StarredElement, cst.StarredDictElement)):
+                if iter_guaranteed_once_cst(elt.value):
+                    return True
+            else:
+                # a non-starred non-empty container is guaranteed to iter
+                return True
+        return False
+
+    if isinstance(iterable, cst.SimpleString):
+        return len(iterable.raw_value) > 0
+
+    # check for range() with literal parameters
+    if (
+        isinstance(iterable, cst.Call)
+        and isinstance(iterable.func, cst.Name)
+        and iterable.func.value == "range"
+    ):
+        values: list[int] = []
+        for arg_arg in iterable.args:
+            arg = arg_arg.value
+            if isinstance(arg, cst.UnaryOperation):
+                if not isinstance(arg.expression, cst.Integer):
+                    return False
+                value = arg.expression.evaluated_value
+                if isinstance(arg.operator, cst.Minus):
+                    value = -value
+                elif isinstance(arg.operator, cst.BitInvert):
+                    value = ~value
+            elif isinstance(arg, cst.Integer):
+                value = arg.evaluated_value
+            else:
+                return False
+            values.append(value)
+        try:
+            evaluated_range = range(*values)
+        except (ValueError, TypeError):
+            str_values = ", ".join(map(str, values))
+            raise RuntimeError(
+                f"Invalid literal values to range function: `range({str_values})`"
+            )
+        try:
+            return len(evaluated_range) > 0
+        # if the length is > sys.maxsize
+        except OverflowError:
+            return True
+
+    return False
+
+
+def get_matching_call_cst(
+    node: cst.CSTNode,
+    *names: str,
+    base: Iterable[str] = ("trio", "anyio"),
+    imports: Mapping[str, str] | None = None,
+) -> MatchingCall[cst.Call] | None:
+    if isinstance(base, str):
+        base = (base,)
+    if not isinstance(node, cst.Call):
+        return None
+    if match := _match_qualname_cst(
+        node.func, _qualname_table(names, tuple(base)), imports
+    ):
+        return MatchingCall(node, match[1], match[0])
+    return None
+
+
+def _match_qualname_cst(
+    func: cst.BaseExpression,
+    table: Mapping[str, tuple[str, str]],
+    imports: Mapping[str, str] | None,
+) -> tuple[str, str] | None:
+    """Look up the dotted name of `func` in a table from `_qualname_table`."""
+    if (
+        isinstance(func, cst.Attribute)
+        and (name := identifier_to_string(func)) is not None
+        and name in table
+    ):
+        return table[name]
+    if (
+        imports is not None
+        and (canonical := resolve_canonical_cst(func, imports)) is not None
+        and canonical in table
+    ):
+        return table[canonical]
+    return None
+
+
+def identifier_to_string(node: cst.CSTNode) -> str | None:
+    """Convert a simple identifier to a string.
+
+    If the node is composed of anything but cst.Name + cst.Attribute it returns None.
+    """
+    if isinstance(node, cst.Name):
+        return node.value
+    if (
+        isinstance(node, cst.Attribute)
+        and (lhs := identifier_to_string(node.value)) is not None
+    ):
+        return lhs + "." + node.attr.value
+
+    return None
+
+
+def with_has_call(
+    node: cst.With,
+    *names: str,
+    base: Iterable[str] | str = ("trio", "anyio"),
+    imports: Mapping[str, str] | None = None,
+) -> list[MatchingCall[cst.Call]]:
+    """Check if a with statement has a matching call, returning a list with matches.
+
+    `names` specify the names of functions to match, `base` specifies the
+    library/module(s) the function must be in. If `imports` is given, matches
+    are also made against the canonical qualname so aliased / `from`-imports
+    are detected.
+    The list elements in the return value are named tuples with the matched node,
+    base and function.
+
+    Examples_
+
+    `with_has_call(node, "bar", base="foo")` matches foo.bar.
+    `with_has_call(node, "bar", "bee", base=("foo", "a.b.c")` matches
+      `foo.bar`, `foo.bee`, `a.b.c.bar`, and `a.b.c.bee`.
+
+    """
+    base_tuple = (base,) if isinstance(base, str) else tuple(base)
+    table = _qualname_table(names, base_tuple)
+
+    res_list: list[MatchingCall[cst.Call]] = []
+    for item in node.items:
+        call = item.item
+        if not isinstance(call, cst.Call):
+            continue
+        if match := _match_qualname_cst(call.func, table, imports):
+            res_list.append(MatchingCall(node=call, base=match[0], name=match[1]))
+    return res_list
+
+
+def calls_any_of(
+    node: cst.With, *qualnames: str, imports: Mapping[str, str] | None = None
+) -> bool:
+    """Return True if `node` contains a withitem matching any of `qualnames`.
+
+    Each `qualname` is a dotted string like ``"trio.open_nursery"`` or
+    ``"mcp.client.sse.sse_client"``: everything before the final dot is the
+    base, the final component is the function/class name.
+    """
+    qualname_set = _dotted_qualnames(qualnames)
+    for item in node.items:
+        call = item.item
+        if not isinstance(call, cst.Call):
+            continue
+        if (
+            isinstance(call.func, cst.Attribute)
+            and identifier_to_string(call.func) in qualname_set
+        ) or (
+            imports is not None
+            and resolve_canonical_cst(call.func, imports) in qualname_set
+        ):
+            return True
+    return False
+
+
+def func_has_decorator(func: cst.FunctionDef, *names: str) -> bool:
+    """Check for `@name`, `@foo.name`, `@name(...)` or `@foo.name(...)`."""
+    for decorator in func.decorators:
+        expr = decorator.decorator
+        if isinstance(expr, cst.Call):
+            expr = expr.func
+        if isinstance(expr, cst.Attribute):
+            expr = expr.attr
+        if isinstance(expr, cst.Name) and expr.value in names:
+            return True
+    return False
+
+
+class _BindingCollector(cst.CSTVisitor):
+    def __init__(self):
+        super().__init__()
+        self.names: set[str] = set()
+        self.declared_global: set[str] = set()
+
+    def bind(self, target: cst.BaseExpression) -> None:
+        if isinstance(target, cst.Name):
+            self.names.add(target.value)
+        elif isinstance(target, (cst.Tuple, cst.List)):
+            for element in target.elements:
+                self.bind(element.value)
+
+    def visit_AssignTarget(self, node: cst.AssignTarget) -> None:
+        self.bind(node.target)
+
+    def visit_AnnAssign(self, node: cst.AnnAssign) -> None:
+        self.bind(node.target)
+
+    def visit_AugAssign(self, node: cst.AugAssign) -> None:
+        self.bind(node.target)
+
+    def visit_NamedExpr(self, node: cst.NamedExpr) -> None:
+        self.bind(node.target)
+
+    def visit_Del(self, node: cst.Del) -> None:
+        self.bind(node.target)
+
+    def visit_For(self, node: cst.For) -> None:
+        self.bind(node.target)
+
+    def visit_CompFor(self, node: cst.CompFor) -> None:
+        self.bind(node.target)
+
+    # `with ... as name`, `except E as name` and `import a as name`
+    def visit_AsName(self, node: cst.AsName) -> None:
+        self.bind(node.name)
+
+    def visit_ImportAlias(self, node: cst.ImportAlias) -> None:
+        if node.asname is None and (name := identifier_to_string(node.name)):
+            # `import a.b` binds `a`
+            self.names.add(name.partition(".")[0])
+
+    def visit_MatchAs(self, node: cst.MatchAs) -> None:
+        if node.name is not None:
+            self.names.add(node.name.value)
+
+    def visit_MatchStar(self, node: cst.MatchStar) -> None:
+        if node.name is not None:
+            self.names.add(node.name.value)
+
+    def visit_MatchMapping(self, node: cst.MatchMapping) -> None:
+        if node.rest is not None:
+            self.names.add(node.rest.value)
+
+    def visit_Global(self, node: cst.Global) -> None:
+        self.declared_global.update(item.name.value for item in node.names)
+
+    def visit_FunctionDef(self, node: cst.FunctionDef) -> bool:
+        self.names.add(node.name.value)
+        return False
+
+    def visit_ClassDef(self, node: cst.ClassDef) -> bool:
+        self.names.add(node.name.value)
+        return False
+
+    def visit_Lambda(self, node: cst.Lambda) -> bool:
+        return False
+
+
+# used in 910/911, the same as `function_bindings` for ast
+def function_bindings_cst(node: cst.FunctionDef) -> set[str]:
+    """Return the names bound in the scope of function `node`, see `function_bindings`."""
+    params = node.params
+    collector = _BindingCollector()
+    for param in (
+        *params.posonly_params,
+        *params.params,
+        *params.kwonly_params,
+        params.star_arg,
+        params.star_kwarg,
+    ):
+        if isinstance(param, cst.Param):
+            collector.names.add(param.name.value)
+    node.body.visit(collector)
+    return collector.names - collector.declared_global
+
+
+class _CommentCollector(cst.CSTVisitor):
+    def __init__(self):
+        super().__init__()
+        self.comments: list[cst.Comment] = []
+
+    def visit_Comment(self, node: cst.Comment) -> None:
+        self.comments.append(node)
+
+
+def get_comments(node: cst.CSTNode | Iterable[cst.CSTNode]) -> Iterator[cst.EmptyLine]:
+    if isinstance(node, cst.MaybeSentinel):
+        return
+    if isinstance(node, cst.CSTNode):
+        collector = _CommentCollector()
+        node.visit(collector)
+        yield from (cst.EmptyLine(comment=c) for c in collector.comments)
+    else:
+        for n in node:
+            yield from get_comments(n)
+
+
+# used in ASYNC100
+def flatten_preserving_comments(node: cst.BaseCompoundStatement):
+    # add leading lines (comments and empty lines) for the node to be removed
+    new_leading_lines = list(node.leading_lines)
+
+    # add other comments belonging to the node as empty lines with comments
+    for attr in "lpar", "items", "rpar":
+        # pragma, since this is currently only used to flatten `With` statements
+        if comment_nodes := getattr(node, attr, None):  # pragma: no cover
+            new_leading_lines.extend(get_comments(comment_nodes))
+
+    # node.body is a BaseSuite, whose subclasses are SimpleStatementSuite
+    # and IndentedBlock
+    if isinstance(node.body, cst.SimpleStatementSuite):
+        # `with ...: pass;pass;pass` -> pass;pass;pass
+        return cst.SimpleStatementLine(
+            node.body.body,
+            leading_lines=new_leading_lines,
+            trailing_whitespace=node.body.trailing_whitespace,
+        )
+
+    assert isinstance(node.body, cst.IndentedBlock)
+    nodes = list(node.body.body)
+
+    # nodes[0] is a BaseStatement, whose subclasses are SimpleStatementLine
+    # and BaseCompoundStatement - both of which has leading_lines
+    assert isinstance(nodes[0], (cst.SimpleStatementLine, cst.BaseCompoundStatement))
+
+    # add body header comment - i.e. comments on the same/last line of the statement
+    if node.body.header and node.body.header.comment:
+        new_leading_lines.append(
+            cst.EmptyLine(indent=True, comment=node.body.header.comment)
+        )
+    # add the leading lines of the first node
+    new_leading_lines.extend(nodes[0].leading_lines)
+    # update the first node with all the above constructed lines
+    nodes[0] = nodes[0].with_changes(leading_lines=new_leading_lines)
+
+    # if there's comments in the footer of the indented block, add a pass
+    # statement with the comments as leading lines
+    if node.body.footer:
+        nodes.append(
+            cst.SimpleStatementLine(
+                [cst.Pass()],
+                node.body.footer,
+            )
+        )
+    return cst.FlattenSentinel(nodes)
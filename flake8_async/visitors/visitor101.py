@@ -8,13 +8,9 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Any
 
-from .flake8asyncvisitor import Flake8AsyncVisitor_cst
-from .helpers import (
-    calls_any_of,
-    cancel_scope_names,
-    error_class_cst,
-    func_has_decorator,
-)
+from .flake8asyncvisitor_cst import Flake8AsyncVisitor_cst
+from .helpers import cancel_scope_names, error_class_cst
+from .helpers_cst import calls_any_of, func_has_decorator
 
 # Qualified names of context managers that open a nursery / task group / cancel
 # scope. `yield`ing inside any of these breaks exception handling unless the
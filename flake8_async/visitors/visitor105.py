@@ -62,7 +62,9 @@ class Visitor105(Flake8AsyncVisitor):
             # so the message reads consistently.
             self.error(node, canonical, "function")
         elif isinstance(node.func, ast.Attribute) and node.func.attr == "start":
-            var = ast.unparse(node.func.value)
+            var = self.dotted_name(node.func.value)
 
-            if self.variables.get(var, "") == "trio.Nursery" or var.endswith("nursery"):
+            if var is not None and (
+                self.variables.get(var, "") == "trio.Nursery" or var.endswith("nursery")
+            ):
                 self.error(node, "trio.Nursery.start", "method")
@@ -7,7 +7,6 @@ that breaks linter checks and multi-backend programs.
 from __future__ import annotations
 
 import ast
-import re
 from typing import TYPE_CHECKING
 
 from .flake8asyncvisitor import Flake8AsyncVisitor
@@ -36,7 +35,10 @@ class Visitor118(Flake8AsyncVisitor):
             return
         # Fallback for code where anyio isn't importable (e.g. stubs or partial
         # configs) but the name is still spelled out literally.
-        if re.fullmatch(r"(anyio.)?get_cancelled_exc_class(\(\))?", ast.unparse(value)):
+        if self.dotted_name(target) in (
+            "get_cancelled_exc_class",
+            "anyio.get_cancelled_exc_class",
+        ) and not (isinstance(value, ast.Call) and (value.args or value.keywords)):
             self.error(value)
 
     visit_AnnAssign = visit_Assign
@@ -70,10 +70,20 @@ class Visitor123(Flake8AsyncVisitor):
             copy=True,
         )
         # [Base]ExceptionGroup are builtins and almost always used unqualified,
-        # so a substring match on the literal source is sufficient.
+        # so a substring match on the names is sufficient.
         if node.name is None or (
             not self.try_star
-            and (node.type is None or "ExceptionGroup" not in ast.unparse(node.type))
+            and (
+                node.type is None
+                or not any(
+                    "ExceptionGroup" in (self.dotted_name(t) or "")
+                    for t in (
+                        node.type.elts
+                        if isinstance(node.type, ast.Tuple)
+                        else [node.type]
+                    )
+                )
+            )
         ):
             self.novisit = True
             return
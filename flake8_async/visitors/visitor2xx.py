@@ -15,8 +15,9 @@ import ast
 import re
 from typing import TYPE_CHECKING, Any
 
+from ..blocking_rules import blocking_calls
 from .flake8asyncvisitor import Flake8AsyncVisitor
-from .helpers import error_class, fnmatch_qualified_name, get_matching_call
+from .helpers import error_class, get_matching_call, qualified_names
 
 if TYPE_CHECKING:
     from collections.abc import Mapping
@@ -34,6 +35,10 @@ class Visitor200(Flake8AsyncVisitor):
     def __init__(self, *args: Any, **kwargs: Any):
         super().__init__(*args, **kwargs)
         self.async_function = False
+        # compiled when options are parsed, see `blocking_rules`
+        self.blocking_calls = blocking_calls(self.options)
+        for c in self.blocking_calls.types:
+            self.typed_calls[c] = c
 
     def visit_AsyncFunctionDef(
         self, node: ast.AsyncFunctionDef | ast.FunctionDef | ast.Lambda
@@ -49,11 +54,20 @@ class Visitor200(Flake8AsyncVisitor):
             self.visit_blocking_call(node)
 
     def visit_blocking_call(self, node: ast.Call):
-        blocking_calls = self.options.async200_blocking_calls
-        if key := fnmatch_qualified_name(
-            [node.func], *blocking_calls, imports=self.imports
+        if not self.blocking_calls:
+            return
+        if rule := self.blocking_calls.match_call(
+            qualified_names(node.func, self.imports), node
         ):
-            self.error(node, key, blocking_calls[key])
+            assert rule.call is not None
+            self.error(node, rule.call, rule.suggestion(self.library))
+        elif (
+            isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name)
+            and (anno := self.variables.get(node.func.value.id))
+            and (rule := self.blocking_calls.match_method(anno, node.func.attr, node))
+        ):
+            self.error(node, ast.unparse(node.func), rule.suggestion(self.library))
 
 
 # used by Visitor212 and Visitor232 - ??
@@ -75,8 +89,7 @@ class Visitor21X(Visitor200):
 
     def visit_blocking_call(self, node: ast.Call):
         http_methods = {"get", "options", "head", "post", "put", "patch", "delete"}
-        func_name = ast.unparse(node.func)
-        canonical = self.canonical_name(node.func) or func_name
+        canonical = self.canonical_name(node.func) or ""
         if get_matching_call(
             node,
             *http_methods | {"request"},
@@ -88,7 +101,7 @@ class Visitor21X(Visitor200):
             "request.urlopen",
             "urlopen",
         ):
-            self.error(node, func_name, error_code="ASYNC210")
+            self.error(node, ast.unparse(node.func), error_code="ASYNC210")
 
         elif (
             self._urllib3_imported()
@@ -99,7 +112,7 @@ class Visitor21X(Visitor200):
             and isinstance(node.args[0].value, str)
             and node.args[0].value.lower() in http_methods | {"trace", "connect"}
         ):
-            self.error(node, func_name, error_code="ASYNC211")
+            self.error(node, ast.unparse(node.func), error_code="ASYNC211")
 
 
 httpx_blocking_methods = (
@@ -204,8 +217,7 @@ class Visitor22X(Visitor200):
         }
 
         # Match against the canonical qualname, but report the user's literal spelling.
-        func_name = ast.unparse(node.func)
-        canonical = self.canonical_name(node.func) or func_name
+        canonical = self.canonical_name(node.func) or ""
         error_code: str | None = None
         if canonical in ("subprocess.Popen", "os.popen"):
             error_code = "ASYNC220"
@@ -239,12 +251,14 @@ class Visitor22X(Visitor200):
         if error_code is None:
             return
         if self.library == ("asyncio",):
-            self.error(node, func_name, error_code=error_code + "_asyncio")
+            self.error(node, ast.unparse(node.func), error_code=error_code + "_asyncio")
         else:
             # the asyncio + anyio/trio case is probably not worth special casing,
             # so we simply suggest e.g. `[trio/asyncio/anyio].run_process()` despite
             # asyncio.run_process not existing
-            self.error(node, func_name, self.library_str, error_code=error_code)
+            self.error(
+                node, ast.unparse(node.func), self.library_str, error_code=error_code
+            )
 
 
 @error_class
@@ -271,8 +285,7 @@ class Visitor23X(Visitor200):
     def visit_blocking_call(self, node: ast.Call):
         if getattr(node, "wrapped", False):
             return
-        func_name = ast.unparse(node.func)
-        canonical = self.canonical_name(node.func) or func_name
+        canonical = self.canonical_name(node.func) or ""
         if canonical in ("builtins.open", "open", "io.open", "io.open_code"):
             error_code = "ASYNC230"
         elif canonical == "os.fdopen":
@@ -280,9 +293,11 @@ class Visitor23X(Visitor200):
         else:
             return
         if self.library == ("asyncio",):
-            self.error(node, func_name, error_code=error_code + "_asyncio")
+            self.error(node, ast.unparse(node.func), error_code=error_code + "_asyncio")
         else:
-            self.error(node, func_name, self.library_str, error_code=error_code)
+            self.error(
+                node, ast.unparse(node.func), self.library_str, error_code=error_code
+            )
 
 
 @error_class
@@ -379,9 +394,9 @@ class Visitor24X(Visitor200):
         if not self.async_function:
             return
         error_code = "ASYNC240_asyncio" if self.library == ("asyncio",) else "ASYNC240"
-        func_name = ast.unparse(node.func)
-        canonical = self.canonical_name(node.func) or func_name
-        if func_name in self.imports_from_ospath:
+        func_name = self.dotted_name(node.func)
+        canonical = self.canonical_name(node.func) or ""
+        if func_name is not None and func_name in self.imports_from_ospath:
             self.error(node, func_name, self.library_str, error_code=error_code)
         elif (m := re.fullmatch(r"os\.path\.(?P<func>.*)", canonical)) and m.group(
             "func"
@@ -409,8 +424,7 @@ class Visitor25X(Visitor200):
     def visit_Call(self, node: ast.Call):
         if not self.async_function:
             return
-        func_name = ast.unparse(node.func)
-        canonical = self.canonical_name(node.func) or func_name
+        canonical = self.canonical_name(node.func) or ""
         if canonical in ("input", "builtins.input"):
             error_code = "ASYNC250"
             if len(self.library) == 1:
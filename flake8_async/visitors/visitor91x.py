@@ -19,19 +19,24 @@ from typing import TYPE_CHECKING, Any, cast
 
 import libcst as cst
 import libcst.matchers as m
-from libcst.metadata import CodeRange, PositionProvider
+from libcst.metadata import CodeRange
 
 from ..base import Statement
-from .flake8asyncvisitor import Flake8AsyncVisitor_cst
+from ._positions import LazyPositionProvider
+from .flake8asyncvisitor_cst import Flake8AsyncVisitor_cst
 from .helpers import (
     MatchingCall,
     cancel_scope_names,
     disable_codes_by_default,
     error_class_cst,
+)
+from .helpers_cst import (
     flatten_preserving_comments,
     fnmatch_qualified_name_cst,
     func_has_decorator,
+    function_bindings_cst,
     get_matching_call_cst,
+    identifier_to_string,
     iter_guaranteed_once_cst,
 )
 
@@ -46,26 +51,37 @@ class ArtificialStatement(Statement):
     """
 
 
+# nodes that checkpoint, for checking if `__aenter__`/`__aexit__` may checkpoint
+_CHECKPOINTY = (
+    m.Await()
+    | m.With(asynchronous=m.Asynchronous())
+    | m.For(asynchronous=m.Asynchronous())
+)
+
 # Statement injected at the start of loops to track missed checkpoints.
 ARTIFICIAL_STATEMENT = ArtificialStatement("artificial", -1)
 # There's no particular reason why loops use a globally instanced statement, but
 # `with` does not - mostly just an artifact of them being implemented at different times.
 
 
+def _is_empty_statement(node: cst.BaseSmallStatement) -> bool:
+    return isinstance(node, cst.Pass) or (
+        isinstance(node, cst.Expr)
+        and isinstance(node.value, (cst.Ellipsis, cst.SimpleString))
+    )
+
+
 def func_empty_body(node: cst.FunctionDef) -> bool:
     """Check if function body consist of `pass`, `...`, and/or (doc)string literals."""
-    empty_statement = m.Pass() | m.Expr(m.Ellipsis() | m.SimpleString())
-
-    return m.matches(
-        node.body,
-        m.OneOf(
-            # newline + indented statements
-            m.IndentedBlock(
-                [m.ZeroOrMore(m.SimpleStatementLine([m.ZeroOrMore(empty_statement)]))]
-            ),
-            # same-line statement[s]
-            m.SimpleStatementSuite(body=[m.ZeroOrMore(empty_statement)]),
-        ),
+    body = node.body
+    # same-line statement[s]
+    if isinstance(body, cst.SimpleStatementSuite):
+        return all(map(_is_empty_statement, body.body))
+    # newline + indented statements
+    return all(
+        isinstance(line, cst.SimpleStatementLine)
+        and all(map(_is_empty_statement, line.body))
+        for line in body.body
     )
 
 
@@ -480,6 +496,10 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
         # Set on entry to an exempt `__aenter__`/`__aexit__` so that
         # `error_91x` skips emitting ASYNC910/911.
         self.exempt_async_cm_method = False
+        # the functions the current node is in, innermost last, and the names bound
+        # in them - only worked out when --project-index needs them
+        self.enclosing_functions: tuple[cst.FunctionDef, ...] = ()
+        self.function_bindings: dict[cst.FunctionDef, set[str]] = {}
 
     def should_autofix(self, node: cst.CSTNode, code: str | None = None) -> bool:
         if code is None:
@@ -555,11 +575,6 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
     def visit_ClassDef(self, node: cst.ClassDef) -> None:
         self.save_state(node, "async_cm_class", "async_cm_class_has_bases")
         defined: dict[str, bool] = {}
-        checkpointy = (
-            m.Await()
-            | m.With(asynchronous=m.Asynchronous())
-            | m.For(asynchronous=m.Asynchronous())
-        )
         if isinstance(node.body, cst.IndentedBlock):
             for stmt in node.body.body:
                 if (
@@ -567,7 +582,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
                     and stmt.asynchronous is not None
                     and stmt.name.value in ("__aenter__", "__aexit__")
                 ):
-                    defined[stmt.name.value] = bool(m.findall(stmt, checkpointy))
+                    defined[stmt.name.value] = bool(m.findall(stmt, _CHECKPOINTY))
         self.async_cm_class = defined
         # Keyword args like `metaclass=` are in `node.keywords`, not `bases`.
         self.async_cm_class_has_bases = bool(node.bases)
@@ -602,15 +617,19 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
         # (and contains a checkpoint) if the class inherits from something.
         return self.async_cm_class_has_bases
 
+    # don't lint functions whose bodies solely consist of pass or ellipsis
+    # @overload functions are also guaranteed to be empty
+    # we also ignore pytest fixtures
+    @staticmethod
+    def _skip_function(node: cst.FunctionDef) -> bool:
+        return func_has_decorator(node, "overload", "fixture") or func_empty_body(node)
+
     def visit_FunctionDef(self, node: cst.FunctionDef) -> bool:
         # `await` in default values happen in parent scope
         # we also know we don't ever modify parameters so we can ignore the return value
         _ = node.params.visit(self)
 
-        # don't lint functions whose bodies solely consist of pass or ellipsis
-        # @overload functions are also guaranteed to be empty
-        # we also ignore pytest fixtures
-        if func_has_decorator(node, "overload", "fixture") or func_empty_body(node):
+        if self._skip_function(node):
             return False  # subnodes can be ignored
 
         is_exempt_cm = self._is_exempt_async_cm_method(node)
@@ -632,8 +651,10 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
             "async_cm_class",
             "async_cm_class_has_bases",
             "exempt_async_cm_method",
+            "enclosing_functions",
             copy=True,
         )
+        self.enclosing_functions = (*self.enclosing_functions, node)
         self.uncheckpointed_statements = set()
         self.has_checkpoint_stack = []
         self.has_yield = False
@@ -662,7 +683,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
         ):
             return False
 
-        pos = self.get_metadata(PositionProvider, node).start  # type: ignore
+        pos = self.get_metadata(LazyPositionProvider, node).start  # type: ignore
         self.uncheckpointed_statements = {
             Statement("function definition", pos.line, pos.column)  # type: ignore
         }
@@ -708,7 +729,9 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
 
         if self.new_body is not None:
             updated_node = updated_node.with_changes(body=self.new_body)
-        self.restore_state(original_node)
+        # no state is saved for skipped functions
+        if not self._skip_function(original_node):
+            self.restore_state(original_node)
         # reset self.new_body
         self.new_body = None
         return updated_node
@@ -852,13 +875,49 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
         # the expression being awaited is not checkpointed
         # so only set checkpoint after the await node
 
+        # unless --project-index knows the awaited function never checkpoints
+        if self._never_checkpoints(original_node):
+            return updated_node
+
         # all nodes are now checkpointed
         self.checkpoint()
         return updated_node
 
+    def _never_checkpoints(self, node: cst.Await) -> bool:
+        index = self.options.project_index
+        if index is None or not isinstance(node.expression, cst.Call):
+            return False
+        func = node.expression.func
+        name = self.canonical_name(func)
+        return (
+            name is not None
+            and index.never_checkpoints(name, self.filename)
+            and self._refers_to_module(func)
+        )
+
+    def _refers_to_module(self, func: cst.BaseExpression) -> bool:
+        # as `module_level_name` for ast: not shadowed by a name bound in an
+        # enclosing function, and a dotted name must start with an imported name
+        written = identifier_to_string(func)
+        if written is None:
+            # e.g. awaiting what's returned by calling `f()`, in `await f()()`
+            return False
+        head, dot, _ = written.partition(".")
+        if dot and head not in self.imports:
+            return False
+        for function in self.enclosing_functions:
+            if function not in self.function_bindings:
+                self.function_bindings[function] = function_bindings_cst(function)
+            if head in self.function_bindings[function]:
+                return False
+        return True
+
     # raising exception means we don't need to checkpoint so we can treat it as one
-    # can't use TypeVar due to libcst's built-in type checking not supporting it
-    leave_Raise = leave_Await  # type: ignore
+    def leave_Raise(
+        self, original_node: cst.Raise, updated_node: cst.Raise
+    ) -> cst.Raise:
+        self.checkpoint()
+        return updated_node
 
     def _is_exception_suppressing_context_manager(self, node: cst.With) -> bool:
         return (
@@ -976,7 +1035,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
             ):
                 # typing issue: https://github.com/Instagram/LibCST/issues/1107
                 pos = cst.ensure_type(
-                    self.get_metadata(PositionProvider, withitem),
+                    self.get_metadata(LazyPositionProvider, withitem),
                     CodeRange,
                 ).start
                 self.uncheckpointed_statements.add(
@@ -1003,6 +1062,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
                 ) and super().should_autofix(res.node, code="ASYNC100"):
                     if len(withitems) == 1:
                         # Remove this With node, bypassing later logic.
+                        self.pop_frame(original_node)
                         return flatten_preserving_comments(updated_node)
                     if i == len(withitems) - 1:
                         # preserve trailing comma, or remove comma if there was none
@@ -1026,6 +1086,8 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
             prev_checkpoints = self.uncheckpointed_statements
             self.restore_state(original_node)
             self.uncheckpointed_statements.update(prev_checkpoints)
+        else:
+            self.pop_frame(original_node)
 
         self._checkpoint_with(original_node, entry=False)
 
@@ -1049,7 +1111,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
             self._set_missing_checkpoint_fix()
 
         # mark as requiring checkpoint after
-        pos = self.get_metadata(PositionProvider, original_node).start  # type: ignore
+        pos = self.get_metadata(LazyPositionProvider, original_node).start  # type: ignore
         self.uncheckpointed_statements = {
             Statement("yield", pos.line, pos.column)  # type: ignore
         }
@@ -1074,7 +1136,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
         )
         # yields inside `try` can always be uncheckpointed
         for inner_node in m.findall(node.body, m.Yield()):
-            pos = self.get_metadata(PositionProvider, inner_node).start  # type: ignore
+            pos = self.get_metadata(LazyPositionProvider, inner_node).start  # type: ignore
             self.try_state.body_uncheckpointed_statements.add(
                 Statement("yield", pos.line, pos.column)  # type: ignore
             )
@@ -1141,7 +1203,9 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
     def leave_Try(
         self, original_node: cst.Try | cst.TryStar, updated_node: cst.Try | cst.TryStar
     ) -> cst.Try | cst.TryStar:
-        self.restore_state(original_node)
+        # state is only saved in async functions, which nested functions restore
+        if self.async_function:
+            self.restore_state(original_node)
         return updated_node
 
     visit_TryStar = visit_Try
@@ -1164,20 +1228,17 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
             return
 
         # restore state to after test, saving current state instead
-        (
-            self.uncheckpointed_statements,
-            self.outer[node]["uncheckpointed_statements"],
-        ) = (
-            self.outer[node]["uncheckpointed_statements"],
+        frame = self.frame(node)
+        self.uncheckpointed_statements, frame["uncheckpointed_statements"] = (
+            frame["uncheckpointed_statements"],
             self.uncheckpointed_statements,
         )
 
     def leave_If(self, original_node: cst.If, updated_node: cst.If) -> cst.If:
         if self.async_function:
             # merge current state with post-body state
-            self.uncheckpointed_statements.update(
-                self.outer[original_node]["uncheckpointed_statements"]
-            )
+            frame = self.pop_frame(original_node)
+            self.uncheckpointed_statements.update(frame["uncheckpointed_statements"])
         return updated_node
 
     # libcst calls attributes in the order they appear in the code, so we manually
@@ -1237,7 +1298,9 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
                 self.match_state.base_uncheckpointed_statements
             )
 
-        self.restore_state(original_node)
+        # state is only saved in async functions, as for `try`
+        if self.async_function:
+            self.restore_state(original_node)
         return updated_node
 
     def visit_While(self, node: cst.While | cst.For):
@@ -1296,12 +1359,12 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
             return
 
         # if there's errors due to the artificial statement
-        # raise a real error for each statement in outer[uncheckpointed_statements],
+        # raise a real error for each statement in the saved uncheckpointed_statements,
         # uncheckpointed_before_continue, and checkpoints at the end of the loop
         any_error = False
         for err_node in self.loop_state.artificial_errors:
             for stmt in (
-                self.outer[node]["uncheckpointed_statements"]
+                self.frame(node)["uncheckpointed_statements"]
                 | self.uncheckpointed_statements
                 | self.loop_state.uncheckpointed_before_continue
             ):
@@ -1339,7 +1402,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
         ):
             if ARTIFICIAL_STATEMENT in stmts:
                 stmts.remove(ARTIFICIAL_STATEMENT)
-                stmts.update(self.outer[node]["uncheckpointed_statements"])
+                stmts.update(self.frame(node)["uncheckpointed_statements"])
 
         # AsyncFor guarantees checkpoint on running out of iterable
         # so reset checkpoint state at end of loop. (but not state at break)
@@ -1352,7 +1415,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
             # or not at all
             if not self.loop_state.body_guaranteed_once:
                 self.uncheckpointed_statements.update(
-                    self.outer[node]["uncheckpointed_statements"]
+                    self.frame(node)["uncheckpointed_statements"]
                 )
             # or at a continue, unless it's an infinite loop
             if not self.loop_state.infinite_loop:
@@ -1378,7 +1441,7 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
             )
 
         # reset break & continue in case of nested loops
-        self.outer[node]["uncheckpointed_statements"] = self.uncheckpointed_statements
+        self.frame(node)["uncheckpointed_statements"] = self.uncheckpointed_statements
 
     leave_For_orelse = leave_While_orelse
 
@@ -1460,9 +1523,8 @@ class Visitor91X(Flake8AsyncVisitor_cst, CommonVisitors):
     def leave_BooleanOperation_right(self, node: cst.BooleanOperation):
         if not self.async_function:
             return
-        self.uncheckpointed_statements.update(
-            self.outer[node]["uncheckpointed_statements"]
-        )
+        frame = self.pop_frame(node)
+        self.uncheckpointed_statements.update(frame["uncheckpointed_statements"])
 
     # comprehensions are simpler than loops, since they cannot contain yields
     # or many other complicated statements, but their subfields are not in the order
@@ -1,24 +1,23 @@
-"""Utility visitors for tracking shared state and modifying the tree."""
+"""Utility visitors for tracking shared state and modifying the tree.
+
+The utility visitors run on libcst's syntax tree are in ``visitor_utility_cst``.
+"""
 
 from __future__ import annotations
 
 import ast
 import functools
+import io
 import re
-from typing import TYPE_CHECKING, Any, cast
-
-import libcst as cst
-import libcst.matchers as m
-from libcst.metadata import PositionProvider
+import tokenize
+from typing import TYPE_CHECKING, Any
 
-from .flake8asyncvisitor import Flake8AsyncVisitor, Flake8AsyncVisitor_cst
-from .helpers import identifier_to_string, utility_visitor, utility_visitor_cst
+from .flake8asyncvisitor import Flake8AsyncVisitor
+from .helpers import utility_visitor
 
 if TYPE_CHECKING:
     from re import Match
 
-    from libcst.metadata import CodeRange
-
 
 @utility_visitor
 class VisitorTypeTracker(Flake8AsyncVisitor):
@@ -34,7 +33,9 @@ class VisitorTypeTracker(Flake8AsyncVisitor):
                 return node.left
             return None
 
-        self.save_state(node, "variables", copy=True)
+        # the outer scope is restored when leaving the function
+        self.save_state(node, "variables")
+        self.variables = self.variables.function_scope()
 
         args = node.args
         for arg in *args.args, *args.posonlyargs, *args.kwonlyargs:
@@ -50,7 +51,9 @@ class VisitorTypeTracker(Flake8AsyncVisitor):
                 annotation = res
 
             if isinstance(annotation, (ast.Name, ast.Attribute, ast.Constant)):
-                annotation_type = ast.unparse(annotation)
+                annotation_type = self.dotted_name(annotation) or ast.unparse(
+                    annotation
+                )
             else:
                 annotation_type = "Any"
 
@@ -61,47 +64,71 @@ class VisitorTypeTracker(Flake8AsyncVisitor):
 
     # Does not handle class members, or attributes in general
     def visit_ClassDef(self, node: ast.ClassDef):
-        self.save_state(node, "variables", copy=True)
+        self.save_state(node, "variables")
+        self.variables = self.variables.class_scope()
+
+    # the type of the value returned by a call, e.g. `trio.Path(...)`
+    def typed_call(self, node: ast.Call) -> str | None:
+        name = self.dotted_name(node.func)
+        return None if name is None else self.typed_calls.get(name)
+
+    def bind_target(self, target: ast.expr, vartype: str | None):
+        if vartype is not None and isinstance(target, ast.Name):
+            self.variables[target.id] = vartype
+            return
+        # names bound to values of unknown type shadow any outer variable of that name
+        for node in ast.walk(target):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                self.variables.unbind(node.id)
 
     def visit_AnnAssign(self, node: ast.AnnAssign):
         if not isinstance(node.target, (ast.Name, ast.Attribute)):
             # target can technically be a subscript
             return  # pragma: no cover
-        target = ast.unparse(node.target)
-        typename = ast.unparse(node.annotation)
+        target = self.dotted_name(node.target) or ast.unparse(node.target)
+        typename = self.dotted_name(node.annotation) or ast.unparse(node.annotation)
         self.variables[target] = typename
 
+    # Targets are only bound once the value is evaluated, so visitors still see
+    # the old bindings in e.g. `f = f.read()`.
     def visit_Assign(self, node: ast.Assign):
-        if len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
-            return
-
+        vartype = None
         # `f = open(...)`
-        if isinstance(node.value, ast.Call) and (
-            vartype := self.typed_calls.get(ast.unparse(node.value.func))
-        ):
-            self.variables[node.targets[0].id] = vartype
+        if isinstance(node.value, ast.Call):
+            vartype = self.typed_call(node.value)
 
         # f = ff (and ff is a variable with known type)
-        elif isinstance(node.value, ast.Name) and (
-            value := self.variables.get(node.value.id)
-        ):
-            self.variables[node.targets[0].id] = value
+        elif isinstance(node.value, ast.Name):
+            vartype = self.variables.get(node.value.id)
+
+        for target in node.targets:
+            self.after_visit(
+                node.value, functools.partial(self.bind_target, target, vartype)
+            )
 
     def visit_With(self, node: ast.With | ast.AsyncWith):
         # TODO: it's actually the return type of
         # `ast.unparse(item.context_expr.func).__[a]enter__()` that should be used
-        if len(node.items) != 1:
-            return
-        item = node.items[0]
-        if (
-            isinstance(item.context_expr, ast.Call)
-            and isinstance(item.optional_vars, ast.Name)
-            and (vartype := self.typed_calls.get(ast.unparse(item.context_expr.func)))
-        ):
-            self.variables[item.optional_vars.id] = vartype
+        for item in node.items:
+            if item.optional_vars is None:
+                continue
+            vartype = None
+            if len(node.items) == 1 and isinstance(item.context_expr, ast.Call):
+                vartype = self.typed_call(item.context_expr)
+            self.after_visit(
+                item.context_expr,
+                functools.partial(self.bind_target, item.optional_vars, vartype),
+            )
 
     visit_AsyncWith = visit_With
 
+    def visit_For(self, node: ast.For | ast.AsyncFor):
+        self.after_visit(
+            node.iter, functools.partial(self.bind_target, node.target, None)
+        )
+
+    visit_AsyncFor = visit_For
+
 
 @utility_visitor
 class VisitorAwaitModifier(Flake8AsyncVisitor):
@@ -130,31 +157,6 @@ class VisitorLibraryHandler(Flake8AsyncVisitor):
                 self.add_library(name)
 
 
-@utility_visitor_cst
-class VisitorLibraryHandler_cst(Flake8AsyncVisitor_cst):
-    def __init__(self, *args: Any, **kwargs: Any):
-        super().__init__(*args, **kwargs)
-        # check whether library we're working towards has been explicitly
-        # specified with --anyio, otherwise assume Trio - but we update if we
-        # see imports
-        if self.options.anyio:
-            self.add_library("anyio")
-        if self.options.asyncio:
-            self.add_library("asyncio")
-
-    def visit_Import(self, node: cst.Import):
-        for alias in node.names:
-            if m.matches(
-                alias,
-                m.ImportAlias(
-                    name=m.Name("trio") | m.Name("anyio") | m.Name("asyncio"),
-                    asname=None,
-                ),
-            ):
-                assert isinstance(alias.name.value, str)
-                self.add_library(alias.name.value)
-
-
 # Populate `imports` (local-name -> canonical dotted qualname) so helpers can
 # resolve call-sites regardless of import style.  Mappings produced:
 #   "import trio"                 => {"trio": "trio"}
@@ -209,65 +211,6 @@ class VisitorImportTracker(Flake8AsyncVisitor):
     visit_Lambda = _enter_scope
 
 
-@utility_visitor_cst
-class VisitorImportTracker_cst(Flake8AsyncVisitor_cst):
-    def __init__(self, *args: Any, **kwargs: Any):
-        super().__init__(*args, **kwargs)
-        self._scope_depth = 0
-
-    def _at_module_level(self) -> bool:
-        return self._scope_depth == 0
-
-    def visit_Import(self, node: cst.Import):
-        if not self._at_module_level():
-            return
-        for alias in node.names:
-            full_name = identifier_to_string(alias.name)
-            if full_name is None:
-                continue
-            if alias.asname is not None and isinstance(alias.asname.name, cst.Name):
-                self.imports[alias.asname.name.value] = full_name
-                continue
-            top = full_name.partition(".")[0]
-            self.imports.setdefault(top, top)
-            self.imports.setdefault(full_name, full_name)
-
-    def visit_ImportFrom(self, node: cst.ImportFrom):
-        if (
-            node.module is None
-            or node.relative
-            or isinstance(node.names, cst.ImportStar)
-            or not self._at_module_level()
-        ):
-            return
-        module = identifier_to_string(node.module)
-        if module is None:
-            return
-        for alias in node.names:
-            name = identifier_to_string(alias.name)
-            if name is None:
-                continue
-            if alias.asname is not None and isinstance(alias.asname.name, cst.Name):
-                local = alias.asname.name.value
-            else:
-                local = name
-            self.imports[local] = f"{module}.{name}"
-
-    def _enter_scope(self, node: cst.CSTNode) -> None:
-        self._scope_depth += 1
-
-    def _leave_scope(self, original_node: cst.CSTNode, updated_node: Any) -> Any:
-        self._scope_depth -= 1
-        return updated_node
-
-    visit_FunctionDef = _enter_scope
-    visit_ClassDef = _enter_scope
-    visit_Lambda = _enter_scope
-    leave_FunctionDef = _leave_scope
-    leave_ClassDef = _leave_scope
-    leave_Lambda = _leave_scope
-
-
 # taken from
 # https://github.com/PyCQA/flake8/blob/d016204366a22d382b5b56dc14b6cbff28ce929e/src/flake8/defaults.py#L27
 NOQA_INLINE_REGEXP = re.compile(
@@ -295,34 +238,34 @@ def _find_noqa(physical_line: str) -> Match[str] | None:
     return NOQA_INLINE_REGEXP.search(physical_line)
 
 
-@utility_visitor_cst
-class NoqaHandler(Flake8AsyncVisitor_cst):
-    def visit_Comment(self, node: cst.Comment):
-        noqa_match = _find_noqa(node.value)
-        if noqa_match is None:
-            return False
-
-        codes_str = noqa_match.groupdict()["codes"]
-
-        # see https://github.com/Instagram/LibCST/issues/1107
-        metadata = cast("CodeRange", self.get_metadata(PositionProvider, node))
-        pos = metadata.start
-
-        codes: set[str]
-
-        # blanket noqa
-        if codes_str is None:
-            # this also includes a non-blanket noqa with a list of invalid codes
-            # so one should maybe instead specifically look for no `:`
-            codes = set()
-        else:
-            # split string on ",", strip of whitespace, and save in set if non-empty
-            codes = {
-                item_strip
-                for item in codes_str.split(",")
-                if (item_strip := item.strip())
-            }
-
-            # TODO: Check that code exists
-        self.noqas[pos.line] = codes
-        return False
+def noqa_codes(comment: str) -> set[str] | None:
+    """Return the codes in a noqa comment, an empty set for a blanket noqa."""
+    noqa_match = _find_noqa(comment)
+    if noqa_match is None:
+        return None
+
+    codes_str = noqa_match.groupdict()["codes"]
+
+    # blanket noqa
+    if codes_str is None:
+        # this also includes a non-blanket noqa with a list of invalid codes
+        # so one should maybe instead specifically look for no `:`
+        return set()
+    # split string on ",", strip of whitespace, and save in set if non-empty
+    # TODO: Check that code exists
+    return {item_strip for item in codes_str.split(",") if (item_strip := item.strip())}
+
+
+def find_noqas(source: str) -> dict[int, set[str]]:
+    """Find noqa comments with `tokenize`, for when no cst visitors are run.
+
+    Gives the same result as running `NoqaHandler`, without parsing the source
+    with libcst.
+    """
+    noqas: dict[int, set[str]] = {}
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type == tokenize.COMMENT and (
+            (codes := noqa_codes(token.string)) is not None
+        ):
+            noqas[token.start[0]] = codes
+    return noqas
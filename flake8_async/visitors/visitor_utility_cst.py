@@ -0,0 +1,111 @@
+"""Utility visitors run on libcst's syntax tree, for tracking shared state."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, cast
+
+import libcst as cst
+
+from ._positions import LazyPositionProvider
+from .flake8asyncvisitor_cst import Flake8AsyncVisitor_cst
+from .helpers import utility_visitor_cst
+from .helpers_cst import identifier_to_string
+from .visitor_utility import noqa_codes
+
+if TYPE_CHECKING:
+    from libcst.metadata import CodeRange
+
+
+@utility_visitor_cst
+class VisitorLibraryHandler_cst(Flake8AsyncVisitor_cst):
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # check whether library we're working towards has been explicitly
+        # specified with --anyio, otherwise assume Trio - but we update if we
+        # see imports
+        if self.options.anyio:
+            self.add_library("anyio")
+        if self.options.asyncio:
+            self.add_library("asyncio")
+
+    def visit_Import(self, node: cst.Import):
+        for alias in node.names:
+            if (
+                isinstance(alias.name, cst.Name)
+                and alias.name.value in ("trio", "anyio", "asyncio")
+                and alias.asname is None
+            ):
+                self.add_library(alias.name.value)
+
+
+# Populates `imports` as `VisitorImportTracker` does.
+@utility_visitor_cst
+class VisitorImportTracker_cst(Flake8AsyncVisitor_cst):
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._scope_depth = 0
+
+    def _at_module_level(self) -> bool:
+        return self._scope_depth == 0
+
+    def visit_Import(self, node: cst.Import):
+        if not self._at_module_level():
+            return
+        for alias in node.names:
+            full_name = identifier_to_string(alias.name)
+            if full_name is None:
+                continue
+            if alias.asname is not None and isinstance(alias.asname.name, cst.Name):
+                self.imports[alias.asname.name.value] = full_name
+                continue
+            top = full_name.partition(".")[0]
+            self.imports.setdefault(top, top)
+            self.imports.setdefault(full_name, full_name)
+
+    def visit_ImportFrom(self, node: cst.ImportFrom):
+        if (
+            node.module is None
+            or node.relative
+            or isinstance(node.names, cst.ImportStar)
+            or not self._at_module_level()
+        ):
+            return
+        module = identifier_to_string(node.module)
+        if module is None:
+            return
+        for alias in node.names:
+            name = identifier_to_string(alias.name)
+            if name is None:
+                continue
+            if alias.asname is not None and isinstance(alias.asname.name, cst.Name):
+                local = alias.asname.name.value
+            else:
+                local = name
+            self.imports[local] = f"{module}.{name}"
+
+    def _enter_scope(self, node: cst.CSTNode) -> None:
+        self._scope_depth += 1
+
+    def _leave_scope(self, original_node: cst.CSTNode, updated_node: Any) -> Any:
+        self._scope_depth -= 1
+        return updated_node
+
+    visit_FunctionDef = _enter_scope
+    visit_ClassDef = _enter_scope
+    visit_Lambda = _enter_scope
+    leave_FunctionDef = _leave_scope
+    leave_ClassDef = _leave_scope
+    leave_Lambda = _leave_scope
+
+
+@utility_visitor_cst
+class NoqaHandler(Flake8AsyncVisitor_cst):
+    def visit_Comment(self, node: cst.Comment):
+        codes = noqa_codes(node.value)
+        if codes is None:
+            return False
+
+        # see https://github.com/Instagram/LibCST/issues/1107
+        metadata = cast("CodeRange", self.get_metadata(LazyPositionProvider, node))
+        self.noqas[metadata.start.line] = codes
+        return False
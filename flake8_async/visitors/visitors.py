@@ -6,11 +6,11 @@ import ast
 from collections import defaultdict
 from typing import TYPE_CHECKING, Any, cast
 
-from .flake8asyncvisitor import Flake8AsyncVisitor, Flake8AsyncVisitor_cst
+from ._scopes import function_bindings, module_level_name
+from .flake8asyncvisitor import Flake8AsyncVisitor
 from .helpers import (
     disabled_by_default,
     error_class,
-    error_class_cst,
     get_matching_call,
     has_decorator,
 )
@@ -18,8 +18,6 @@ from .helpers import (
 if TYPE_CHECKING:
     from collections.abc import Iterable, Mapping
 
-    import libcst as cst
-
 LIBRARIES = ("trio", "anyio", "asyncio")
 
 
@@ -192,18 +190,57 @@ class Visitor113(Flake8AsyncVisitor):
         self.aenter = False
 
         self.potential_errors: dict[str, list[ast.Call]] = defaultdict(list)
+        # the functions the current node is in, and the names bound in them - only
+        # worked out when --project-index knows a function by the name that's used
+        self.enclosing_functions: tuple[
+            ast.FunctionDef | ast.AsyncFunctionDef | ast.Lambda, ...
+        ] = ()
+        self.function_bindings: dict[ast.AST, set[str]] = {}
 
     def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
-        self.save_state(node, "aenter", "asynccontextmanager", "potential_errors")
+        self.save_state(
+            node,
+            "aenter",
+            "asynccontextmanager",
+            "potential_errors",
+            "enclosing_functions",
+        )
+        self.enclosing_functions = (*self.enclosing_functions, node)
 
         self.aenter = node.name == "__aenter__"
         self.asynccontextmanager = has_decorator(node, "asynccontextmanager")
 
     def visit_FunctionDef(self, node: ast.FunctionDef):
-        self.save_state(node, "aenter", "asynccontextmanager", "potential_errors")
+        self.save_state(
+            node,
+            "aenter",
+            "asynccontextmanager",
+            "potential_errors",
+            "enclosing_functions",
+        )
+        self.enclosing_functions = (*self.enclosing_functions, node)
         # sync function should never be named __aenter__ or have @asynccontextmanager
         self.aenter = self.asynccontextmanager = False
 
+    def visit_Lambda(self, node: ast.Lambda):
+        self.save_state(node, "enclosing_functions")
+        self.enclosing_functions = (*self.enclosing_functions, node)
+
+    def _is_indexed_startable(self, node: ast.expr) -> bool:
+        """Whether `node` refers to a function --project-index found is startable."""
+        index = self.options.project_index
+        if index is None:
+            return False
+        name = self.canonical_name(node)
+        if name is None or not index.is_startable(name, self.filename):
+            return False
+        bindings: set[str] = set()
+        for function in self.enclosing_functions:
+            if function not in self.function_bindings:
+                self.function_bindings[function] = function_bindings(function)
+            bindings |= self.function_bindings[function]
+        return module_level_name(node, self.imports, bindings) is not None
+
     def visit_Yield(self, node: ast.Yield):
         for nodes in self.potential_errors.values():
             for n in nodes:
@@ -214,13 +251,16 @@ class Visitor113(Flake8AsyncVisitor):
     def visit_Call(self, node: ast.Call) -> None:
         def is_startable(n: ast.expr, *startable_list: str) -> bool:
             if isinstance(n, ast.Name):
-                return n.id in startable_list
+                return n.id in startable_list or self._is_indexed_startable(n)
             if isinstance(n, ast.Attribute):
-                return n.attr in startable_list and not (
-                    n.attr in TRIO_STARTABLE_CALLS
-                    and isinstance(n.value, ast.Name)
-                    and n.value.id != "trio"
-                )
+                return (
+                    n.attr in startable_list
+                    and not (
+                        n.attr in TRIO_STARTABLE_CALLS
+                        and isinstance(n.value, ast.Name)
+                        and n.value.id != "trio"
+                    )
+                ) or self._is_indexed_startable(n)
             if isinstance(n, ast.Call):
                 return any(is_startable(nn, *startable_list) for nn in n.args)
             return False
@@ -231,7 +271,9 @@ class Visitor113(Flake8AsyncVisitor):
                 "create_task",
             ):
                 return None
-            var = ast.unparse(node.value)
+            var = self.dotted_name(node.value)
+            if var is None:
+                return None
             if (
                 ("trio" in self.library and var.endswith("nursery"))
                 or ("anyio" in self.library and var.endswith("task_group"))
@@ -281,6 +323,8 @@ class Visitor113(Flake8AsyncVisitor):
 # --startable-in-context-manager. Will only match against the last part of the option
 # name, so may miss cases where functions are named the same in different modules/classes
 # and option names are specified including the module name.
+# Module-level functions found by --project-index don't need to be added, as ASYNC113
+# knows them.
 @error_class
 class Visitor114(Flake8AsyncVisitor):
     error_codes: Mapping[str, str] = {
@@ -290,7 +334,27 @@ class Visitor114(Flake8AsyncVisitor):
         ),
     }
 
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.module_level = True
+
+    def _enter_scope(self, node: ast.AST):
+        self.save_state(node, "module_level")
+        self.module_level = False
+
+    visit_FunctionDef = _enter_scope
+    visit_ClassDef = _enter_scope
+
     def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef):
+        index = self.options.project_index
+        module_level = self.module_level
+        self._enter_scope(node)
+        if (
+            index is not None
+            and module_level
+            and index.is_startable(node.name, self.filename)
+        ):
+            return
         if any(
             isinstance(n, ast.arg) and n.arg == "task_status"
             for n in self.walk(*node.args.args, *node.args.kwonlyargs)
@@ -630,7 +694,10 @@ class Visitor128(Flake8AsyncVisitor):
     # in nested functions closing over the parameter. Nested functions that rebind
     # the name are startable functions of their own, checked separately.
     def _calls_started(self, node: ast.AST, name: str) -> bool:
-        if isinstance(node, ast.Call) and ast.unparse(node.func) == f"{name}.started":
+        if (
+            isinstance(node, ast.Call)
+            and self.dotted_name(node.func) == f"{name}.started"
+        ):
             return True
         children: Iterable[ast.AST] = ast.iter_child_nodes(node)
         if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
@@ -656,7 +723,7 @@ class Visitor128(Flake8AsyncVisitor):
             if not (
                 (
                     ann is not None
-                    and ast.unparse(ann).rsplit(".", 1)[-1] == "TaskStatus"
+                    and (self.dotted_name(ann) or "").rsplit(".", 1)[-1] == "TaskStatus"
                 )
                 or (arg.arg == "task_status" and arg not in args.posonlyargs)
             ):
@@ -670,54 +737,6 @@ class Visitor128(Flake8AsyncVisitor):
             return
 
 
-@error_class_cst
-class Visitor300(Flake8AsyncVisitor_cst):
-    error_codes: Mapping[str, str] = {
-        "ASYNC300": "asyncio.create_task() called without saving the result"
-    }
-
-    def __init__(self, *args: Any, **kwargs: Any):
-        super().__init__(*args, **kwargs)
-        self.safe_to_create_task: bool = False
-
-    def visit_Assign(self, node: cst.CSTNode):
-        self.save_state(node, "safe_to_create_task")
-        self.safe_to_create_task = True
-
-    def visit_CompIf(self, node: cst.CSTNode):
-        self.save_state(node, "safe_to_create_task")
-        self.safe_to_create_task = False
-
-    def visit_Call(self, node: cst.Call):
-        if (
-            self.canonical_name(node.func) == "asyncio.create_task"
-            and not self.safe_to_create_task
-        ):
-            self.error(node)
-        self.visit_Assign(node)
-
-    visit_NamedExpr = visit_Assign
-    visit_AugAssign = visit_Assign
-    visit_Return = visit_Assign
-    visit_IfExp_test = visit_CompIf
-
-    # because this is a Flake8AsyncVisitor_cst, we need to manually call restore_state
-    def leave_Assign(
-        self, original_node: cst.CSTNode, updated_node: cst.CSTNode
-    ) -> Any:
-        self.restore_state(original_node)
-        return updated_node
-
-    leave_Call = leave_Assign
-    leave_CompIf = leave_Assign
-    leave_NamedExpr = leave_Assign
-    leave_AugAssign = leave_Assign
-    leave_Return = leave_Assign
-
-    def leave_IfExp_test(self, node: cst.IfExp):
-        self.restore_state(node)
-
-
 @error_class
 @disabled_by_default
 class Visitor900(Flake8AsyncVisitor):
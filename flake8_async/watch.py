@@ -0,0 +1,220 @@
+"""Implements ``--watch``, continuously re-checking files as they change.
+
+Results for all files are kept in memory, and only changed files are re-checked.
+Changes are detected with inotify where available, falling back to polling
+``os.stat`` for mtime/size changes.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Protocol
+
+import libcst as cst
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from .base import Error
+
+# flags from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT_HEADER = struct.Struct("iIII")
+
+# After the first change in a batch we wait this long for more changes, so e.g.
+# `git checkout` or "save all" in an editor gets checked as a single batch.
+DEBOUNCE_SECONDS = 0.05
+
+
+class Watcher(Protocol):  # pragma: no cover
+    def wait(self) -> set[str]:
+        """Block until at least one file has changed, and return changed files."""
+        ...
+
+    def close(self) -> None: ...
+
+
+Snapshot = dict[str, tuple[int, int] | None]
+
+
+def take_snapshot(filenames: Iterable[str]) -> Snapshot:
+    res: Snapshot = {}
+    for filename in filenames:
+        try:
+            st = Path(filename).stat()
+        except OSError:  # noqa: PERF203 # try-except in loop
+            res[filename] = None
+        else:
+            res[filename] = (st.st_mtime_ns, st.st_size)
+    return res
+
+
+class PollingWatcher:
+    """Detect changes by comparing mtime and size of all files every `interval`."""
+
+    def __init__(self, filenames: Iterable[str], interval: float = 0.5):
+        super().__init__()
+        self.interval = interval
+        self.snapshot = take_snapshot(filenames)
+
+    def poll(self) -> set[str]:
+        new_snapshot = take_snapshot(self.snapshot)
+        changed = {f for f, stat in new_snapshot.items() if stat != self.snapshot[f]}
+        self.snapshot = new_snapshot
+        return changed
+
+    def wait(self) -> set[str]:
+        while not (changed := self.poll()):
+            time.sleep(self.interval)
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Detect changes with inotify, watching the parent directories of all files.
+
+    Watching directories instead of files means we also pick up editors that save
+    by writing to a temporary file and renaming it over the original.
+    Raises OSError if inotify is not available on this system.
+    """
+
+    def __init__(self, filenames: Iterable[str]):
+        super().__init__()
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd: int = self._libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:  # pragma: no cover
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # maps (watch descriptor, basename) -> filename as passed to us
+        self._files: dict[tuple[int, str], str] = {}
+        watched_dirs: dict[str, int] = {}
+        for filename in filenames:
+            path = Path(filename).resolve()
+            dirname, basename = str(path.parent), path.name
+            if (wd := watched_dirs.get(dirname)) is None:
+                wd = self._libc.inotify_add_watch(
+                    self._fd, os.fsencode(dirname), WATCH_MASK
+                )
+                if wd < 0:
+                    self.close()
+                    raise OSError(ctypes.get_errno(), f"cannot watch {dirname}")
+                watched_dirs[dirname] = wd
+            self._files[wd, basename] = filename
+
+    def _read_events(self, timeout: float | None) -> set[str]:
+        changed: set[str] = set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return changed
+        buffer = os.read(self._fd, 64 * 1024)
+        offset = 0
+        while offset < len(buffer):
+            wd, _mask, _cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if (filename := self._files.get((wd, name))) is not None:
+                changed.add(filename)
+        return changed
+
+    def wait(self) -> set[str]:
+        changed: set[str] = set()
+        while not changed:
+            changed = self._read_events(timeout=None)
+        while more := self._read_events(timeout=DEBOUNCE_SECONDS):
+            changed |= more
+        return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def make_watcher(filenames: Iterable[str]) -> Watcher:
+    filenames = list(filenames)
+    try:
+        return InotifyWatcher(filenames)
+    except OSError:
+        return PollingWatcher(filenames)
+
+
+def watch(
+    filenames: Iterable[str],
+    check: Callable[[str], list[Error]],
+    watcher: Watcher | None = None,
+    max_batches: int | None = None,
+    on_batch: Callable[[], None] | None = None,
+) -> int:
+    """Check all files, then re-check files as they change until interrupted.
+
+    Errors are printed for each (re-)checked file, followed by a summary of the
+    errors across all files on stderr, and a call to `on_batch` if given. Returns the
+    exit code for the last state of the files once interrupted, or once `max_batches`
+    batches have been checked.
+    """
+    results: dict[str, list[Error]] = {}
+
+    def check_batch(batch: Iterable[str]) -> None:
+        start = time.perf_counter()
+        n_checked = 0
+        for file in sorted(batch):
+            if not Path(file).exists():
+                results.pop(file, None)
+                continue
+            n_checked += 1
+            try:
+                results[file] = check(file)
+            # which parser fails first depends on the enabled visitors
+            except (SyntaxError, cst.ParserSyntaxError) as e:
+                results[file] = []
+                # the libcst message is followed by several lines of context
+                message = e.message if isinstance(e, cst.ParserSyntaxError) else e
+                print(f"{file}: failed to parse: {message}", file=sys.stderr)
+                continue
+            for error in results[file]:
+                print(f"{file}:{error}")
+        n_errors = sum(map(len, results.values()))
+        n_error_files = sum(1 for errors in results.values() if errors)
+        print(
+            f"flake8-async: {n_errors} error(s) in {n_error_files} of"
+            f" {len(results)} file(s), checked {n_checked} file(s) in"
+            f" {time.perf_counter() - start:.2f}s",
+            file=sys.stderr,
+            flush=True,
+        )
+        if on_batch is not None:
+            on_batch()
+
+    filenames = list(filenames)
+    # start watching before the initial check, so we don't miss any changes
+    if watcher is None:
+        watcher = make_watcher(filenames)
+    check_batch(filenames)
+    n_batches = 0
+    try:
+        while max_batches is None or n_batches < max_batches:
+            check_batch(watcher.wait())
+            n_batches += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 1 if any(results.values()) else 0
@@ -4,6 +4,11 @@ from __future__ import annotations
 
 import pytest
 
+from flake8_async.visitors import load_visitors
+
+# visitors are imported lazily when running, but many tests inspect all visitors
+load_visitors()
+
 
 def pytest_addoption(parser: pytest.Parser):
     parser.addoption(
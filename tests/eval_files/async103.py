@@ -128,11 +128,10 @@ except BaseException:
         raise
 
 # nested try
-# in theory safe if the try, and all excepts raises - and there's a bare except.
-# But is a very weird pattern that we don't handle.
+# safe if the try, and all excepts raises - and there's a bare except.
 try:
     ...
-except BaseException as e:  # ASYNC103_trio: 7, "BaseException"
+except BaseException as e:  # safe
     try:
         raise e
     except ValueError:
@@ -23,11 +23,10 @@ except BaseException as e:
 # TODO: Black 23.1.0 moves the long comments around a bit.
 
 # nested try
-# in theory safe if the try, and all excepts raises - and there's a bare except.
-# But is a very weird pattern that we don't handle.
+# safe if the try, and all excepts raises - and there's a bare except.
 try:
     ...
-except BaseException as e:  # ASYNC103_trio: 7, "BaseException"
+except BaseException as e:  # safe
     try:
         raise e
     except ValueError:
@@ -104,7 +103,7 @@ def foo2():
         except ValueError:
             return  # error: 12
         else:
-            return  # type: ignore[unreachable] # error: 12
+            return  # type: ignore[unreachable] # unreachable, so safe
         finally:
             # a return here would also be an error - but it's a syntax error
             # from py314+ and we don't have the test infra to handle that properly.
@@ -130,6 +129,23 @@ def foo4():
                 break  # error: 16
             raise
 
+def foo5():
+    try:
+        ...
+    except BaseException:
+        if foo():
+            return  # error: 12
+        raise
+
+def foo6():
+    try:
+        ...
+    except BaseException:  # ASYNC103_trio: 11, "BaseException"
+        try:
+            return  # error: 12
+        finally:
+            ...
+
 try:
     ...
 except BaseException:  # safe
@@ -200,3 +216,11 @@ except BaseException:  # ASYNC103_trio: 7, "BaseException"
             return  # ASYNC104: 12
         case blah:
             raise
+
+# returning from a function defined in the handler doesn't leave the handler
+try:
+    ...
+except BaseException:  # safe
+    def bar():
+        return
+    raise
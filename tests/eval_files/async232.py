@@ -194,18 +194,57 @@ async def overridden_type(f: TextIOWrapper):
     f.read()  # ASYNC232: 4, 'read', 'f', "trio"
 
 
-# ***** Known unhandled cases *****
-
-
-# It will error on non-explicit assignments
+# Assigning a value of unknown type also overrides it
 async def implicit_overridden_type():
     f: TextIOWrapper = ...
     f = arbitrary_function()
+    f.read()
+    f: TextIOWrapper = ...
     f.read()  # ASYNC232: 4, 'read', 'f', "trio"
-    f = 7
+    for f in range(3):
+        f.read()
+    f: TextIOWrapper = ...
+    with arbitrary_function() as f:
+        f.read()
+
+
+# The value is evaluated before the name is rebound
+async def rebound_to_own_value(f: TextIOWrapper):
+    f = f.read()  # ASYNC232: 8, 'read', 'f', "trio"
+
+
+async def loop_over_own_value(f: TextIOWrapper):
+    for f in f.readlines():  # ASYNC232: 13, 'readlines', 'f', "trio"
+        f.read()
+
+
+# Variables in inner scopes shadow outer ones
+async def shadowing(f: TextIOWrapper):
+    def inner():
+        f = arbitrary_function()
+        f.read()
+
+    async def inner_async(f):
+        f.read()
+
+    async def inner_async_2():
+        f.read()  # ASYNC232: 8, 'read', 'f', "trio"
+
     f.read()  # ASYNC232: 4, 'read', 'f', "trio"
 
 
+class ClassScope:
+    h: TextIOWrapper = ...
+    h.read()
+
+    # class variables aren't visible in methods
+    async def method(self):
+        h.read()
+
+
+# ***** Known unhandled cases *****
+
+
 # Tuple assignments are completely ignored
 async def multi_assign():
     x, y = open(""), open("")
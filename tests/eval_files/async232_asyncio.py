@@ -195,18 +195,57 @@ async def overridden_type(f: TextIOWrapper):
     f.read()  # ASYNC232_asyncio: 4, 'read', 'f'
 
 
-# ***** Known unhandled cases *****
-
-
-# It will error on non-explicit assignments
+# Assigning a value of unknown type also overrides it
 async def implicit_overridden_type():
     f: TextIOWrapper = ...
     f = arbitrary_function()
+    f.read()
+    f: TextIOWrapper = ...
     f.read()  # ASYNC232_asyncio: 4, 'read', 'f'
-    f = 7
+    for f in range(3):
+        f.read()
+    f: TextIOWrapper = ...
+    with arbitrary_function() as f:
+        f.read()
+
+
+# The value is evaluated before the name is rebound
+async def rebound_to_own_value(f: TextIOWrapper):
+    f = f.read()  # ASYNC232_asyncio: 8, 'read', 'f'
+
+
+async def loop_over_own_value(f: TextIOWrapper):
+    for f in f.readlines():  # ASYNC232_asyncio: 13, 'readlines', 'f'
+        f.read()
+
+
+# Variables in inner scopes shadow outer ones
+async def shadowing(f: TextIOWrapper):
+    def inner():
+        f = arbitrary_function()
+        f.read()
+
+    async def inner_async(f):
+        f.read()
+
+    async def inner_async_2():
+        f.read()  # ASYNC232_asyncio: 8, 'read', 'f'
+
     f.read()  # ASYNC232_asyncio: 4, 'read', 'f'
 
 
+class ClassScope:
+    h: TextIOWrapper = ...
+    h.read()
+
+    # class variables aren't visible in methods
+    async def method(self):
+        h.read()
+
+
+# ***** Known unhandled cases *****
+
+
 # Tuple assignments are completely ignored
 async def multi_assign():
     x, y = open(""), open("")
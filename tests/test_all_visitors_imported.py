@@ -1,13 +1,35 @@
-"""Check that all visitors are imported.
+"""Check that all visitors are in the registry.
 
-Checks that all flake8_async/visitor*.py files are imported in
-flake8_async/visitor/__init__.py so their decorators are run.
+Visitor modules are imported lazily, using the table of error codes in
+flake8_async/visitors/_registry.py to find the modules for enabled codes - so
+it must list the module of every registered visitor.
 """
 
 from __future__ import annotations
 
-import re
 from pathlib import Path
+from pprint import pformat
+
+from flake8_async.base import error_has_subidentifier
+from flake8_async.visitors import (
+    ERROR_CLASSES,
+    ERROR_CLASSES_CST,
+    default_disabled_error_codes,
+    load_visitors,
+    utility_visitors,
+    utility_visitors_cst,
+)
+from flake8_async.visitors._registry import (
+    AST_ERROR_CODES,
+    CST_ERROR_CODES,
+    DEFAULT_DISABLED_ERROR_CODES,
+    UTILITY_MODULES,
+    UTILITY_MODULES_CST,
+)
+
+
+def _module_name(cls: type) -> str:
+    return cls.__module__.rsplit(".", 1)[1]
 
 
 def test_all_visitors_imported():
@@ -15,18 +37,33 @@ def test_all_visitors_imported():
     visitor_files = {
         f.stem for f in visitor_dir.iterdir() if f.stem.startswith("visitor")
     }
-    visited_files: set[str] = set()
-    in_import: bool | None = None
-    with open(visitor_dir / "__init__.py") as f:
-        for line in f:
-            if m := re.fullmatch(r"from \. import \(\n", line):
-                in_import = True
-            elif in_import and (m := re.fullmatch(r" *(?P<module>\w*),\n", line)):
-                visited_files.add(m.group("module"))
-            elif in_import and re.fullmatch(r"\)\n", line):
-                in_import = False
-
-    # check that parsing succeeded
-    assert in_import is False
-
-    assert visitor_files == visited_files
+    registry_modules = {
+        *AST_ERROR_CODES.values(),
+        *CST_ERROR_CODES.values(),
+        *UTILITY_MODULES,
+        *UTILITY_MODULES_CST,
+    }
+    assert visitor_files == registry_modules
+
+
+def test_registry_up_to_date():
+    load_visitors()
+    for classes, registry in (
+        (ERROR_CLASSES, AST_ERROR_CODES),
+        (ERROR_CLASSES_CST, CST_ERROR_CODES),
+    ):
+        expected = {
+            code: _module_name(cls)
+            for cls in classes
+            for code in cls.error_codes
+            if not error_has_subidentifier(code)
+        }
+        assert registry == expected, "update _registry.py:\n" + pformat(expected)
+
+    assert {_module_name(cls) for cls in utility_visitors} == set(UTILITY_MODULES)
+    assert {_module_name(cls) for cls in utility_visitors_cst} == set(
+        UTILITY_MODULES_CST
+    )
+    # the decorators check that codes are listed, but not that listed codes exist
+    assert default_disabled_error_codes == list(DEFAULT_DISABLED_ERROR_CODES)
+    assert set(DEFAULT_DISABLED_ERROR_CODES) <= {*AST_ERROR_CODES, *CST_ERROR_CODES}
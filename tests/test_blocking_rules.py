@@ -0,0 +1,228 @@
+"""Tests for `--async200-rules`, declarative rules for blocking calls."""
+
+from __future__ import annotations
+
+import ast
+import json
+import sys
+from argparse import ArgumentTypeError
+from typing import TYPE_CHECKING
+
+import pytest
+
+from flake8_async import Checker
+from flake8_async.blocking_rules import BlockingCalls, BlockingRule, load_rules
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+RULES: list[dict[str, object]] = [
+    {"call": "mysdk.fetch", "replacement": "mysdk.afetch"},
+    {
+        "call": "mysdk.request",
+        "first_arg": ["GET", "POST"],
+        "replacement": {"trio": "mysdk.trio.request", "asyncio": "mysdk.aio.request"},
+    },
+    {
+        "type": "mysdk.Client",
+        "methods": ["get", "post"],
+        "replacement": {"default": "mysdk.AsyncClient", "asyncio": "mysdk.aio.Client"},
+    },
+    {"type": "mysdk.Session", "replacement": "mysdk.AsyncSession"},
+]
+
+RULES_TOML = """\
+[[rule]]
+call = "mysdk.fetch"
+replacement = "mysdk.afetch"
+
+[[rule]]
+call = "mysdk.request"
+first_arg = ["GET", "POST"]
+replacement = { trio = "mysdk.trio.request", asyncio = "mysdk.aio.request" }
+
+[[rule]]
+type = "mysdk.Client"
+methods = ["get", "post"]
+replacement = { default = "mysdk.AsyncClient", asyncio = "mysdk.aio.Client" }
+
+[[rule]]
+type = "mysdk.Session"
+replacement = "mysdk.AsyncSession"
+"""
+
+SOURCE = """\
+import mysdk
+from mysdk import fetch as get_it
+
+async def foo(client: mysdk.Client):
+    mysdk.fetch()
+    get_it()
+    mysdk.request("GET", "/")
+    mysdk.request("DELETE", "/")
+    client.get()
+    client.close()
+    session = mysdk.Session()
+    session.anything()
+    fetch()
+"""
+
+
+def rule(
+    call: str, replacement: str = "", first_arg: frozenset[str] | None = None
+) -> BlockingRule:
+    return BlockingRule(call, (("default", replacement or call),), first_arg=first_arg)
+
+
+def match(calls: BlockingCalls, source: str) -> str | None:
+    node = ast.parse(source, mode="eval").body
+    assert isinstance(node, ast.Call)
+    found = calls.match_call([ast.unparse(node.func)], node)
+    return None if found is None else found.call
+
+
+def test_blocking_calls_index():
+    calls = BlockingCalls(
+        [
+            rule("*.*.*"),
+            rule("a.get"),
+            rule("*.get"),
+            rule("b*"),
+            rule("b.request", first_arg=frozenset({"GET"})),
+            rule("@decorated"),
+        ]
+    )
+    # the first rule given that matches wins, whichever way it's indexed
+    assert match(calls, "a.get()") == "a.get"
+    assert match(calls, "x.get()") == "*.get"
+    assert match(calls, "x.y.get()") == "*.*.*"
+    assert match(calls, "bar()") == "b*"
+    assert match(calls, "b.request('GET')") == "b*"
+    assert match(calls, "decorated()") == "@decorated"
+    assert match(calls, "get()") is None
+    assert not BlockingCalls([])
+
+    calls = BlockingCalls(
+        [
+            rule("b.request", first_arg=frozenset({"GET"})),
+            rule("b.*", "other"),
+        ]
+    )
+    assert match(calls, "b.request('GET')") == "b.request"
+    assert match(calls, "b.request('get')") == "b.*"
+    assert match(calls, "b.request(method)") == "b.*"
+
+    node = ast.Call(ast.Name("f"), [], [])
+    methods = BlockingCalls(
+        [
+            BlockingRule(None, (), type="T", methods=frozenset({"get"})),
+            BlockingRule(None, (), type="T"),
+        ]
+    )
+    assert methods
+    assert methods.types == {"T"}
+    get, other = (methods.match_method("T", m, node) for m in ("get", "other"))
+    assert get is not None
+    assert get.methods == frozenset({"get"})
+    assert other is not None
+    assert other.methods is None
+    assert methods.match_method("U", "get", node) is None
+
+    per_library = BlockingRule("f", (("trio", "T"), ("asyncio", "A"), ("default", "D")))
+    assert per_library.suggestion(("trio",)) == "T"
+    assert per_library.suggestion(("asyncio", "trio")) == "A/T"
+    assert per_library.suggestion(("anyio",)) == "D"
+    assert rule("f", "F").suggestion(("trio",)) == "F"
+    assert BlockingRule("f", (("trio", "T"),)).suggestion(("anyio",)) == "T"
+
+
+def check(argv: list[str], source: str = SOURCE) -> list[tuple[object, ...]]:
+    checker = Checker.from_argv(["--enable=ASYNC200", *argv])
+    return [(e.line, *e.args) for e in checker.check_source(source)]
+
+
+def test_async200_rules(tmp_path: Path):
+    (tmp_path / "rules.json").write_text(json.dumps({"rule": RULES}))
+    args = [
+        f"--async200-rules={tmp_path / 'rules.json'}",
+        "--async200-blocking-calls=fetch->afetch",
+    ]
+    assert check(args) == [
+        (5, "mysdk.fetch", "mysdk.afetch"),
+        (6, "mysdk.fetch", "mysdk.afetch"),
+        (7, "mysdk.request", "mysdk.trio.request"),
+        (9, "client.get", "mysdk.AsyncClient"),
+        (12, "session.anything", "mysdk.AsyncSession"),
+        (13, "fetch", "afetch"),
+    ]
+    # with suggestions for the library used
+    errors = check(args, "import asyncio\n" + SOURCE)
+    assert [e[2] for e in errors][2:4] == ["mysdk.aio.request", "mysdk.aio.Client"]
+
+    # the same rules from several files
+    for i, r in enumerate(RULES):
+        (tmp_path / f"rules{i}.json").write_text(json.dumps({"rule": [r]}))
+    files = ",".join(str(tmp_path / f"rules{i}.json") for i in range(len(RULES)))
+    assert check([f"--async200-rules={files}"]) == check(args)[:-1]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 11), reason="needs tomllib")
+def test_async200_rules_toml(tmp_path: Path):
+    (tmp_path / "rules.json").write_text(json.dumps({"rule": RULES}))
+    (tmp_path / "rules.toml").write_text(RULES_TOML)
+    assert check([f"--async200-rules={tmp_path / 'rules.toml'}"]) == check(
+        [f"--async200-rules={tmp_path / 'rules.json'}"]
+    )
+    (tmp_path / "rules.toml").write_text("[rule")
+    with pytest.raises(ArgumentTypeError, match=r"rules\.toml: Expected '\]'"):
+        load_rules(str(tmp_path / "rules.toml"))
+
+
+@pytest.mark.parametrize(
+    ("data", "message"),
+    [
+        ({"rule": 1}, "expected a list of tables under 'rule'"),
+        ({"rule": [1]}, "expected a list of tables under 'rule'"),
+        ([], "expected a list of tables under 'rule'"),
+        ({"rule": [{"call": "f", "replace": "g"}]}, "rule 1: unknown keys replace"),
+        (
+            {"rule": [{"call": "f", "type": "T", "replacement": "g"}]},
+            "rule 1: exactly one of call and type must be given",
+        ),
+        ({"rule": [{"replacement": "g"}]}, "exactly one of call and type"),
+        (
+            {"rule": [{"call": "", "replacement": "g"}]},
+            "call must be a non-empty string",
+        ),
+        (
+            {"rule": [{"call": "f", "methods": ["m"], "replacement": "g"}]},
+            "methods can only be given with type",
+        ),
+        ({"rule": [{"call": "f"}]}, "replacement must be a string, or a table"),
+        (
+            {"rule": [{"call": "f", "replacement": {"curio": "g"}}]},
+            "for any of trio, anyio, asyncio and default",
+        ),
+        (
+            {"rule": [{"type": "T", "methods": [], "replacement": "g"}]},
+            "methods must be a non-empty list of strings",
+        ),
+        (
+            {"rule": [{"call": "f", "first_arg": "GET", "replacement": "g"}]},
+            "first_arg must be a non-empty list of strings",
+        ),
+    ],
+)
+def test_load_rules_invalid(tmp_path: Path, data: object, message: str):
+    (tmp_path / "rules.json").write_text(json.dumps(data))
+    with pytest.raises(ArgumentTypeError, match=message):
+        load_rules(str(tmp_path / "rules.json"))
+
+
+def test_async200_rules_unreadable(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    with pytest.raises(SystemExit):
+        Checker.from_argv([f"--async200-rules={tmp_path / 'missing.json'}"])
+    assert "missing.json: [Errno 2]" in capsys.readouterr().err
+    (tmp_path / "rules.json").write_text("{")
+    with pytest.raises(ArgumentTypeError, match=r"rules\.json: Expecting"):
+        load_rules(str(tmp_path / "rules.json"))
@@ -0,0 +1,133 @@
+"""Tests for the control flow graphs used by flow-sensitive checks."""
+
+from __future__ import annotations
+
+import ast
+from textwrap import dedent
+from typing import TYPE_CHECKING
+
+from flake8_async.visitors._cfg import CFG, EXIT, RAISE, build_cfg
+
+if TYPE_CHECKING:
+    from collections.abc import Collection
+
+
+def build(source: str) -> tuple[ast.FunctionDef, CFG]:
+    func = ast.parse(dedent(source)).body[0]
+    assert isinstance(func, ast.FunctionDef)
+    return func, build_cfg(func)
+
+
+def assigned(cfg: CFG, nodes: Collection[object]) -> set[str]:
+    """Names of the variables assigned by `nodes`."""
+    return {
+        target.id
+        for node in nodes
+        if isinstance(node, ast.Assign)
+        for target in node.targets
+        if isinstance(target, ast.Name)
+    }
+
+
+def test_loops():
+    func, cfg = build("""
+        def f(xs):
+            for x in xs:
+                if x:
+                    break
+                continue
+            else:
+                a = 1
+            while True:
+                for y in [1]:
+                    with open(y):
+                        b = lambda: x
+                    return b
+            c = 2
+        """)
+    reachable = cfg.reachable(func)
+    assert assigned(cfg, reachable) == {"a", "b"}
+    assert EXIT in reachable
+    assert RAISE in reachable
+
+
+def test_finally():
+    func, cfg = build("""
+        def f(xs):
+            for x in xs:
+                try:
+                    break
+                finally:
+                    a = 1
+                b = 2
+            c = 3
+            try:
+                raise
+            finally:
+                d = 4
+            e = 5
+        """)
+    assert assigned(cfg, cfg.reachable(func)) == {"a", "c", "d"}
+    assert assigned(cfg, cfg.reachable(func, fall_through=True)) == {"a", "b", "c", "d"}
+
+
+def test_handlers():
+    func, cfg = build("""
+        def f():
+            try:
+                a = 1
+            except ValueError:
+                b = 2
+                while b:
+                    break
+                yield
+            except BaseException:
+                raise
+            break
+        """)
+    try_ = func.body[0]
+    assert isinstance(try_, ast.Try)
+    value_error, base_exception = try_.handlers
+    nodes = cfg.handler_nodes[value_error]
+    assert assigned(cfg, nodes) == {"b"}
+    # the end of the handler can be reached, but not of the one that re-raises
+    assert cfg.handler_exit[value_error] in cfg.reachable(value_error, within=nodes)
+    assert cfg.handler_exit[base_exception] not in cfg.reachable(
+        base_exception, within=cfg.handler_nodes[base_exception]
+    )
+
+    while_ = value_error.body[1]
+    assert isinstance(while_, ast.While)
+    assert cfg.loop_of[while_.body[0]] is while_
+    # the `break` outside a loop doesn't belong to a loop
+    assert func.body[1] not in cfg.loop_of
+
+    yield_ = value_error.body[2]
+    assert isinstance(yield_, ast.Expr)
+    assert cfg.statement_of[yield_.value] is yield_
+
+
+def test_fall_through():
+    func, cfg = build("""
+        def f(x):
+            try:
+                ...
+            except BaseException:
+                if x:
+                    return
+                try:
+                    continue
+                finally:
+                    a = 1
+                b = 2
+                raise
+        """)
+    try_ = func.body[0]
+    assert isinstance(try_, ast.Try)
+    (handler,) = try_.handlers
+    nodes = cfg.handler_nodes[handler]
+    assert assigned(cfg, cfg.reachable(handler, within=nodes)) == {"a"}
+    reachable = cfg.reachable(handler, within=nodes, fall_through=True)
+    assert assigned(cfg, reachable) == {"a", "b"}
+    # but the block still raises after them
+    assert cfg.handler_exit[handler] not in reachable
@@ -0,0 +1,312 @@
+"""Tests for the `Checker` library API."""
+
+from __future__ import annotations
+
+import itertools
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING
+
+import anyio
+import pytest
+
+from flake8_async import TIMEOUT_CODE, Checker, Plugin, checker
+from flake8_async.base import ErrorBatch
+
+from .test_config_and_args import EXAMPLE_PY_ERROR, write_examplepy
+from .test_flake8_async import initialize_options
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from flake8_async.base import Error
+
+SOURCE = """\
+import trio
+
+
+async def foo():
+    print()
+
+
+async def bar():
+    with trio.move_on_after(10):  # noqa: ASYNC100
+        ...
+    await trio.sleep(1)
+"""
+
+
+def test_check_source():
+    checker = Checker.from_argv(["--enable=ASYNC100,ASYNC910"])
+    errors = checker.check_source(SOURCE, "foo.py")
+    assert [(e.code, e.line) for e in errors] == [("ASYNC910", 4)]
+
+    # the same errors as the plugin, without changing its options
+    initialize_options(Plugin.from_source(""), ["--enable=ASYNC910"])
+    options = Plugin._options
+    assert errors == sorted(Plugin.from_source(SOURCE).run())
+    assert Plugin._options is options
+    # and checks can be repeated, also from several threads at once
+    with ThreadPoolExecutor(4) as executor:
+        assert list(executor.map(checker.check_source, [SOURCE] * 20)) == [errors] * 20
+
+    checker = Checker.from_argv(["--enable=ASYNC100", "--disable-noqa"])
+    assert [e.code for e in checker.check_source(SOURCE)] == ["ASYNC100"]
+
+
+# each checker imports the visitors for its code, while the others check files
+CREATE_CHECKERS_IN_THREADS = """
+from concurrent.futures import ThreadPoolExecutor
+from flake8_async import Checker
+from flake8_async.visitors import AST_ERROR_CODES, CST_ERROR_CODES
+
+def check(code):
+    checker = Checker.from_argv([f"--enable={code}"])
+    for _ in range(5):
+        checker.check_source("import trio\\nasync def foo():\\n    print()\\n")
+
+with ThreadPoolExecutor(8) as executor:
+    list(executor.map(check, sorted({**AST_ERROR_CODES, **CST_ERROR_CODES})))
+"""
+
+
+def test_checkers_created_in_threads():
+    # in a new interpreter, so the visitor modules aren't imported yet
+    subprocess.run(
+        [sys.executable, "-c", CREATE_CHECKERS_IN_THREADS], check=True, timeout=300
+    )
+
+
+def test_check_file_and_many(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    write_examplepy(tmp_path)
+    (tmp_path / "clean.py").write_text("import trio\n")
+    checker = Checker.from_argv()
+    errors = checker.check_file(tmp_path / "example.py")
+    assert [f"./example.py:{e}\n" for e in errors] == [EXAMPLE_PY_ERROR]
+
+    checked: list[str] = []
+
+    def paths() -> Iterator[str]:
+        for path in ("example.py", "clean.py", "example.py"):
+            checked.append(path)
+            yield path
+
+    results = checker.check_many(paths())
+    assert checked == []
+    assert next(results) == ("example.py", errors)
+    assert checked == ["example.py"]
+    assert list(results) == [("clean.py", []), ("example.py", errors)]
+
+
+def test_check_many_processes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    write_examplepy(tmp_path)
+    (tmp_path / "clean.py").write_text("import trio\n")
+    paths = ["example.py", "clean.py"] * 5
+    expected = list(Checker.from_argv().check_many(paths))
+
+    assert list(Checker.from_argv(processes=2).check_many(paths)) == expected
+    # the workers are set up the same way in a thread pool
+    monkeypatch.setattr(checker, "ProcessPoolExecutor", ThreadPoolExecutor)
+    assert list(Checker.from_argv(processes=1).check_many(paths)) == expected
+
+
+def test_check_many_longest_first(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    write_examplepy(tmp_path)
+    (tmp_path / "clean.py").write_text("import trio\n")
+    (tmp_path / "big.py").write_text("import trio\n" * 100)
+    paths = ["clean.py", "example.py", "big.py", "missing.py"]
+    # by size, or by earlier timings scaled to the size of files without any
+    assert checker.longest_first_order(paths) == [
+        "big.py",
+        "example.py",
+        "clean.py",
+        "missing.py",
+    ]
+    costs = {"clean.py": 2.0, "example.py": 0.1}
+    assert checker.longest_first_order(paths, costs) == [
+        "big.py",
+        "clean.py",
+        "example.py",
+        "missing.py",
+    ]
+    # costs are keyed by normalized path
+    costs = {"big.py": 0.0, "clean.py": 1.0}
+    assert checker.longest_first_order(["./big.py", "./clean.py"], costs) == [
+        "./clean.py",
+        "./big.py",
+    ]
+
+    submitted: list[str] = []
+
+    class Executor(ThreadPoolExecutor):
+        def submit(self, fn, /, *args, **kwargs):  # type: ignore[no-untyped-def]
+            submitted.append(args[0])
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(checker, "ProcessPoolExecutor", Executor)
+    paths = ["clean.py", "example.py", "big.py", "clean.py"]
+    results = Checker.from_argv(processes=2).check_many(paths, longest_first=True)
+    assert [path for path, _ in results] == paths
+    assert submitted == ["big.py", "example.py", "clean.py"]
+
+
+@pytest.mark.parametrize("backend", ["asyncio", "trio"])
+def test_acheck_many(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, backend: str):
+    monkeypatch.chdir(tmp_path)
+    write_examplepy(tmp_path)
+    (tmp_path / "clean.py").write_text("import trio\n")
+    paths = ["example.py", "clean.py"] * 5
+    expected = sorted(Checker.from_argv().check_many(paths))
+
+    async def acheck(
+        checker: Checker, limiter: anyio.CapacityLimiter | None
+    ) -> list[tuple[str, list[Error]]]:
+        async with checker.acheck_many(paths, limiter=limiter) as results:
+            return [result async for result in results]
+
+    def run(
+        checker: Checker, limiter: anyio.CapacityLimiter | None = None
+    ) -> list[tuple[str, list[Error]]]:
+        return sorted(anyio.run(acheck, checker, limiter, backend=backend))
+
+    # in worker threads, by default one at a time
+    assert run(Checker.from_argv()) == expected
+
+    # or as many as the limiter allows
+    running = 0
+    most_running = 0
+
+    def check_file(path: str) -> list[Error]:
+        nonlocal running, most_running
+        running += 1
+        most_running = max(most_running, running)
+        try:
+            return Checker.from_argv().check_file(path)
+        finally:
+            running -= 1
+
+    slow = Checker.from_argv()
+    monkeypatch.setattr(slow, "check_file", check_file)
+    limiter = anyio.CapacityLimiter(3)
+    assert run(slow, limiter) == expected
+    assert 1 <= most_running <= 3
+    assert limiter.borrowed_tokens == 0
+
+    # the workers are set up the same way in a thread pool
+    monkeypatch.setattr(checker, "ProcessPoolExecutor", ThreadPoolExecutor)
+    assert run(Checker.from_argv(processes=2)) == expected
+
+
+@pytest.mark.parametrize("backend", ["asyncio", "trio"])
+@pytest.mark.parametrize("processes", [None, 2])
+def test_acheck_many_cancel(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    backend: str,
+    processes: int | None,
+):
+    monkeypatch.chdir(tmp_path)
+    write_examplepy(tmp_path)
+    monkeypatch.setattr(checker, "ProcessPoolExecutor", ThreadPoolExecutor)
+    checker_ = Checker.from_argv(processes=processes)
+
+    async def first() -> tuple[str, list[Error]]:
+        # pending files are abandoned when leaving the block
+        async with checker_.acheck_many(itertools.repeat("example.py")) as results:
+            async for result in results:
+                return result
+        raise AssertionError  # pragma: no cover
+
+    path, errors = anyio.run(first, backend=backend)
+    assert path == "example.py"
+    assert [e.code for e in errors] == ["ASYNC100"]
+
+    async def cancelled() -> None:
+        with anyio.move_on_after(0.1):
+            async with checker_.acheck_many(itertools.repeat("example.py")) as results:
+                async for _ in results:
+                    pass
+
+    anyio.run(cancelled, backend=backend)
+
+    async def missing() -> None:
+        async with checker_.acheck_many(["example.py", "missing.py"]) as results:
+            async for _ in results:
+                pass
+
+    # errors cancel the other checks
+    with pytest.RaisesGroup(FileNotFoundError, flatten_subgroups=True):
+        anyio.run(missing, backend=backend)
+
+
+def _sleep(seconds: float) -> ErrorBatch:  # pragma: no cover # in the workers
+    time.sleep(seconds)
+    return ErrorBatch()
+
+
+def test_worker_pool_kills_hung_workers():
+    # a check stuck in one step can't be stopped by the worker's own time budget
+    pool = checker._WorkerPool(ProcessPoolExecutor, 2, 0.1)
+    try:
+        hung = pool.submit(_sleep, 60)
+        time.sleep(0.5)
+        restarted, queued = pool.submit(_sleep, 60), pool.submit(_sleep, 0)
+        start = time.monotonic()
+        with ThreadPoolExecutor(1) as executor:
+            # restarted on a new worker when the first one is killed, with a new
+            # time budget
+            other = executor.submit(pool.result, restarted)
+            [error] = pool.result(hung)
+            assert [e.code for e in other.result()] == [TIMEOUT_CODE]
+        assert error.code == TIMEOUT_CODE
+        assert error.args[1] == "unknown, its worker process was killed"
+        assert time.monotonic() - start < 30
+        assert list(pool.result(queued)) == []
+    finally:
+        pool.shutdown()
+
+
+def test_worker_pool_threads():
+    # checks run in this process time out, but aren't killed
+    pool = checker._WorkerPool(ThreadPoolExecutor, 1, 0.1)
+    try:
+        [error] = pool.result(pool.submit(_sleep, 2))
+        assert error.code == TIMEOUT_CODE
+    finally:
+        pool.shutdown()
+
+
+def test_worker_pool_cancel_and_shutdown():
+    pool = checker._WorkerPool(ProcessPoolExecutor, 1, 0.1)
+    hung = pool.submit(_sleep, 60)
+    processes = list(pool._executor._processes.values())  # type: ignore[attr-defined]
+    cancelled, queued = pool.submit(_sleep, 0), pool.submit(_sleep, 0)
+    pool.cancel(cancelled)
+    with pytest.raises(CancelledError):
+        pool.result(cancelled)
+    with ThreadPoolExecutor(1) as executor:
+        timed_out = executor.submit(pool.result, hung)
+        # abandoning the checks, the hung one is still killed
+        pool.shutdown(wait=False)
+        assert [e.code for e in timed_out.result()] == [TIMEOUT_CODE]
+    for process in processes:
+        process.join(5)
+        assert not process.is_alive()
+    with pytest.raises(CancelledError):
+        pool.result(queued)
+
+    # a worker exiting breaks the pool, as without a time budget
+    pool = checker._WorkerPool(ProcessPoolExecutor, 1, 60)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            pool.result(pool.submit(os._exit, 1))
+    finally:
+        pool.shutdown()
@@ -9,6 +9,7 @@ from pathlib import Path
 
 import pytest
 
+import flake8_async
 from flake8_async import Plugin, main
 
 from .test_flake8_async import initialize_options
@@ -143,6 +144,43 @@ def test_run_100_autofix(
     assert_autofixed(tmp_path)
 
 
+def test_run_many_files_autofix(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    # files are read ahead while others are checked, and written in the background
+    monkeypatch.setattr(flake8_async, "READ_AHEAD", 2)
+    files = [f"example_{i}.py" for i in range(6)]
+    for file in files:
+        tmp_path.joinpath(file).write_text(EXAMPLE_PY_TEXT)
+    # the encoding declared in a file is used to read it
+    latin1 = "# -*- coding: latin-1 -*-\n# é\n"
+    tmp_path.joinpath(files[3]).write_bytes(
+        (latin1 + EXAMPLE_PY_TEXT).encode("latin-1")
+    )
+    monkeypatch_argv(
+        monkeypatch, tmp_path, [tmp_path / "flake8-async", "--autofix=ASYNC", *files]
+    )
+    assert main() == 1
+
+    out, err = capsys.readouterr()
+    assert [line.split(":")[:2] for line in out.splitlines()] == [
+        [file, "4" if file == files[3] else "2"] for file in files
+    ]
+    assert not err
+    for file in files:
+        expected = EXAMPLE_PY_AUTOFIXED_TEXT
+        if file == files[3]:
+            expected = latin1 + expected
+        assert tmp_path.joinpath(file).read_text(encoding="latin-1") == expected
+
+    # errors reading a file are raised once the files before it are checked
+    monkeypatch_argv(
+        monkeypatch, tmp_path, [tmp_path / "flake8-async", files[0], "missing.py"]
+    )
+    with pytest.raises(FileNotFoundError):
+        main()
+
+
 def test_114_raises_on_invalid_parameter(capsys: pytest.CaptureFixture[str]):
     plugin = Plugin(ast.AST(), [])
     # argparse will reraise ArgumentTypeError as SystemExit
@@ -5,32 +5,53 @@ from __future__ import annotations
 import ast
 import copy
 import difflib
+import gc
 import itertools
 import os
+import pickle
 import re
 import site
 import sys
 import tokenize
 import unittest
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
 from collections import defaultdict, deque
 from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import TYPE_CHECKING, Any
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, NoReturn
 
 import libcst as cst
 import pytest
 from hypothesis import HealthCheck, given, settings
 from hypothesmith import from_grammar, from_node
+from libcst.metadata import PositionProvider
 
-from flake8_async import Plugin
-from flake8_async.base import Error, Statement
+import flake8_async
+from flake8_async import TIMEOUT_MESSAGE, Plugin, cst_parse_module_native
+from flake8_async.base import Error, ErrorBatch, Statement
+from flake8_async.runner import Flake8AsyncRunner, Flake8AsyncRunner_cst
 from flake8_async.visitors import ERROR_CLASSES, ERROR_CLASSES_CST
 from flake8_async.visitors._canonical import (
+    dotted_name,
     resolve_canonical_ast,
     resolve_canonical_cst,
 )
+from flake8_async.visitors._positions import LazyPositionProvider
+from flake8_async.visitors._scopes import Scope, function_bindings
+from flake8_async.visitors.flake8asyncvisitor import StateStack
+from flake8_async.visitors.helpers import MatchingCall, compile_patterns
+from flake8_async.visitors.helpers_cst import (
+    calls_any_of,
+    func_has_decorator,
+    function_bindings_cst,
+    get_matching_call_cst,
+    with_has_call,
+)
 from flake8_async.visitors.visitor4xx import EXCGROUP_ATTRS
+from flake8_async.visitors.visitor91x import func_empty_body
+from flake8_async.visitors.visitor102_120 import Visitor102
+from flake8_async.visitors.visitor_utility import find_noqas
 
 if sys.version_info < (3, 11):
     from exceptiongroup import ExceptionGroup
@@ -585,6 +606,321 @@ def test_eval_files_compile(test: str, path: Path):
     compile(content, str(path), "exec")
 
 
+# Visitors push a frame when saving state upon entering a node, which must be popped
+# when leaving it - otherwise state is restored at the wrong node.
+@pytest.mark.parametrize("autofix", [False, True], ids=["noautofix", "autofix"])
+@pytest.mark.parametrize(("test", "path"), test_files, ids=[f[0] for f in test_files])
+def test_state_frames_balanced(test: str, path: Path, autofix: bool):
+    check_version(test)
+    content = path.read_text()
+    args = ["--enable=ASYNC", "--disable="]
+    if autofix:
+        args.append("--autofix=ASYNC")
+    initialize_options(Plugin(ast.AST(), []), args)
+    assert Plugin._options is not None
+
+    runner = Flake8AsyncRunner(Plugin._options)
+    runner.visit(ast.parse(content))
+    cst_runner = Flake8AsyncRunner_cst(
+        Plugin._options, cst_parse_module_native(content)
+    )
+    consume(cst_runner.run())
+
+    for visitor in (
+        *runner.visitors,
+        *cst_runner.utility_visitors,
+        *cst_runner.visitors,
+    ):
+        assert visitor.frames == [], type(visitor).__name__
+
+
+def test_state_stack():
+    class Stack(StateStack):
+        def __init__(self):
+            super().__init__()
+            self.frames = []
+            self.a = [1]
+            self.b = 2
+
+    stack = Stack()
+    outer, inner = ast.Pass(), ast.Pass()
+    stack.save_state(outer, "a", copy=True)
+    # saving state for the same node again adds to its frame
+    stack.save_state(outer, "b")
+    stack.a.append(3)
+    stack.b = 3
+    stack.save_state(inner, "b")
+    stack.b = 4
+    assert stack.frame(inner)["b"] == 3
+    stack.frame(inner)["b"] = 5
+
+    stack.restore_state(inner)
+    assert stack.b == 5
+    stack.restore_state(outer)
+    assert (stack.a, stack.b) == ([1], 2)
+    assert stack.frames == []
+
+    # state must be restored innermost first
+    stack.save_state(outer)
+    stack.save_state(inner)
+    with pytest.raises(AssertionError):
+        stack.restore_state(outer)
+
+
+# When no cst visitors are enabled the plugin finds noqa comments with tokenize
+# instead of parsing with libcst, which must give the same result.
+@pytest.mark.parametrize(("test", "path"), test_files, ids=[f[0] for f in test_files])
+def test_find_noqas_matches_cst(test: str, path: Path):
+    check_version(test)
+    content = path.read_text()
+    initialize_options(Plugin(ast.AST(), []), ["--enable=ASYNC100"])
+    assert Plugin._options is not None
+
+    cst_runner = Flake8AsyncRunner_cst(
+        Plugin._options, cst_parse_module_native(content)
+    )
+    consume(cst_runner.run())
+    assert find_noqas(content) == cst_runner.noqas
+
+
+def test_single_parse(monkeypatch: pytest.MonkeyPatch):
+    source = (
+        "import trio\n"
+        "async def foo():\n"
+        "    with trio.move_on_after(5):  # noqa\n"
+        "        ...\n"
+        "    with trio.move_on_after(5):\n"
+        "        ...\n"
+    )
+
+    def fail(*args: object, **kwargs: object) -> NoReturn:
+        raise AssertionError("parsed a tree that is not needed")
+
+    for args in ([], ["--disable-noqa"]):
+        plugin = Plugin.from_source(source)
+        initialize_options(plugin, ["--enable=ASYNC102", *args])
+        with monkeypatch.context() as m:
+            m.setattr(flake8_async, "cst_parse_module_native", fail)
+            assert list(plugin.run()) == []
+
+    plugin = Plugin.from_source(source)
+    initialize_options(plugin, ["--enable=ASYNC100"])
+    with monkeypatch.context() as m:
+        m.setattr(ast, "parse", fail)
+        errors = list(plugin.run())
+    assert [e.line for e in errors] == [5]
+
+
+def test_max_seconds_per_file(monkeypatch: pytest.MonkeyPatch):
+    source = (
+        "import trio\n"
+        "async def foo():\n"
+        "    with trio.move_on_after(5):\n"
+        "        ...\n"
+        "    await trio.sleep(0)\n"
+        "    await trio.sleep(0)\n"
+    )
+    clock = [0.0]
+    monkeypatch.setattr(
+        flake8_async.runner, "time", SimpleNamespace(perf_counter=lambda: clock[0])
+    )
+    visit_await = Visitor102.visit_Await
+
+    def slow_visit_await(self: Visitor102, node: ast.Await):
+        clock[0] += 5
+        visit_await(self, node)
+
+    monkeypatch.setattr(Visitor102, "visit_Await", slow_visit_await)
+    # handlers are looked up once per node type and cached across runs
+    monkeypatch.setattr(flake8_async.runner, "_dispatch_tables", {})
+
+    plugin = Plugin.from_source(source)
+    initialize_options(plugin, ["--enable=ASYNC100,ASYNC102"])
+    assert [e.code for e in plugin.run()] == ["ASYNC100"]
+
+    # errors from the finished cst runner are kept, the ast runner is stopped
+    plugin = Plugin.from_source(source)
+    initialize_options(
+        plugin, ["--enable=ASYNC100,ASYNC102", "--max-seconds-per-file=3"]
+    )
+    timeout, async100 = sorted(plugin.run())
+    assert timeout == Error("ASYNC000", 1, 0, TIMEOUT_MESSAGE, 3.0, "Visitor102", 5.0)
+    assert (async100.code, async100.line) == ("ASYNC100", 3)
+
+    # stopped in the middle of a cst visitor
+    monkeypatch.undo()
+    ticks = itertools.count()
+    monkeypatch.setattr(
+        flake8_async.runner,
+        "time",
+        SimpleNamespace(perf_counter=lambda: float(next(ticks))),
+    )
+    plugin = Plugin.from_source(source)
+    initialize_options(plugin, ["--enable=ASYNC100", "--max-seconds-per-file=10"])
+    assert [e.code for e in plugin.run()] == ["ASYNC000"]
+
+
+def test_max_seconds_per_file_not_exceeded():
+    # a budget that isn't exceeded doesn't change the results
+    path = Path(__file__).parent / "eval_files" / "async103.py"
+    results = []
+    for args in ([], ["--max-seconds-per-file=1000"]):
+        plugin = Plugin.from_filename(path)
+        initialize_options(plugin, ["--enable=ASYNC", *args])
+        results.append(sorted(plugin.run()))
+    assert results[0] == results[1] != []
+
+
+def test_prewarm(monkeypatch: pytest.MonkeyPatch):
+    freezes: list[None] = []
+    monkeypatch.setattr(flake8_async.runner, "_frozen", False)
+    monkeypatch.setattr(gc, "freeze", lambda: freezes.append(None))
+    compile_patterns.cache_clear()
+
+    plugin = Plugin.from_source(
+        "import app\n@app.route\nasync def foo():\n    await bar()\n"
+    )
+    initialize_options(
+        plugin,
+        [
+            "--enable=ASYNC910,ASYNC102",
+            "--no-checkpoint-warning-decorators=app.route",
+        ],
+    )
+    misses = compile_patterns.cache_info().misses
+
+    def build_handlers(*args: object) -> NoReturn:
+        raise AssertionError("dispatch table not prewarmed")
+
+    with monkeypatch.context() as m:
+        m.setattr(flake8_async.runner, "_handlers", build_handlers)
+        assert list(plugin.run()) == []
+    # the patterns from options were compiled before checking any file
+    assert compile_patterns.cache_info().misses == misses
+    # nothing is frozen when run standalone, as there are no workers to share with
+    assert freezes == []
+
+    def jobs(arg: str) -> SimpleNamespace:
+        # as parsed by flake8's JobsArgument
+        return SimpleNamespace(
+            is_auto=arg == "auto", n_jobs=-1 if arg == "auto" else int(arg)
+        )
+
+    # flake8 forks workers after parsing options if given several jobs
+    parser = ArgumentParser()
+    Plugin.add_options(parser)
+    monkeypatch.setattr(Plugin, "standalone", False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    for n, frozen in ("1", []), ("auto", [None]), ("2", [None]):
+        Plugin.parse_options(Namespace(**vars(parser.parse_args([])), jobs=jobs(n)))
+        assert freezes == frozen
+    # not by other programs parsing options, or with a single cpu
+    monkeypatch.setattr(flake8_async.runner, "_frozen", False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    Plugin.parse_options(parser.parse_args([]))
+    Plugin.parse_options(Namespace(**vars(parser.parse_args([])), jobs=jobs("auto")))
+    assert freezes == [None]
+
+
+def test_scope():
+    module = Scope()
+    module["f"] = "io.TextIOWrapper"
+    module["g"] = "io.TextIOWrapper"
+    cls = module.class_scope()
+    cls["h"] = "trio.Nursery"
+    func = cls.function_scope()
+    func.unbind("f")
+    func["x"] = "int"
+    assert dict(func) == {"g": "io.TextIOWrapper", "x": "int"}
+    assert len(func) == 2
+    assert "f" not in func
+    assert dict(cls) == {
+        "f": "io.TextIOWrapper",
+        "g": "io.TextIOWrapper",
+        "h": "trio.Nursery",
+    }
+    # leaving a scope doesn't need to undo anything
+    assert dict(module) == {"f": "io.TextIOWrapper", "g": "io.TextIOWrapper"}
+    module.unbind("f")
+    module.unbind("unknown")
+    assert dict(module) == {"g": "io.TextIOWrapper"}
+
+
+def test_function_bindings():
+    source = (
+        "async def f(a, /, b, *c, d, **e):\n"
+        "    global g\n"
+        "    g = h = 1\n"
+        "    i: int = 1\n"
+        "    j += 1\n"
+        "    k, [*l] = m.n = o[0] = 1, [2]\n"
+        "    del p\n"
+        "    for q in r: ...\n"
+        "    with s as t: ...\n"
+        "    try: ...\n"
+        "    except Exception as u: ...\n"
+        "    import v.w, x as y\n"
+        "    from z import aa, bb as cc\n"
+        "    from dd import *\n"
+        "    [ee for ff in gg if (hh := ee)]\n"
+        "    def ii(jj): kk = 1\n"
+        "    class ll: mm = 1\n"
+        "    lambda nn: (oo := nn)\n"
+        "    match pp:\n"
+        "        case [qq, *rr] if ss: ...\n"
+        "        case {1: tt, **uu}: ...\n"
+        "        case vv.ww: ...\n"
+        "        case [*_] | {1: _}: ...\n"
+    )
+    expected = {
+        *("a", "b", "c", "d", "e", "h", "i", "j", "k", "l", "p", "q", "t", "u"),
+        *("v", "y", "aa", "cc", "ff", "hh", "ii", "ll", "qq", "rr", "tt", "uu"),
+    }
+    [node] = ast.parse(source).body
+    assert isinstance(node, ast.AsyncFunctionDef)
+    assert function_bindings(node) == expected
+    [cst_node] = cst.parse_module(source).body
+    assert isinstance(cst_node, cst.FunctionDef)
+    assert function_bindings_cst(cst_node) == expected
+    lambda_node = ast.parse("lambda x: x", mode="eval").body
+    assert isinstance(lambda_node, ast.Lambda)
+    assert function_bindings(lambda_node) == {"x"}
+
+
+def test_positions_computed_lazily(monkeypatch: pytest.MonkeyPatch):
+    computed: list[cst.Module] = []
+    gen = PositionProvider._gen
+
+    def counting_gen(self: PositionProvider, wrapper: cst.MetadataWrapper):
+        computed.append(wrapper.module)
+        return gen(self, wrapper)
+
+    monkeypatch.setattr(PositionProvider, "_gen", counting_gen)
+    args = ["--enable=ASYNC100,ASYNC101,ASYNC124,ASYNC300"]
+
+    plugin = Plugin.from_source("import trio\ndef foo():\n    return 1\n")
+    initialize_options(plugin, args)
+    assert list(plugin.run()) == []
+    assert computed == []
+
+    plugin = Plugin.from_source(
+        "import trio\nasync def foo():\n    with trio.move_on_after(5):\n"
+        "        ...\n"
+    )
+    initialize_options(plugin, args)
+    assert "ASYNC100" in {e.code for e in plugin.run()}
+    assert computed
+
+    # also behaves as a mapping when resolved directly
+    computed.clear()
+    wrapper = cst.MetadataWrapper(plugin.module)
+    positions = wrapper.resolve(LazyPositionProvider)
+    assert computed == []
+    assert len(positions) == len(set(positions)) > 0
+    assert wrapper.module in positions
+    assert len(computed) == 1
+
+
 @pytest.mark.parametrize(("test", "path"), test_files, ids=[f[0] for f in test_files])
 def test_noerror_on_sync_code(test: str, path: Path):
     if any(e in test for e in error_codes_ignored_when_checking_transformed_sync_code):
@@ -890,6 +1226,78 @@ def test_910_permutations():
             assert not errors, "# false alarm:\n" + function_str
 
 
+def test_error_sort_key_invalidated_on_col_change():
+    a = Error("ASYNC100", 1, 4, "{} msg", "x")
+    b = Error("ASYNC100", 1, 0, "{} msg", "x")
+    assert b < a
+    b.col = a.col
+    assert a == b
+    assert hash(a) == hash(b)
+
+
+def test_error_batch_roundtrip():
+    errors = [
+        Error("ASYNC910", i, i % 7, "exit from {0} at line {1}", "async function", i)
+        for i in range(200)
+    ]
+    errors.append(Error("ASYNC100", 3, 1, "{0}.{1} context contains no checkpoints"))
+    batch = ErrorBatch(errors)
+    assert len(batch) == len(errors)
+    assert batch[-1] == errors[-1]
+    assert pickle.loads(pickle.dumps(errors[0])) == errors[0]  # noqa: S301
+
+    data = pickle.dumps(batch)
+    unpickled = pickle.loads(data)  # noqa: S301
+    assert list(unpickled) == errors
+    assert unpickled[-1] == errors[-1]
+    unpickled.append(errors[0])
+    assert unpickled[-1] == errors[0]
+    assert len(data) < len(pickle.dumps(errors))
+
+
+def test_cst_call_and_decorator_helpers():
+    module = cst.parse_module(
+        "@foo.fixture(scope='session')\n"
+        "@overload\n"
+        "def f():\n"
+        '    """docstring"""\n'
+        "    ...\n"
+        "def g(): pass; ...\n"
+        "def h():\n"
+        "    return\n"
+        "with a.b.c.bee(), trio.bar(), nursery(), x[0].bar():\n"
+        "    ...\n"
+    )
+    f, g, h, with_ = module.body
+    assert isinstance(f, cst.FunctionDef)
+    assert isinstance(g, cst.FunctionDef)
+    assert isinstance(h, cst.FunctionDef)
+    assert isinstance(with_, cst.With)
+
+    assert func_has_decorator(f, "fixture")
+    assert func_has_decorator(f, "overload", "contextmanager")
+    assert not func_has_decorator(f, "foo", "foo.fixture")
+    assert func_empty_body(f)
+    assert func_empty_body(g)
+    assert not func_empty_body(h)
+
+    matches = with_has_call(with_, "bar", "bee", base=("a.b.c", "trio"))
+    assert [str(match) for match in matches] == ["a.b.c.bee", "trio.bar"]
+    assert not with_has_call(with_, "bar", base="a.b")
+    imports = {"nursery": "trio.open_nursery"}
+    matches = with_has_call(with_, "open_nursery", base="trio", imports=imports)
+    assert [str(match) for match in matches] == ["trio.open_nursery"]
+
+    assert calls_any_of(with_, "x.y", "a.b.c.bee")
+    assert not calls_any_of(with_, "trio.open_nursery")
+    assert calls_any_of(with_, "trio.open_nursery", imports=imports)
+    call = with_.items[1].item
+    assert isinstance(call, cst.Call)
+    assert get_matching_call_cst(call, "bar", base=("anyio", "trio")) == (
+        MatchingCall(call, "bar", "trio")
+    )
+
+
 def test_async400_excgroup_attributes():
     for attr in dir(ExceptionGroup):
         if attr.startswith("__") and attr.endswith("__"):
@@ -940,6 +1348,14 @@ def test_resolve_canonical_does_not_elide_nested_calls():
     assert resolve_canonical_cst(cst_nested_call, imports) is None
 
 
+def test_dotted_name():
+    for source in ("trio", "trio.lowlevel.checkpoint", "(a).b"):
+        node = ast.parse(source, mode="eval").body
+        assert dotted_name(node) == ast.unparse(node)
+    for source in ('foo("x").bar', "a[0].b", "a()", "'trio.Path'"):
+        assert dotted_name(ast.parse(source, mode="eval").body) is None
+
+
 # from https://docs.python.org/3/library/itertools.html#itertools-recipes
 def consume(iterator: Iterable[Any]):
     deque(iterator, maxlen=0)
@@ -0,0 +1,60 @@
+"""Check that importing the plugin doesn't import more than needed.
+
+libcst, and especially libcst.matchers, take the majority of the time to start
+up flake8-async, so they and the visitor modules should only be imported once
+they're needed. Uses ``python -X importtime`` to list all imported modules.
+"""
+
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+
+from flake8_async.visitors import AST_ERROR_CODES
+
+RUN_AST_CHECKS = """
+from argparse import ArgumentParser
+from flake8_async import Plugin
+parser = ArgumentParser()
+Plugin.add_options(parser)
+Plugin.parse_options(parser.parse_args(["--enable={}"]))
+list(Plugin.from_source("import trio\\nasync def f():\\n    await trio.sleep(0)").run())
+"""
+
+
+def imported_modules(code: str) -> dict[str, int]:
+    """Return the cumulative import time in microseconds of each imported module."""
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    modules: dict[str, int] = {}
+    for line in res.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if m := re.fullmatch(r"import time:\s*\d+ \|\s*(\d+) \| *(\S+)", line):
+            modules[m.group(2)] = int(m.group(1))
+    return modules
+
+
+def test_import_does_not_import_visitors_or_libcst():
+    modules = imported_modules("import flake8_async")
+    assert "flake8_async" in modules
+    assert not [m for m in modules if m.startswith("libcst")]
+    assert not [m for m in modules if m.startswith("flake8_async.visitors.visitor")]
+
+
+def test_ast_checks_only_import_needed_visitors():
+    modules = imported_modules(RUN_AST_CHECKS.format("ASYNC102"))
+    assert "flake8_async.visitors.visitor102_120" in modules
+    assert "flake8_async.visitors.visitor91x" not in modules
+    assert not [m for m in modules if m.startswith("libcst")]
+
+
+def test_ast_checks_do_not_import_libcst():
+    modules = imported_modules(RUN_AST_CHECKS.format(",".join(AST_ERROR_CODES)))
+    assert "flake8_async.visitors.visitor_utility" in modules
+    assert not [m for m in modules if m.startswith("libcst")]
+    assert "flake8_async.visitors.flake8asyncvisitor_cst" not in modules
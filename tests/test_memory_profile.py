@@ -0,0 +1,59 @@
+"""Tests for `--memory-profile`."""
+
+from __future__ import annotations
+
+import json
+import tracemalloc
+from typing import TYPE_CHECKING
+
+from flake8_async.memory import TOP_SITES
+
+from .test_config_and_args import EXAMPLE_PY_ERROR, write_examplepy
+from .test_shard import run_main
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+def test_memory_profile(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    write_examplepy(tmp_path)
+    (tmp_path / "clean.py").write_text("import trio\n")
+    code, out = run_main(
+        monkeypatch,
+        tmp_path,
+        capsys,
+        "--memory-profile=memory.json",
+        "--max-seconds-per-file=60",
+        "--enable=ASYNC100,ASYNC103,ASYNC910",
+        "./example.py",
+        "clean.py",
+    )
+    assert code == 1
+    assert out == EXAMPLE_PY_ERROR
+    assert not tracemalloc.is_tracing()
+
+    report = json.loads((tmp_path / "memory.json").read_text())
+    assert report["version"] == 1
+    assert report["max_rss"] > 0
+    assert report["files"].keys() == {"./example.py", "clean.py"}
+    # phases are named like in timeout errors
+    phases = report["files"]["./example.py"]["phases"]
+    assert {"ast parser", "libcst parser", "Visitor103_104", "Visitor91X"} <= set(
+        phases
+    )
+    for file in report["files"].values():
+        assert file["peak"] >= max(phase["peak"] for phase in file["phases"].values())
+    # the largest of each phase
+    assert report["phases"]["ast parser"]["peak"] == max(
+        file["phases"]["ast parser"]["peak"] for file in report["files"].values()
+    )
+    assert report["phases"]["ast parser"]["peak"] > 0
+
+    assert 0 < len(report["top_sites"]) <= TOP_SITES
+    sizes = [site["size"] for site in report["top_sites"]]
+    assert sizes == sorted(sizes, reverse=True)
+    assert all(size > 0 for size in sizes)
@@ -0,0 +1,147 @@
+"""Tests for the metrics sinks, and `--metrics`."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from flake8_async import main
+from flake8_async.metrics import BUCKETS, Metrics, MetricsSink
+
+from .test_config_and_args import EXAMPLE_PY_TEXT, monkeypatch_argv, write_examplepy
+from .test_shard import run_main
+from .test_watch import FakeWatcher
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_metrics_sink():
+    # the default sink ignores everything
+    sink = MetricsSink()
+    sink.count("files_checked")
+    sink.observe("file_seconds", 1.0, phase="ast parser")
+
+
+def test_metrics_export(tmp_path: Path):
+    metrics = Metrics()
+    metrics.count("files_checked")
+    metrics.count("files_checked", 2)
+    metrics.count("errors", code='"quoted"\\\n')
+    for seconds in (0.001, 0.002, 100):
+        metrics.observe("file_seconds", seconds)
+
+    assert metrics.prometheus().splitlines() == [
+        "# TYPE flake8_async_errors_total counter",
+        'flake8_async_errors_total{code="\\"quoted\\"\\\\\\n"} 1',
+        "# TYPE flake8_async_files_checked_total counter",
+        "flake8_async_files_checked_total 3",
+        "# TYPE flake8_async_file_seconds histogram",
+        'flake8_async_file_seconds_bucket{le="0.001"} 1',
+        *(
+            f'flake8_async_file_seconds_bucket{{le="{bound}"}} 2'
+            for bound in BUCKETS[1:]
+        ),
+        'flake8_async_file_seconds_bucket{le="+Inf"} 3',
+        "flake8_async_file_seconds_sum 100.003",
+        "flake8_async_file_seconds_count 3",
+    ]
+
+    metrics.write(str(tmp_path / "metrics.json"), "json")
+    snapshot = json.loads((tmp_path / "metrics.json").read_text())
+    assert snapshot == metrics.snapshot()
+    assert snapshot["counters"]["files_checked"] == [{"labels": {}, "value": 3}]
+    (histogram,) = snapshot["histograms"]["file_seconds"]
+    assert histogram["count"] == 3
+    assert histogram["counts"][0] == 1
+    assert histogram["counts"][-1] == 1
+
+    # files are replaced atomically, and the temporary file removed on failure
+    metrics.write(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text() == metrics.prometheus()
+    (tmp_path / "directory").mkdir()
+    with pytest.raises(OSError, match="directory"):
+        metrics.write(str(tmp_path / "directory"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "directory",
+        "metrics.json",
+        "metrics.prom",
+    ]
+
+
+def test_metrics_option(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    write_examplepy(tmp_path)
+    (tmp_path / "clean.py").write_text("import trio\n")
+    args = ["--metrics=metrics.json", "--metrics-format=json", "--project-index=index"]
+    code, _ = run_main(
+        monkeypatch, tmp_path, capsys, *args, "./example.py", "./clean.py"
+    )
+    assert code == 1
+    snapshot = json.loads((tmp_path / "metrics.json").read_text())
+    counters = {
+        (name, *c["labels"].values()): c["value"]
+        for name, series in snapshot["counters"].items()
+        for c in series
+    }
+    assert counters == {
+        ("files_checked",): 2,
+        ("errors", "ASYNC100"): 1,
+        ("cache_hits", "project index"): 0,
+        ("cache_misses", "project index"): 2,
+    }
+    phases = {h["labels"]["phase"] for h in snapshot["histograms"]["phase_seconds"]}
+    assert phases == {"ast parser", "ast visitors", "libcst parser", "libcst visitors"}
+    assert snapshot["histograms"]["file_seconds"][0]["count"] == 2
+
+    # metrics are written also if a file fails to be checked
+    (tmp_path / "broken.py").write_text("def (")
+    monkeypatch_argv(
+        monkeypatch,
+        tmp_path,
+        [tmp_path / "flake8-async", "--metrics=metrics.prom", "./broken.py"],
+    )
+    with pytest.raises(Exception, match="Syntax Error"):
+        main()
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'flake8_async_files_failed_total{error="ParserSyntaxError"} 1\n' in text
+
+
+def test_metrics_watch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    (tmp_path / "example.py").write_text(EXAMPLE_PY_TEXT)
+    watcher = FakeWatcher({"./example.py"})
+    monkeypatch.setattr("flake8_async.watch.make_watcher", lambda _: watcher)
+    monkeypatch_argv(
+        monkeypatch,
+        tmp_path,
+        [
+            tmp_path / "flake8-async",
+            "--watch",
+            "--metrics=metrics.prom",
+            "./example.py",
+        ],
+    )
+    written: list[str] = []
+    original_write = Metrics.write
+
+    def write(self: Metrics, path: str, format_: str = "prometheus") -> None:
+        original_write(self, path, format_)
+        written.append((tmp_path / path).read_text())
+
+    monkeypatch.setattr(Metrics, "write", write)
+    assert main() == 1
+    # written after each batch
+    assert [
+        line
+        for text in written
+        for line in text.splitlines()
+        if "files_checked" in line
+    ] == [
+        "# TYPE flake8_async_files_checked_total counter",
+        "flake8_async_files_checked_total 1",
+        "# TYPE flake8_async_files_checked_total counter",
+        "flake8_async_files_checked_total 2",
+    ]
@@ -0,0 +1,106 @@
+"""Tests for `--parse-cache`."""
+
+from __future__ import annotations
+
+import json
+import pickle
+from typing import TYPE_CHECKING
+
+import pytest
+
+from flake8_async.metrics import Metrics
+from flake8_async.parse_cache import ParseCache
+
+from .test_config_and_args import EXAMPLE_PY_ERROR, write_examplepy
+from .test_shard import run_main
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_parse_cache(tmp_path: Path):
+    cache = ParseCache(tmp_path / "cache")
+    metrics = Metrics()
+    parsed: list[str] = []
+
+    def parse() -> list[str]:
+        parsed.append("source")
+        return parsed.copy()
+
+    assert cache.get("kind", "source", parse, metrics) == ["source"]
+    assert cache.get("kind", "source", parse, metrics) == ["source"]
+    assert cache.get("kind", "other", parse) == ["source", "source"]
+    assert cache.get("other kind", "source", parse) == ["source"] * 3
+    assert metrics.counters == {
+        ("cache_misses", (("cache", "kind"),)): 1,
+        ("cache_hits", (("cache", "kind"),)): 1,
+    }
+
+    # entries that were cut short are parsed again
+    entries = sorted((tmp_path / "cache").iterdir())
+    assert len(entries) == 3
+    for entry in entries:
+        entry.write_bytes(entry.read_bytes()[:-1])
+    assert cache.get("kind", "source", parse) == ["source"] * 4
+    assert cache.get("kind", "source", parse) == ["source"] * 4
+
+    # values that can't be pickled are returned if too deep, or else raise
+    deep: list[object] = []
+    for _ in range(100_000):
+        deep = [deep]
+    assert cache.get("kind", "deep", lambda: deep) is deep
+    with pytest.raises((pickle.PicklingError, AttributeError)):
+        cache.get("kind", "lambda", lambda: lambda: None)
+    assert len(list((tmp_path / "cache").iterdir())) == 3
+
+
+def test_parse_cache_option(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    write_examplepy(tmp_path)
+
+    def run(*args: str) -> dict[tuple[str, str], int]:
+        code, out = run_main(
+            monkeypatch,
+            tmp_path,
+            capsys,
+            "--parse-cache=cache",
+            "--metrics=metrics.json",
+            "--metrics-format=json",
+            *args,
+            "./example.py",
+        )
+        assert code == 1
+        assert out == EXAMPLE_PY_ERROR
+        counters = json.loads((tmp_path / "metrics.json").read_text())["counters"]
+        return {
+            (name, c["labels"]["cache"]): c["value"]
+            for name in ("cache_hits", "cache_misses")
+            for c in counters.get(name, [])
+        }
+
+    assert run() == {("cache_misses", "ast"): 1, ("cache_misses", "libcst"): 1}
+    # the trees are reused with other options
+    assert run("--enable=ASYNC100,ASYNC102") == {
+        ("cache_hits", "ast"): 1,
+        ("cache_hits", "libcst"): 1,
+    }
+    # without libcst visitors, noqa comments are found by tokenizing, and cached
+    (tmp_path / "example.py").write_text("import trio\nasync def f(): ...  # noqa\n")
+    for hit in ("cache_misses", "cache_hits"):
+        code, _ = run_main(
+            monkeypatch,
+            tmp_path,
+            capsys,
+            "--parse-cache=cache",
+            "--metrics=metrics.json",
+            "--metrics-format=json",
+            "--enable=ASYNC102",
+            "./example.py",
+        )
+        assert code == 0
+        counters = json.loads((tmp_path / "metrics.json").read_text())["counters"]
+        assert counters[hit] == [
+            {"labels": {"cache": "ast"}, "value": 1},
+            {"labels": {"cache": "noqa"}, "value": 1},
+        ]
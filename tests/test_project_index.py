@@ -0,0 +1,302 @@
+"""Tests for `--project-index`."""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import TYPE_CHECKING
+
+from flake8_async import index
+from flake8_async.index import ProjectIndex, build_index, module_name, summarize
+
+from .test_shard import run_main
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+HELPERS = """\
+import trio
+import trio as t
+from . import relative
+
+
+async def no_checkpoint():
+    print()
+
+
+async def calls_no_checkpoint():
+    await no_checkpoint()
+
+
+async def checkpoints():
+    await t.sleep(0)
+
+
+async def calls_checkpoints():
+    await checkpoints()
+    await no_checkpoint()
+
+
+async def recursive_a():
+    await recursive_b()
+
+
+async def recursive_b():
+    await recursive_a()
+
+
+async def async_with():
+    async with trio.open_nursery():
+        pass
+
+
+async def awaits_non_call(x):
+    await x
+
+
+async def nested():
+    async def inner():
+        await trio.sleep(0)
+
+
+async def run_server(task_status=trio.TASK_STATUS_IGNORED):
+    task_status.started()
+
+
+class Server:
+    async def serve_forever(self, *, task_status=trio.TASK_STATUS_IGNORED):
+        task_status.started()
+
+
+async def shadowed(no_checkpoint):
+    await no_checkpoint()
+"""
+
+MAIN = """\
+from contextlib import asynccontextmanager
+
+import trio
+from pkg.helpers import calls_no_checkpoint, calls_checkpoints, run_server
+
+
+async def foo():
+    await calls_no_checkpoint()
+
+
+async def bar():
+    await calls_checkpoints()
+
+
+async def local():
+    pass
+
+
+async def awaits_local():
+    await local()
+
+
+@asynccontextmanager
+async def baz():
+    async with trio.open_nursery() as nursery:
+        nursery.start_soon(run_server)
+        yield
+
+
+# the names of indexed functions, but not referring to them
+async def shadowed(calls_no_checkpoint):
+    await calls_no_checkpoint()
+
+
+async def shadowed_by_nested():
+    async def local():
+        await trio.sleep(0)
+
+    await local()
+
+
+@asynccontextmanager
+async def shadowed_startable(run_server):
+    async with trio.open_nursery() as nursery:
+        nursery.start_soon(run_server)
+        yield
+
+
+helpers = None
+
+
+async def not_imported():
+    await helpers.calls_no_checkpoint()
+
+
+async def awaits_returned():
+    await local()()
+
+
+async def awaits_twice():
+    await local()
+    await local()
+
+
+@asynccontextmanager
+async def starts_many():
+    async with trio.open_nursery() as nursery:
+        nursery.start_soon(local)
+        nursery.start_soon(run_server)
+        nursery.start_soon(run_server)
+        yield
+"""
+
+
+def test_module_name():
+    assert module_name("pkg/mod.py") == "pkg.mod"
+    assert module_name("./pkg/__init__.py") == "pkg"
+    assert module_name("../src/pkg/mod.py") == "src.pkg.mod"
+    assert module_name("__init__.py") == "__init__"
+
+
+def test_summarize():
+    summary = summarize(HELPERS, "pkg/helpers.py")
+    assert summary["module"] == "pkg.helpers"
+    # methods can't be looked up by their qualified name
+    assert summary["startable"] == ["run_server"]
+    functions = summary["functions"]
+    assert functions["no_checkpoint"] == [False, []]
+    assert functions["calls_no_checkpoint"] == [False, ["pkg.helpers.no_checkpoint"]]
+    assert functions["checkpoints"] == [False, ["trio.sleep"]]
+    assert functions["async_with"] == [True, []]
+    assert functions["awaits_non_call"] == [True, []]
+    # checkpoints in nested functions don't count
+    assert functions["nested"] == [False, []]
+    # a parameter isn't the function of the same name
+    assert functions["shadowed"] == [True, []]
+    assert "serve_forever" not in functions
+
+    assert summarize("async def", "bad.py") == {
+        "module": "bad",
+        "functions": {},
+        "startable": [],
+    }
+
+
+def test_never_checkpoints():
+    project = ProjectIndex(
+        {
+            "pkg/helpers.py": summarize(HELPERS, "pkg/helpers.py"),
+            "other/helpers.py": summarize(
+                "async def no_checkpoint(): ...", "x/helpers.py"
+            ),
+        }
+    )
+    never = {
+        name
+        for name in summarize(HELPERS, "")["functions"]
+        if project.never_checkpoints(f"pkg.helpers.{name}", None)
+    }
+    assert never == {"no_checkpoint", "calls_no_checkpoint", "nested", "run_server"}
+
+    # looked up by bare name from the same module, or by a unique suffix
+    assert project.never_checkpoints("calls_no_checkpoint", "pkg/helpers.py")
+    assert not project.never_checkpoints("calls_no_checkpoint", "main.py")
+    assert not project.never_checkpoints("calls_no_checkpoint", None)
+    assert project.never_checkpoints("helpers.calls_no_checkpoint", None)
+    # `helpers.no_checkpoint` is ambiguous
+    assert not project.never_checkpoints("helpers.no_checkpoint", None)
+    assert project.never_checkpoints("x.helpers.no_checkpoint", None)
+    assert project.startable == {"pkg.helpers.run_server"}
+    assert project.is_startable("run_server", "pkg/helpers.py")
+    assert project.is_startable("helpers.run_server", None)
+    assert not project.is_startable("run_server", None)
+    assert not project.is_startable("serve_forever", "pkg/helpers.py")
+
+
+def write_project(tmp_path: Path) -> list[str]:
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "helpers.py").write_text(HELPERS)
+    (tmp_path / "main.py").write_text(MAIN)
+    return ["main.py", os.path.join("pkg", "helpers.py")]
+
+
+def test_build_index_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    files = write_project(tmp_path)
+    summarized: list[str] = []
+
+    def summarize_spy(source: str, filename: str):
+        summarized.append(filename)
+        return summarize(source, filename)
+
+    monkeypatch.setattr(index, "summarize", summarize_spy)
+
+    project = build_index([*files, "missing.py"], "cache.json")
+    assert sorted(summarized) == sorted(files)
+    assert project.files.keys() == set(files)
+    cache = json.loads((tmp_path / "cache.json").read_text())
+    assert cache["files"] == project.files
+
+    # unchanged files aren't re-indexed
+    summarized.clear()
+    assert build_index(files, "cache.json").files == project.files
+    assert summarized == []
+
+    # only changed files are re-indexed, and removed files are dropped
+    (tmp_path / "main.py").write_text("async def f(): ...\n")
+    project = build_index(files, "cache.json")
+    assert summarized == ["main.py"]
+    assert project.files["main.py"]["functions"] == {"f": [False, []]}
+    summarized.clear()
+    build_index(files[:1], "cache.json")
+    assert summarized == []
+    assert json.loads((tmp_path / "cache.json").read_text())["files"].keys() == {
+        "main.py"
+    }
+
+    # invalid and outdated caches are ignored
+    for cache_content in ("{", '{"version": 0, "files": {}}'):
+        (tmp_path / "cache.json").write_text(cache_content)
+        summarized.clear()
+        build_index(files, "cache.json")
+        assert sorted(summarized) == sorted(files)
+
+    summarized.clear()
+    build_index(files)
+    assert sorted(summarized) == sorted(files)
+
+
+def test_build_index_parallel(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(tmp_path)
+    files = write_project(tmp_path)
+    serial = build_index(files)
+    monkeypatch.setattr(index, "PARALLEL_THRESHOLD", 0)
+    assert build_index(files).files == serial.files
+
+
+def test_project_index(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    files = write_project(tmp_path)
+    enable = "--enable=ASYNC910,ASYNC113,ASYNC114"
+
+    def errors(*args: str) -> set[str]:
+        code, out = run_main(monkeypatch, tmp_path, capsys, enable, *args, *files)
+        assert code == 1
+        return {" ".join(line.split(" ")[:2]) for line in out.splitlines()}
+
+    without_index = errors()
+    with_index = errors("--project-index=cache.json")
+    assert (tmp_path / "cache.json").exists()
+    assert with_index - without_index == {
+        # awaits a function in another file that never checkpoints
+        "main.py:7:1: ASYNC910",
+        # awaits a function in the same file that never checkpoints
+        "main.py:19:1: ASYNC910",
+        # `run_server` is startable
+        "main.py:26:9: ASYNC113",
+        "main.py:69:9: ASYNC113",
+        "main.py:70:9: ASYNC113",
+        "main.py:60:1: ASYNC910",
+        f"{files[1]}:10:1: ASYNC910",
+    }
+    # methods are still reported, as ASYNC113 can't tell which method is called
+    assert without_index - with_index == {f"{files[1]}:45:1: ASYNC114"}
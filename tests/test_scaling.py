@@ -0,0 +1,368 @@
+"""Check that runtime scales (roughly) linearly with the size of the input.
+
+Generates families of programs of growing size, counts the Python function calls
+made by `Plugin.run` on each, and fits the exponent ``k`` of ``calls = a * size**k``,
+both in total and for each visitor separately. A super-linear runner or visitor,
+e.g. one that rescans all enclosing statements for every node, will show up as an
+exponent well above 1.
+
+Calls are counted rather than timed, so results don't depend on the load of the
+machine, e.g. with ``-n auto``. Counting is slow, so these are marked as fuzz tests.
+"""
+
+from __future__ import annotations
+
+import ast
+import functools
+import math
+import random
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+import pytest
+
+from flake8_async import Plugin
+from flake8_async.visitors import (
+    ERROR_CLASSES,
+    ERROR_CLASSES_CST,
+    utility_visitors,
+    utility_visitors_cst,
+)
+from flake8_async.visitors._positions import _LazyPositions
+
+from .test_flake8_async import initialize_options
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+# A quadratic algorithm has exponent 2; leave headroom for constant overheads.
+MAX_EXPONENT = 1.5
+# visitors making fewer calls than this at the largest size are dominated by
+# constant overheads
+MIN_CALLS = 1000
+TOTAL = "Plugin.run"
+RUNNERS = "runners and libcst"
+
+BLOCK_HEADERS = {
+    "for": "for i in range(10):",
+    "async for": "async for i in aiter():",
+    "while": "while cond():",
+    "with": "with open(path) as f:",
+    "async with": "async with trio.open_nursery() as nursery:",
+    "if": "if cond():",
+}
+BLOCK_KINDS = (*BLOCK_HEADERS, "try")
+BODY = ("await foo()", "bar()")
+
+
+def _indent(lines: Sequence[str], depth: int = 1) -> list[str]:
+    return ["    " * depth + line for line in lines]
+
+
+def _nest(kinds: Sequence[str], body: Sequence[str]) -> list[str]:
+    lines = list(body)
+    for kind in reversed(kinds):
+        if kind == "try":
+            lines = [
+                "try:",
+                *_indent(lines),
+                "except ValueError:",
+                "    await trio.sleep(0)",
+                "finally:",
+                "    pass",
+            ]
+        else:
+            lines = [BLOCK_HEADERS[kind], *_indent(lines)]
+    return lines
+
+
+def _async_function(body: Sequence[str]) -> list[str]:
+    return ["import trio", "async def f(path, x):", *_indent(body)]
+
+
+# Generators, each taking the size as first argument and returning source code.
+def sequential_blocks(n: int, kinds: Sequence[str]) -> list[str]:
+    """`n` copies of a nest of `kinds` blocks in a single function."""
+    return _async_function([line for _ in range(n) for line in _nest(kinds, BODY)])
+
+
+def nested_blocks(n: int, kind: str) -> list[str]:
+    """Nest `n` blocks of `kind` in a single function."""
+    return _async_function(_nest([kind] * n, BODY))
+
+
+def elif_chain(n: int) -> list[str]:
+    lines = ["if x == 0:", *_indent(BODY)]
+    for i in range(1, n):
+        lines += [f"elif x == {i}:", "    await foo()" if i % 2 else "    pass"]
+    return _async_function(lines)
+
+
+def match_cases(n: int) -> list[str]:
+    lines = ["match x:"]
+    for i in range(n):
+        lines += _indent([f"case {i}:", "    await foo()" if i % 2 else "    pass"])
+    return _async_function(lines)
+
+
+def many_functions(n: int) -> list[str]:
+    lines = ["import trio"]
+    for i in range(n):
+        lines += [
+            f"async def f{i}(x):",
+            "    with trio.move_on_after(1):",
+            "        await foo()",
+            "    if x:",
+            "        return",
+            "    yield",
+        ]
+    return lines
+
+
+def nested_functions(n: int, asynchronous: bool) -> list[str]:
+    """Nest `n` functions, if not `asynchronous` only the innermost is async."""
+    lines: list[str] = []
+    for depth in range(n):
+        prefix = "async " if asynchronous or depth == n - 1 else ""
+        lines += _indent([f"{prefix}def f{depth}():", "    foo()"], depth)
+    return lines
+
+
+def boolean_operation(n: int) -> list[str]:
+    values = ("await foo()" if i % 2 else "bar()" for i in range(n))
+    return _async_function(["return " + " and ".join(values)])
+
+
+def random_statements(n: int, seed: int) -> list[str]:
+    """`n` top-level statements in a single function, randomly nested blocks."""
+    rnd = random.Random(seed)  # noqa: S311
+
+    def statement(depth: int) -> list[str]:
+        if depth >= 3 or rnd.random() < 0.4:
+            return [rnd.choice((*BODY, "return", "break", "continue", "yield"))]
+        body = [line for _ in range(rnd.randint(1, 3)) for line in statement(depth + 1)]
+        return _nest([rnd.choice(BLOCK_KINDS)], body)
+
+    return _async_function([line for _ in range(n) for line in statement(0)])
+
+
+@dataclass
+class Family:
+    generator: Callable[..., list[str]]
+    sizes: Sequence[int]
+    params: dict[str, Any] = field(default_factory=dict)
+
+    def source(self, size: int) -> str:
+        return "\n".join(self.generator(size, **self.params)) + "\n"
+
+    def __str__(self) -> str:
+        args = ["n", *(f"{k}={v!r}" for k, v in self.params.items())]
+        return f"{self.generator.__name__}({', '.join(args)})"
+
+
+# Sizes are limited by the recursion limit for elif chains and boolean operations,
+# since both are parsed as deeply nested trees.
+FAMILIES = [
+    *(
+        Family(sequential_blocks, (8, 16, 32, 64), {"kinds": kinds})
+        for kinds in (
+            ("for", "for", "for"),
+            ("while", "try", "while"),
+            ("with", "async with", "try"),
+            ("async for", "if", "while", "try", "with", "for", "try", "while"),
+        )
+    ),
+    # static nesting of loops/try/with is limited to 20 blocks by CPython
+    *(
+        Family(nested_blocks, (2, 4, 8, 16), {"kind": kind})
+        for kind in ("for", "while", "try", "with")
+    ),
+    Family(nested_blocks, (8, 16, 32, 64), {"kind": "if"}),
+    Family(elif_chain, (25, 50, 100, 200)),
+    Family(match_cases, (50, 100, 200, 400)),
+    Family(many_functions, (25, 50, 100, 200)),
+    *(
+        Family(nested_functions, (8, 16, 32, 64), {"asynchronous": asynchronous})
+        for asynchronous in (True, False)
+    ),
+    Family(boolean_operation, (25, 50, 100, 200)),
+    *(
+        Family(random_statements, (16, 32, 64, 128), {"seed": seed})
+        for seed in range(4)
+    ),
+]
+
+
+# Generators we know to be super-linear, that should be fixed.
+KNOWN_SUPER_LINEAR = {
+    # `visit_Try` searches the whole try body for yields, so nested try statements
+    # are quadratic in the nesting depth. Though CPython limits that to 20.
+    "nested_blocks(n, kind='try')": "Visitor91X.visit_Try searches nested yields",
+    # `visit_FunctionDef` searches sync functions for nested async functions.
+    "nested_functions(n, asynchronous=False)": (
+        "Visitor91X.visit_FunctionDef searches nested async functions"
+    ),
+}
+
+
+def count_nodes(source: str) -> int:
+    return sum(1 for _ in ast.walk(ast.parse(source)))
+
+
+def fit_exponent(sizes: Sequence[int], costs: Sequence[float]) -> float:
+    """Least-squares fit of `k` in ``cost = a * size**k``, on a log-log scale."""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(c, 1e-9)) for c in costs]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum(
+        (x - mean_x) ** 2 for x in xs
+    )
+
+
+class VisitorCounter:
+    """Count the Python function calls made by the visit/leave methods of each visitor.
+
+    Most of the work is done in the runners and libcst, so a super-linear visitor
+    would be drowned out when only looking at the total.
+    """
+
+    def __init__(self, monkeypatch: pytest.MonkeyPatch):
+        super().__init__()
+        self.calls: dict[str, int] = defaultdict(int)
+        # the visitor whose method is running, calls are counted for it
+        self.current = RUNNERS
+        for visitor in (
+            *utility_visitors,
+            *utility_visitors_cst,
+            *ERROR_CLASSES,
+            *ERROR_CLASSES_CST,
+        ):
+            self._wrap(visitor, monkeypatch)
+
+        # positions are computed for the whole module when first needed, by the
+        # visitor giving the first error, so would make it look super-linear
+        positions: property = vars(_LazyPositions)["positions"]
+
+        def runner_positions(lazy: _LazyPositions) -> Any:
+            current, self.current = self.current, RUNNERS
+            try:
+                return positions.__get__(lazy)
+            finally:
+                self.current = current
+
+        monkeypatch.setattr(_LazyPositions, "positions", property(runner_positions))
+
+    def _wrap(self, visitor: type, monkeypatch: pytest.MonkeyPatch) -> None:
+        # only count from the outermost call, visitors that handle their own
+        # subfields will call their other visit methods.
+        def counted(method: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(method)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if self.current != RUNNERS:
+                    return method(*args, **kwargs)
+                self.current = visitor.__name__
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    self.current = RUNNERS
+
+            return wrapper
+
+        for name in dir(visitor):
+            if name.startswith(("visit_", "leave_")):
+                monkeypatch.setattr(visitor, name, counted(getattr(visitor, name)))
+
+    def _profile(self, frame: object, event: str, arg: object) -> None:
+        if event in ("call", "c_call"):
+            self.calls[self.current] += 1
+
+    def run(self, source: str) -> dict[str, int]:
+        """Count the calls made by `Plugin.run` in total, and for each visitor.
+
+        Parsing is excluded, and so is filling caches, e.g. of compiled patterns,
+        by checking the source once before counting. Calls not made by any
+        visitor are attributed to ``RUNNERS``.
+        """
+        for _ in Plugin.from_source(source).run():
+            pass
+        plugin = Plugin.from_source(source)
+        self.calls.clear()
+        sys.setprofile(self._profile)
+        try:
+            for _ in plugin.run():
+                pass
+        finally:
+            sys.setprofile(None)
+        self.calls[TOTAL] = sum(self.calls.values())
+        return dict(self.calls)
+
+    def measure(self, family: Family) -> dict[str, list[int]]:
+        """Count calls for `family` at each size, for each visitor."""
+        calls: dict[str, list[int]] = defaultdict(list)
+        for i, size in enumerate(family.sizes):
+            for name, n in self.run(family.source(size)).items():
+                # a visitor without any relevant nodes in the smaller sizes
+                calls[name].extend([0] * (i - len(calls[name])))
+                calls[name].append(n)
+        return calls
+
+
+def super_linear(family: Family, calls: dict[str, list[int]]) -> dict[str, float]:
+    """Return exponents above `MAX_EXPONENT`, ignoring visitors doing little work.
+
+    Sizes are the number of nodes, rather than the generator size parameter,
+    since e.g. nested blocks have a constant-size body and random statements
+    vary in length.
+    """
+    sizes = [count_nodes(family.source(size)) for size in family.sizes]
+    res: dict[str, float] = {}
+    for name, visitor_calls in calls.items():
+        if len(visitor_calls) < len(sizes) or visitor_calls[-1] < MIN_CALLS:
+            continue
+        exponent = fit_exponent(sizes, visitor_calls)
+        if exponent > MAX_EXPONENT:
+            res[name] = exponent
+    return res
+
+
+@pytest.mark.fuzz
+@pytest.mark.parametrize("family", FAMILIES, ids=str)
+def test_runtime_scales_linearly(family: Family, monkeypatch: pytest.MonkeyPatch):
+    if family.generator is match_cases and sys.version_info < (3, 10):
+        pytest.skip("match statements require python 3.10")
+    # also enable the ASYNC9xx visitors, which are disabled by default
+    initialize_options(Plugin(ast.AST(), []), ["--enable=ASYNC", "--disable="])
+    calls = VisitorCounter(monkeypatch).measure(family)
+    if not (culprits := super_linear(family, calls)):
+        return
+
+    report = "\n".join(
+        f"  {name}: exponent {exponent:.2f}, "
+        + ", ".join(
+            f"n={size}: {n} calls" for size, n in zip(family.sizes, calls[name])
+        )
+        for name, exponent in culprits.items()
+    )
+    message = (
+        f"super-linear runtime (exponent > {MAX_EXPONENT}) for generator {family}\n"
+        + report
+    )
+    if str(family) in KNOWN_SUPER_LINEAR:
+        pytest.xfail(f"{KNOWN_SUPER_LINEAR[str(family)]}\n{message}")
+    pytest.fail(message, pytrace=False)
+
+
+def test_fit_exponent():
+    sizes = (97, 110, 204, 528)
+    assert fit_exponent(sizes, [0.1 * s for s in sizes]) == pytest.approx(1)
+    assert fit_exponent(sizes, [s**1.5 for s in sizes]) == pytest.approx(1.5)
+
+
+@pytest.mark.parametrize("family", FAMILIES, ids=str)
+def test_generated_code_is_valid(family: Family):
+    if family.generator is match_cases and sys.version_info < (3, 10):
+        pytest.skip("match statements require python 3.10")
+    ast.parse(family.source(family.sizes[-1]))
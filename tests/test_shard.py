@@ -0,0 +1,225 @@
+"""Tests for `--shard`, `--format=json` and `flake8-async merge`."""
+
+from __future__ import annotations
+
+import json
+from argparse import ArgumentTypeError
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import pytest
+
+from flake8_async import checker, main, parse_shard
+from flake8_async.base import Error
+from flake8_async.shard import error_to_json, select_shard, write_report
+
+from .test_config_and_args import EXAMPLE_PY_ERROR, monkeypatch_argv, write_examplepy
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+FILENAMES = [f"pkg/module_{i}.py" for i in range(50)]
+
+
+def test_parse_shard():
+    assert parse_shard("1/1") == (1, 1)
+    assert parse_shard("3/4") == (3, 4)
+    for value in ("0/4", "5/4", "1", "a/b", "-1/2", "1/0"):
+        with pytest.raises(ArgumentTypeError):
+            parse_shard(value)
+
+
+@pytest.mark.parametrize(
+    "costs", [None, {f: i % 7 + 0.5 for i, f in enumerate(FILENAMES)}]
+)
+def test_shards_partition_files(costs: dict[str, float] | None):
+    shards = [select_shard(FILENAMES, k, 4, costs) for k in range(1, 5)]
+    assert sorted(f for shard in shards for f in shard) == sorted(FILENAMES)
+    # original order is kept, and the assignment doesn't depend on file order
+    for k, shard in enumerate(shards, start=1):
+        assert shard == [f for f in FILENAMES if f in shard]
+        assert select_shard(FILENAMES[::-1], k, 4, costs) == shard[::-1]
+        # `./pkg/...` is the same file as `pkg/...`
+        assert select_shard([f"./{f}" for f in FILENAMES], k, 4, costs) == [
+            f"./{f}" for f in shard
+        ]
+    assert select_shard(FILENAMES, 1, 1) == FILENAMES
+
+
+def test_shards_balanced_by_cost():
+    costs = dict.fromkeys(FILENAMES, 1.0)
+    costs[FILENAMES[0]] = 49.0
+    shards = [select_shard(FILENAMES, k, 2, costs) for k in (1, 2)]
+    # the expensive file gets a shard to itself
+    assert [FILENAMES[0]] in shards
+
+    # unknown files are assumed to take the median time, so the 4 new files are
+    # split evenly once the shards are balanced
+    new_files = [f"new_{i}.py" for i in range(4)]
+    shards = [select_shard(FILENAMES + new_files, k, 2, costs) for k in (1, 2)]
+    assert sorted(len(shard) for shard in shards) == [3, 51]
+
+
+def run_main(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    *args: str,
+) -> tuple[int, str]:
+    monkeypatch_argv(monkeypatch, tmp_path, [tmp_path / "flake8-async", *args])
+    code = main()
+    out, err = capsys.readouterr()
+    assert not err
+    return code, out
+
+
+def test_json_report_and_merge(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    write_examplepy(tmp_path)
+    (tmp_path / "clean.py").write_text("import trio\n")
+    files = ["./example.py", "./clean.py"]
+    code, text_output = run_main(monkeypatch, tmp_path, capsys, *files)
+    assert (code, text_output) == (1, EXAMPLE_PY_ERROR)
+
+    reports = []
+    for k in (1, 2):
+        code, out = run_main(
+            monkeypatch, tmp_path, capsys, "--shard", f"{k}/2", "--format=json", *files
+        )
+        report = json.loads(out)
+        assert code == (1 if "./example.py" in report["files"] else 0)
+        (tmp_path / f"shard{k}.json").write_text(out)
+        reports.append(report)
+
+    assert reports[0]["files"].keys().isdisjoint(reports[1]["files"])
+    files_report = {**reports[0]["files"], **reports[1]["files"]}
+    assert files_report["./clean.py"]["errors"] == []
+    assert files_report["./example.py"]["errors"] == [
+        {
+            "line": 2,
+            "col": 6,
+            "code": "ASYNC100",
+            "message": EXAMPLE_PY_ERROR.split(" ASYNC100 ")[1].rstrip("\n"),
+            "args": ["trio", "move_on_after"],
+        }
+    ]
+    assert all(r["seconds"] >= 0 for r in files_report.values())
+
+    # merging gives the same output as a single run
+    assert run_main(
+        monkeypatch, tmp_path, capsys, "merge", "shard1.json", "shard2.json"
+    ) == (1, text_output)
+
+    # a merged report can be used to balance shards in later runs
+    code, out = run_main(
+        monkeypatch,
+        tmp_path,
+        capsys,
+        "merge",
+        "--format=json",
+        "shard1.json",
+        "shard2.json",
+    )
+    assert json.loads(out)["files"] == dict(sorted(files_report.items()))
+    (tmp_path / "costs.json").write_text(out)
+    shards = [
+        json.loads(
+            run_main(
+                monkeypatch,
+                tmp_path,
+                capsys,
+                f"--shard={k}/2",
+                "--shard-costs=costs.json",
+                "--format=json",
+                *files,
+            )[1]
+        )["files"].keys()
+        for k in (1, 2)
+    ]
+    assert sorted([*shards[0], *shards[1]]) == sorted(files)
+
+
+def test_merge_sorts_as_single_run(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    # sorted by args before the message, as `Error` is
+    errors = [
+        Error("ASYNC100", 2, 4, "{1} {0}", "b", "a"),
+        Error("ASYNC100", 2, 4, "{1} {0}", "a", "b"),
+        Error("ASYNC100", 1, 8, "{0}", "c"),
+    ]
+    with (tmp_path / "report.json").open("w") as f:
+        write_report({"x.py": ([error_to_json(e) for e in errors], 0.0)}, f)
+    assert run_main(monkeypatch, tmp_path, capsys, "merge", "report.json") == (
+        1,
+        "".join(f"x.py:{error}\n" for error in sorted(errors)),
+    )
+
+
+def test_merge_no_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    (tmp_path / "clean.py").write_text("import trio\n")
+    _, out = run_main(monkeypatch, tmp_path, capsys, "--format=json", "clean.py")
+    (tmp_path / "report.json").write_text(out)
+    assert run_main(monkeypatch, tmp_path, capsys, "merge", "report.json") == (0, "")
+
+    # the same file in several reports means shards were given different files
+    monkeypatch_argv(
+        monkeypatch,
+        tmp_path,
+        [tmp_path / "flake8-async", "merge", "report.json", "report.json"],
+    )
+    assert main() == 0
+    assert "clean.py is in several reports" in capsys.readouterr().err
+
+
+def test_merge_invalid_report(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    (tmp_path / "report.json").write_text("{}")
+    monkeypatch_argv(
+        monkeypatch, tmp_path, [tmp_path / "flake8-async", "merge", "report.json"]
+    )
+    with pytest.raises(SystemExit):
+        main()
+    assert "is not a flake8-async report" in capsys.readouterr().err
+
+
+def test_processes_longest_first(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    write_examplepy(tmp_path)
+    (tmp_path / "clean.py").write_text("import trio\n")
+    (tmp_path / "big.py").write_text("import trio\n" * 100)
+    files = ["./clean.py", "./example.py", "./big.py"]
+    expected = run_main(monkeypatch, tmp_path, capsys, *files)
+    assert expected == (1, EXAMPLE_PY_ERROR)
+
+    submitted: list[str] = []
+
+    class Executor(ThreadPoolExecutor):
+        def submit(self, fn, /, *args, **kwargs):  # type: ignore[no-untyped-def]
+            submitted.append(args[0])
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(checker, "ProcessPoolExecutor", Executor)
+    # the largest file first, printed in the given order
+    assert run_main(monkeypatch, tmp_path, capsys, "--processes=2", *files) == expected
+    assert submitted == ["./big.py", "./example.py", "./clean.py"]
+
+    # or the slowest in an earlier run
+    submitted.clear()
+    with (tmp_path / "costs.json").open("w") as f:
+        write_report(
+            {"clean.py": ([], 3.0), "example.py": ([], 2.0), "big.py": ([], 1.0)}, f
+        )
+    args = ("--processes=2", "--shard-costs=costs.json")
+    assert run_main(monkeypatch, tmp_path, capsys, *args, *files) == expected
+    assert submitted == files
+
+    # the json report times each file in the main process
+    submitted.clear()
+    run_main(monkeypatch, tmp_path, capsys, "--processes=2", "--format=json", *files)
+    assert submitted == []
@@ -0,0 +1,173 @@
+"""Tests for `--split-lines`, checking large files in chunks."""
+
+from __future__ import annotations
+
+import ast
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from textwrap import dedent
+
+import pytest
+
+from flake8_async import TIMEOUT_CODE, Checker, split
+
+from .test_config_and_args import EXAMPLE_PY_ERROR, write_examplepy
+from .test_flake8_async import _parse_eval_file, test_files
+from .test_shard import run_main
+
+EVAL_FILES = Path(__file__).parent / "eval_files"
+
+SOURCE = dedent("""\
+    import os; import trio
+    x = 1
+
+
+    @decorator
+    def f():
+        ...
+    # comment
+    class A:
+        ...
+    if x:
+        from os.path import exists
+    async def g(): ...
+    """)
+
+
+@pytest.fixture
+def thread_workers(monkeypatch: pytest.MonkeyPatch):
+    # workers are set up the same way in a thread pool, which is faster to start
+    monkeypatch.setattr(split, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(split, "_executor", None)
+
+
+def test_split_chunks():
+    tree = ast.parse(SOURCE)
+    lines = SOURCE.splitlines(keepends=True)
+    assert split.split_chunks(tree, 5, len(lines)) == [(1, 8), (9, 13)]
+    # statements on the same line are never split
+    assert split.split_chunks(tree, 1, len(lines)) == [
+        (1, 1),
+        (2, 4),
+        (5, 8),
+        (9, 10),
+        (11, 12),
+        (13, 13),
+    ]
+    assert split.split_chunks(tree, 100, len(lines)) == [(1, 13)]
+    module = split.module_lines(ast.parse(""), 1)
+    assert split.chunk_source(["# comment\n"], module, 1, 1) == "# comment\n"
+
+    # module-level statements are kept, but not definitions
+    module = split.module_lines(tree, len(lines))
+    assert split.chunk_source(lines, module, 9, 10).splitlines() == [
+        "import os; import trio",
+        "x = 1",
+        *[""] * 6,
+        "class A:",
+        "    ...",
+        "if x:",
+        "    from os.path import exists",
+        "",
+    ]
+    assert split.chunk_source(lines, module, 13, 13).splitlines() == [
+        "import os; import trio",
+        "x = 1",
+        *[""] * 8,
+        "if x:",
+        "    from os.path import exists",
+        "async def g(): ...",
+    ]
+
+
+@pytest.mark.usefixtures("thread_workers")
+@pytest.mark.parametrize(
+    "filename", ["async102.py", "async113_trio.py", "async240.py", "async910.py"]
+)
+def test_split_same_errors(filename: str):
+    source = (EVAL_FILES / filename).read_text()
+    checker = Checker.from_argv(["--enable=ASYNC"])
+    expected = checker.check_source(source, filename)
+    assert expected
+
+    split_checker = Checker(dataclasses.replace(checker.options, split_lines=20))
+    assert sorted(split_checker.check_source(source, filename)) == expected
+
+
+@pytest.mark.usefixtures("thread_workers")
+@pytest.mark.parametrize(("test", "path"), test_files)
+def test_split_eval_files(test: str, path: Path):
+    source = path.read_text()
+    _, args, _ = _parse_eval_file(test, source)
+    checker = Checker.from_argv(args)
+    expected = checker.check_source(source, str(path))
+
+    # as finely as possible, with a chunk for each top-level statement
+    split_checker = Checker(dataclasses.replace(checker.options, split_lines=1))
+    assert split_checker.check_source(source, str(path)) == expected
+
+
+def test_split_shares_state(monkeypatch: pytest.MonkeyPatch):
+    source = dedent("""\
+        from contextlib import asynccontextmanager
+        import trio
+
+        @asynccontextmanager
+        async def f():
+            async with trio.open_nursery() as nursery:
+                def g():
+                    yield
+                nursery.start_soon(trio.serve_tcp, g, 0)
+
+        def h():
+            yield
+        """)
+    # reported at the `yield` in `h`, so the file is checked without workers
+    checker = Checker.from_argv(["--enable=ASYNC113"])
+    checker.options.split_lines = 1
+    monkeypatch.setattr(split, "_get_executor", None)
+    assert [(e.code, e.line) for e in checker.check_source(source)] == [("ASYNC113", 9)]
+    assert split.shares_state(source, checker.options)
+    assert not split.shares_state(
+        source.replace("start_soon", "start"), checker.options
+    )
+    checker = Checker.from_argv(["--disable=ASYNC113"])
+    assert not split.shares_state(source, checker.options)
+
+
+@pytest.mark.usefixtures("thread_workers")
+def test_split_module_level_errors():
+    source = "import httpx\n" + "def f(): ...\n" * 3
+    checker = Checker.from_argv()
+    checker.options.split_lines = 1
+    # the import is checked with each chunk, but reported once
+    for _ in range(2):
+        assert [(e.code, e.line) for e in checker.check_source(source)] == [
+            ("ASYNC127", 1)
+        ]
+    # a checker with other options gets its own workers
+    other = Checker.from_argv(["--disable-noqa"])
+    other.options.split_lines = 1
+    assert len(other.check_source(source)) == 1
+
+
+@pytest.mark.usefixtures("thread_workers")
+def test_split_timeout():
+    checker = Checker.from_argv(["--max-seconds-per-file=0"])
+    checker.options.split_lines = 1
+    # each chunk times out, but the timeout is reported once
+    errors = checker.check_source(SOURCE)
+    assert [error.code for error in errors] == [TIMEOUT_CODE]
+
+
+def test_split_option(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    write_examplepy(tmp_path)
+    # checked in worker processes
+    code, out = run_main(
+        monkeypatch, tmp_path, capsys, "--split-lines=1", "./example.py"
+    )
+    assert code == 1
+    assert out == EXAMPLE_PY_ERROR
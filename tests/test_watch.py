@@ -0,0 +1,171 @@
+"""Tests for `--watch`."""
+
+from __future__ import annotations
+
+import ast
+import os
+import sys
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from flake8_async import Plugin, _check_file, main
+from flake8_async.watch import InotifyWatcher, PollingWatcher, make_watcher, watch
+
+from .test_config_and_args import (
+    EXAMPLE_PY_ERROR,
+    EXAMPLE_PY_TEXT,
+    assert_autofixed,
+    monkeypatch_argv,
+    write_examplepy,
+)
+from .test_flake8_async import initialize_options
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+class FakeWatcher:
+    def __init__(self, *batches: set[str]):
+        super().__init__()
+        self.batches: Iterator[set[str]] = iter(batches)
+        self.closed = False
+
+    def wait(self) -> set[str]:
+        try:
+            return next(self.batches)
+        except StopIteration:
+            raise KeyboardInterrupt
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_polling_watcher(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    file = tmp_path / "foo.py"
+    file.write_text("")
+    other = tmp_path / "bar.py"
+    watcher = PollingWatcher([str(file), str(other)], interval=0)
+    assert watcher.poll() == set()
+
+    file.write_text("import trio")
+    assert watcher.wait() == {str(file)}
+
+    # only mtime changed
+    os.utime(file, ns=(0, 0))
+    other.write_text("")
+    assert watcher.wait() == {str(file), str(other)}
+
+    file.unlink()
+    assert watcher.poll() == {str(file)}
+
+    # waits until there's a change
+    monkeypatch.setattr(time, "sleep", lambda _: file.write_text(""))
+    assert watcher.wait() == {str(file)}
+    watcher.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs inotify")
+def test_inotify_watcher(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    file = tmp_path / "foo.py"
+    file.write_text("")
+    other = tmp_path / "bar.py"
+    watcher = make_watcher([str(file), str(other)])
+    assert isinstance(watcher, InotifyWatcher)
+
+    # untracked files in the same directory are ignored
+    (tmp_path / "untracked.py").write_text("")
+    file.write_text("import trio")
+    assert watcher.wait() == {str(file)}
+
+    # editors saving by renaming a temporary file over the original
+    (tmp_path / "foo.py.tmp").write_text("import anyio")
+    (tmp_path / "foo.py.tmp").replace(file)
+    assert watcher.wait() == {str(file)}
+
+    # changes shortly after the first one are included in the same batch
+    read_events = watcher._read_events
+
+    def read_events_and_write(timeout: float | None) -> set[str]:
+        changed = read_events(timeout)
+        if timeout is None:
+            other.write_text("")
+        return changed
+
+    monkeypatch.setattr(watcher, "_read_events", read_events_and_write)
+    file.write_text("import trio")
+    assert watcher.wait() == {str(file), str(other)}
+    watcher.close()
+
+
+def test_make_watcher_fallback(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    # can't watch a directory that doesn't exist
+    with pytest.raises(OSError, match="cannot watch"):
+        InotifyWatcher([str(tmp_path / "nonexistent" / "foo.py")])
+
+    monkeypatch.setattr(sys, "platform", "win32")
+    assert isinstance(make_watcher([str(tmp_path / "foo.py")]), PollingWatcher)
+
+
+def test_watch(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    monkeypatch.chdir(tmp_path)
+    initialize_options(Plugin(ast.AST(), []), [])
+    write_examplepy(tmp_path)
+    clean = tmp_path / "clean.py"
+    clean.write_text("")
+    filenames = ["./example.py", "./clean.py"]
+
+    class EditingWatcher(FakeWatcher):
+        def wait(self) -> set[str]:
+            # fix the error in example.py, and break clean.py
+            write_examplepy(tmp_path, "import trio\n")
+            clean.write_text("def (")
+            return set(filenames)
+
+    watcher = EditingWatcher()
+    assert watch(filenames, _check_file, watcher=watcher, max_batches=1) == 0
+    out, err = capsys.readouterr()
+    assert out == EXAMPLE_PY_ERROR
+    first_summary, parse_error, second_summary = err.splitlines()
+    assert first_summary.startswith(
+        "flake8-async: 1 error(s) in 1 of 2 file(s), checked 2 file(s) in "
+    )
+    assert parse_error.startswith("./clean.py: failed to parse: ")
+    assert second_summary.startswith(
+        "flake8-async: 0 error(s) in 0 of 2 file(s), checked 2 file(s) in "
+    )
+    assert watcher.closed
+
+
+def test_watch_deleted_and_interrupted(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    write_examplepy(tmp_path)
+    other = tmp_path / "other.py"
+    other.write_text(EXAMPLE_PY_TEXT)
+    watcher = FakeWatcher({"./other.py"})
+    monkeypatch.setattr("flake8_async.watch.make_watcher", lambda _: watcher)
+    monkeypatch_argv(
+        monkeypatch,
+        tmp_path,
+        [
+            tmp_path / "flake8-async",
+            "--watch",
+            "--autofix=ASYNC100",
+            "./example.py",
+            "./other.py",
+        ],
+    )
+    other.unlink()
+
+    # interrupted after the first batch, with errors remaining in example.py
+    assert main() == 1
+    out, err = capsys.readouterr()
+    assert out == EXAMPLE_PY_ERROR
+    assert_autofixed(tmp_path)
+    assert "1 error(s) in 1 of 1 file(s), checked 0 file(s)" in err
+    assert watcher.closed